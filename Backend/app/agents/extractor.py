@@ -1,25 +1,151 @@
 # Backend/app/agents/extractor.py
-from anthropic import Anthropic
+import asyncio
+import logging
+import re
 from app.core.config import settings
-from app.db.supabase_client import supabase
+from app.core.llm_client import ask_claude
+from app.core.vector_index import user_insight_index
+from app.db.supabase_client import ensure_index_loaded, write_queue
+
+logger = logging.getLogger(__name__)
+
+# Messages without any of these can't carry a preference; they never reach the model
+_PREFERENCE_CUES = re.compile(
+    r"\b(i|we|my|our)\b.*\b(like|love|prefer|enjoy|hate|avoid|want|need|into|fan|allergic|vegan|"
+    r"vegetarian|budget|cheap|quiet|crowds?|walk|walking|kids|accessible)\b|\b(no|not|never)\s+(more\s+)?\w+",
+    re.IGNORECASE,
+)
+_INSIGHT_LINE = re.compile(r"^\s*(?:[-*•]|\d+[.)])?\s*(user prefers\s+.+?)\s*\.?\s*$", re.IGNORECASE)
+
+insight_stats = {"messages": 0, "windows": 0, "llm_calls": 0, "skipped_windows": 0, "stored": 0, "duplicates": 0}
+
+
+def parse_insights(text: str, limit: int) -> list:
+    """'User prefers ...' lines from the reply (bullets/numbering tolerated)."""
+    found = []
+    for line in text.splitlines():
+        match = _INSIGHT_LINE.match(line)
+        if match:
+            found.append("User prefers " + match.group(1)[len("user prefers "):].strip())
+    return found[:limit]
+
+
+async def store_new_insights(insights: list) -> list:
+    """Dedupes against held preferences (exact or near-identical), then queues the rest."""
+    if not insights:
+        return []
+    # Held preferences live in Supabase until the index is bootstrapped; dedupe against all of them
+    await ensure_index_loaded(user_insight_index, "user_insights", "insight_text", order_by="created_at")
+    stored = []
+    for insight in insights:
+        if user_insight_index.contains(insight) or any(
+            score >= settings.INSIGHT_DUPLICATE_SCORE
+            for score, _ in user_insight_index.search(insight, k=1)
+        ):
+            insight_stats["duplicates"] += 1
+            continue
+        write_queue.enqueue("user_insights", {"insight_text": insight})
+        user_insight_index.add(insight)   # Recallable right away, before the row lands
+        stored.append(insight)
+    insight_stats["stored"] += len(stored)
+    return stored
+
+
+async def extract_insights(messages: list) -> list:
+    """One Claude call for a whole window of messages; returns the newly stored preferences."""
+    insight_stats["windows"] += 1
+    relevant = [m for m in messages if _PREFERENCE_CUES.search(m)]
+    if not relevant:
+        insight_stats["skipped_windows"] += 1
+        return []
+
+    transcript = "\n".join(f"- {m}" for m in relevant)
+    prompt = f"""Messages from one traveller:
+{transcript}
+
+Extract every lasting travel preference they reveal (at most {len(relevant)}).
+Reply with one line per preference, each exactly 'User prefers [vibe]'.
+Reply NONE if there are none."""
+    insight_stats["llm_calls"] += 1
+    res = await ask_claude(
+        "extractor",
+        max_tokens=40 * len(relevant),
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return await store_new_insights(parse_insights(res.content[0].text, len(relevant)))
+
+
+class InsightBatcher:
+    """
+    Buffers chat messages per session and extracts them in windows: a
+    window is flushed when it reaches INSIGHT_WINDOW_SIZE messages or after
+    INSIGHT_FLUSH_SECONDS without a new message (debounce).
+    """
+
+    def __init__(self):
+        self._buffers = {}    # session -> [messages]
+        self._timers = {}     # session -> debounce task
+        self._flushing = set()
+
+    def submit(self, session_id: str, message: str):
+        insight_stats["messages"] += 1
+        if not session_id:   # Nothing to group by: this message is its own window
+            self._spawn(self._extract([message]))
+            return
+        buffer = self._buffers.setdefault(session_id, [])
+        buffer.append(message)
+        timer = self._timers.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        if len(buffer) >= settings.INSIGHT_WINDOW_SIZE:
+            self._spawn(self.flush(session_id))
+        else:
+            self._timers[session_id] = asyncio.create_task(self._debounce(session_id))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _debounce(self, session_id: str):
+        await asyncio.sleep(settings.INSIGHT_FLUSH_SECONDS)
+        self._timers.pop(session_id, None)
+        await self.flush(session_id)
+
+    async def flush(self, session_id: str) -> list:
+        messages = self._buffers.pop(session_id, [])
+        if not messages:
+            return []
+        return await self._extract(messages)
+
+    @staticmethod
+    async def _extract(messages: list) -> list:
+        try:
+            return await extract_insights(messages)
+        except Exception as e:
+            logger.warning("Extraction Error (Ignored): %s", e)
+            return []
+
+    async def flush_all(self):
+        """Shutdown: extract whatever is still buffered and wait for in-flight windows."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        await asyncio.gather(*(self.flush(s) for s in list(self._buffers)), *list(self._flushing))
+
+    def snapshot(self) -> dict:
+        return {**insight_stats, "buffered_sessions": len(self._buffers),
+                "buffered_messages": sum(len(b) for b in self._buffers.values())}
+
+
+insight_batcher = InsightBatcher()
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
 
 async def extract_and_save_insight(text: str):
-    """Listens for vibes and saves them to the DB."""
+    """Listens for vibes and saves them to the DB (single text, no batching)."""
     try:
-        prompt = f"Analyze: '{text}'. Extract one specific preference. Reply ONLY with 'User prefers [vibe]'."
-        
-        res = client.messages.create(
-            model=settings.CLAUDE_MODEL,
-            max_tokens=50,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        insight = res.content[0].text.strip()
-        # Non-blocking save to Supabase
-        supabase.table("user_insights").insert({"insight_text": insight}).execute()
-        return insight
+        stored = await extract_insights([text])
+        return stored[0] if stored else None
     except Exception as e:
-        print(f"Extraction Error (Ignored): {e}")
-        return None
\ No newline at end of file
+        logger.warning("Extraction Error (Ignored): %s", e)
+        return None
@@ -1,120 +1,61 @@
-import httpx
-from anthropic import Anthropic
+import logging
+import numpy as np
 from app.core.config import settings
+from app.core.matrix_service import fetch_duration_matrix
+from app.core.route_solver import travel_time_matrix, solve_route, route_cost
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+logger = logging.getLogger(__name__)
 
 async def get_distance_matrix(locations: list):
     """
-    Calls Google Distance Matrix and validates the response.
+    Dense travel-time matrix (seconds) from the tiled, cached Distance Matrix service.
     """
     if not locations or len(locations) < 2: return None
-    
-    coords = "|".join([f"{loc['lat']},{loc['lon']}" for loc in locations])
-    url = f"https://maps.googleapis.com/maps/api/distancematrix/json?origins={coords}&destinations={coords}&key={settings.GOOGLE_MAPS_KEY}"
-    
-    async with httpx.AsyncClient() as http_client:
-        res = await http_client.get(url, timeout=10.0)
-        data = res.json()
-        if data.get("status") == "OK":
-            return data
-    return None
 
-def calculate_efficiency(matrix: dict, optimized_order: list):
+    try:
+        return await fetch_duration_matrix(locations)
+    except Exception as e:
+        logger.warning("Distance Matrix Bypass: %s", e)
+        return None
+
+def calculate_efficiency(durations, optimized_order: list):
     """
-    Hardened Efficiency Math: Zero crashes guaranteed.
+    Percentage of travel time saved by the optimized order versus visiting
+    the pool as sourced. Zero crashes guaranteed.
     """
     try:
-        if not matrix or "rows" not in matrix: return 35.0
-        
-        rows = matrix.get("rows", [])
-        matrix_size = len(rows)
-
-        def get_total_time(sequence):
-            total = 0
-            for i in range(len(sequence) - 1):
-                idx_a = sequence[i]
-                idx_b = sequence[i+1]
-                
-                # BOUNDS GUARD: Ensure index exists in the returned matrix
-                if idx_a < matrix_size and idx_b < matrix_size:
-                    elements = rows[idx_a].get("elements", [])
-                    if idx_b < len(elements):
-                        item = elements[idx_b]
-                        if item.get("status") == "OK" and "duration" in item:
-                            total += item["duration"]["value"]
-                        else:
-                            total += 1800 # 30 min penalty for unroutable paths
-            return total
+        if durations is None or len(optimized_order) < 2: return 35.0
 
-        # Only run math on indices that actually exist in the matrix
-        valid_indices = [i for i in optimized_order if i < matrix_size]
-        if len(valid_indices) < 2: return 35.0
+        naive_time = route_cost(durations, list(range(len(optimized_order))))
+        optimized_time = route_cost(durations, optimized_order)
 
-        naive_time = get_total_time(list(range(len(valid_indices))))
-        optimized_time = get_total_time(valid_indices)
-        
         if naive_time <= 0: return 35.0
         reduction = (naive_time - optimized_time) / naive_time
-        return round(max(reduction * 100, 18.5), 1) # Minimum 18.5% to look good
+        return round(max(reduction * 100, 0.0), 1)
     except Exception as e:
-        print(f"Logistics Math Bypass: {e}")
+        logger.warning("Logistics Math Bypass: %s", e)
         return 35.0
 
 async def run_logistics(poi_pool: list):
     """
     MASTER AGENT: Safe Orchestration.
+    Sequencing is solved locally (NN + 2-opt/Or-opt) with the hotel fixed at index 0.
     """
-    if not poi_pool: return {"optimized_pool": [], "efficiency": "0%"}
+    if not poi_pool: return {"optimized_pool": [], "efficiency": "0%", "durations": None}
 
-    # 1. Get the Matrix
-    matrix = await get_distance_matrix(poi_pool)
-    
-    # 2. Ask Claude to sequence (with a strict fallback)
-    try:
-        # Pass only titles to save tokens
-        titles = [p['title'] for p in poi_pool]
-        prompt = f"POIs: {titles}. Sequence these indices for shortest travel time. Return ONLY a Python list of numbers."
-        
-        response = client.messages.create(
-            model=settings.CLAUDE_MODEL,
-            max_tokens=200,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        import ast
-        clean_text = response.content[0].text.strip().replace('```python', '').replace('```', '')
-        optimized_indices = ast.literal_eval(clean_text)
-        
-        # Ensure indices are valid
-        optimized_indices = [i for i in optimized_indices if isinstance(i, int) and i < len(poi_pool)]
-        optimized_pool = [poi_pool[i] for i in optimized_indices]
-    except:
-        optimized_indices = list(range(len(poi_pool)))
-        optimized_pool = poi_pool
+    # 1. Get the Matrix (Google durations, haversine estimate as fallback)
+    durations = travel_time_matrix(poi_pool, await get_distance_matrix(poi_pool))
+
+    # 2. Sequence locally against the real travel times
+    optimized_indices = solve_route(durations, settings.ROUTE_SOLVER_BUDGET_MS / 1000.0)
+    optimized_pool = [poi_pool[i] for i in optimized_indices]
 
     # 3. Calculate Efficiency safely
-    eff_score = calculate_efficiency(matrix, optimized_indices)
+    eff_score = calculate_efficiency(durations, optimized_indices)
     
     return {
         "optimized_pool": optimized_pool,
-        "efficiency": f"{eff_score}%"
+        "efficiency": f"{eff_score}%",
+        # Reindexed to the optimized order, so day planning can reuse it
+        "durations": durations[np.ix_(optimized_indices, optimized_indices)],
     }
-
-# Backend/app/agents/logistics.py -> calculate_efficiency function
-
-def get_total_time(sequence, rows): 
-    total = 0
-    for i in range(len(sequence) - 1):
-        origin_idx = sequence[i]
-        dest_idx = sequence[i+1]
-        
-        element = rows[origin_idx]["elements"][dest_idx]
-        
-        # SAFEGUARD: Check if duration exists (Status must be 'OK')
-        if element.get("status") == "OK" and "duration" in element:
-            total += element["duration"]["value"]
-        else:
-            # If no route, add a penalty time (e.g., 30 mins) to keep math moving
-            total += 1800 
-    return total
\ No newline at end of file
@@ -1,15 +1,24 @@
-from anthropic import Anthropic
-from app.core.config import settings
+from app.core.llm_client import ask_claude
 from app.core.toon_engine import TOONEngine
+from app.core.prompt_codec import encode_itinerary
+from app.core.repair_engine import repair_itinerary, retime_replan, DEFAULT_DAY_END
 from app.db.supabase_client import save_itinerary
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-
-async def run_monitor(message: str, current_plan: list, reached_idx: int):
+async def run_monitor(message: str, current_plan: list, reached_idx: int,
+                      poi_pool: list = None, day_end: str = DEFAULT_DAY_END):
     """
     Slices the plan at reached_idx. 
     Heals the future nodes based on the disruption (Rain/Delay/Preference).
+    Common disruptions are repaired locally; the LLM only sees the rest.
     """
+    destination = current_plan[0].get('loc', 'Unknown') if current_plan else 'Updated Trip'
+
+    # 0. Local repair (shift / drop / indoor swap from poi_pool / re-sequence)
+    repaired = repair_itinerary(message, current_plan, reached_idx, pool=poi_pool, day_end=day_end)
+    if repaired is not None:
+        save_itinerary(destination, repaired['itinerary'])
+        return repaired['itinerary']
+
     # 1. State Slicing
     past_nodes = current_plan[:reached_idx + 1]
     future_nodes = current_plan[reached_idx + 1:]
@@ -17,7 +26,8 @@ async def run_monitor(message: str, current_plan: list, reached_idx: int):
     # 2. Healing Logic
     heal_prompt = f"""
     DISRUPTION: {message}
-    FUTURE_NODES: {future_nodes}
+    FUTURE_NODES:
+    {encode_itinerary(future_nodes)}
     
     TASK: Re-optimize these nodes. 
     - If it's RAIN: Swap 'Outdoor' types for 'Indoor' alternatives.
@@ -25,18 +35,17 @@ async def run_monitor(message: str, current_plan: list, reached_idx: int):
     Return ONLY in TOON Protocol format.
     """
     
-    res = client.messages.create(
-        model=settings.CLAUDE_MODEL,
+    res = await ask_claude(
+        "monitor",
         max_tokens=1000,
         system=TOONEngine.get_system_prompt(),
         messages=[{"role": "user", "content": heal_prompt}]
     )
     
-    healed_nodes = TOONEngine.parse(res.content[0].text)
+    healed_nodes = retime_replan(past_nodes, TOONEngine.parse(res.content[0].text))
     new_full_plan = past_nodes + healed_nodes
     
     # 3. Auto-Persistence to Supabase
-    destination = current_plan[0].get('loc', 'Unknown') if current_plan else 'Updated Trip'
     save_itinerary(destination, new_full_plan)
     
     return new_full_plan
\ No newline at end of file
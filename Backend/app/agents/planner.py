@@ -0,0 +1,142 @@
+# Backend/app/agents/planner.py
+"""
+One /plan run, shared by the API (main.py) and the job workers (worker.py):
+the request model, the graph's initial state, the streamed graph run and
+the finished plan's persistence and response body.
+"""
+import uuid
+from typing import List
+from pydantic import BaseModel
+from app.agents.vibe import is_religious_site
+from app.core.plan_cache import trip_contexts
+from app.core.scheduler import parse_time
+from app.core.services import services
+from app.db.supabase_client import save_full_journey
+
+
+class PlanRequest(BaseModel):
+    destination: str
+    startDate: str
+    endDate: str
+    startTime: str
+    endTime: str
+    timePeriod: str
+    budgetMax: int # Changed to int
+    persona: str
+    isReligious: bool
+    accommodation: str
+    interests: List[str]
+    duration: int
+
+
+def day_start(req: PlanRequest) -> str:
+    """
+    startTime, read with the onboarding AM/PM toggle when it sends one.
+    12:xx is noon whatever the toggle says (it defaults to AM; nobody starts
+    a trip day at half past midnight), and 13:00+ is already 24-hour.
+    """
+    meridiem = (req.timePeriod or "").strip().upper()
+    minutes = parse_time(req.startTime)
+    if req.startTime and meridiem in ("AM", "PM") and (minutes is None or minutes < 12 * 60):
+        return f"{req.startTime} {meridiem}"
+    return req.startTime or "09:00"
+
+
+def build_initial_state(req: PlanRequest) -> dict:
+    # Now req.endTime will not throw an AttributeError
+    return {
+        "target": req.destination,
+        "persona": req.persona,
+        "days": int(req.duration),
+        "budgetMax": req.budgetMax,  # Ensure this matches OnboardingModal
+        "is_religious": req.isReligious,
+        "accommodation": req.accommodation or "Boutique Hotel",
+        "interests": req.interests or [],
+        "startDate": req.startDate,
+        "startTime": day_start(req),
+        "endTime": req.endTime or "21:00",
+        "poi_pool": [],
+        "final_json": [],
+        "insights": [],
+        "efficiency": "35%",
+        "weather": "Sunny", # Added for safety
+        "forecast": [],
+        "hotel_name": "",
+        "center": None,   # Filled by the sensing stage
+        "memories": "",
+        "candidate_pool": []
+    }
+
+
+def plan_context(req: PlanRequest, result: dict) -> dict:
+    """What /chat replans need from a finished plan (kept in trip_contexts under its plan_id)."""
+    return {
+        "candidate_pool": [
+            p for p in result.get('candidate_pool') or []
+            if req.isReligious or not is_religious_site(p)
+        ],
+        "startTime": day_start(req),   # Daily window the scheduler re-times replans within
+        "endTime": req.endTime,
+        "destination": req.destination,   # Replans read this city's cached forecast
+        "startDate": req.startDate,
+        "days": req.duration,
+    }
+
+
+def finish_plan(req: PlanRequest, result: dict) -> dict:
+    """
+    Persists the journey, keeps its replan context and shapes the /plan
+    response body. Each computed plan gets its own plan_id; requests served
+    from the cache share that plan (and its context), never another one's.
+    """
+    plan_id = uuid.uuid4().hex
+    dest_center = result['center']
+    # PERSIST TO SUPABASE
+    save_full_journey(
+        req.destination, 
+        result['final_json'], 
+        result['insights'], 
+        dest_center
+    )
+
+    trip_contexts.put(plan_id, plan_context(req, result))
+
+    return {
+        "status": "success",
+        "plan_id": plan_id,
+        "itinerary": result['final_json'],
+        "insights": result['insights'],
+        "center": dest_center,
+        "efficiency_metric": result['efficiency']
+    }
+
+
+# Progress payload pulled out of each node's state update
+NODE_PROGRESS = {
+    "sense_center": lambda u: {"center": u.get("center")},
+    "sense_weather": lambda u: {"weather": u.get("weather"), "forecast": u.get("forecast")},
+    "sense_memory": lambda u: {"memories": bool(u.get("memories"))},
+    "research": lambda u: {"weather": u.get("weather"), "poi_count": len(u.get("poi_pool", []))},
+    "vibe": lambda u: {"poi_count": len(u.get("poi_pool", []))},
+    "logistics": lambda u: {"efficiency": u.get("efficiency")},
+    "cluster": lambda u: {"days": len({p.get("day") for p in u.get("poi_pool", [])})},
+    "schedule": lambda u: {"activities": len(u.get("schedule", []))},
+    "format": lambda u: {"activities": len(u.get("final_json", [])), "insights": len(u.get("insights", []))},
+}
+
+
+async def run_plan_graph(state: dict):
+    """
+    Runs the squad over `state`, merging each node's update into it, and
+    yields (event, data): `progress` as nodes finish, `activity`/`insight`
+    as the format node closes TOON blocks.
+    """
+    async for mode, chunk in services.graph.astream(state, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            yield chunk["event"], chunk["data"]
+            continue
+        for node, update in chunk.items():
+            update = update or {}
+            state.update(update)
+            progress = NODE_PROGRESS.get(node, lambda u: {})(update)
+            yield "progress", {"stage": node, **progress}
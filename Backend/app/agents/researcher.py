@@ -1,135 +1,255 @@
-import httpx
-import googlemaps
-from anthropic import Anthropic
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.core.admission import budgets
 from app.core.config import settings
+from app.core.llm_client import ask_claude
+from app.core.geo_cache import geocode_cache, CACHE_MISS
+from app.core.poi_catalog import poi_catalog, name_key
+from app.core.services import services
+from app.core.telemetry import track_upstream
+from app.core.weather_service import current_summary, weather_service
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_KEY)
+logger = logging.getLogger(__name__)
+
+# googlemaps is a blocking client, so its calls run on a dedicated pool sized
+# to this process's Maps budget (the default executor is too small on 1-2
+# core boxes). Built on first use, after a job worker has sized its budgets.
+_geo_executor = None
+
+
+def geo_executor() -> ThreadPoolExecutor:
+    global _geo_executor
+    if _geo_executor is None:
+        _geo_executor = ThreadPoolExecutor(max_workers=budgets["maps"].limit, thread_name_prefix="geocode")
+    return _geo_executor
 
 async def get_weather_context(city: str):
-    """Fetches real-time weather to influence POI sourcing."""
-    try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={settings.OPENWEATHER_KEY}&units=metric"
-        async with httpx.AsyncClient() as http_client:
-            res = await http_client.get(url)
-            data = res.json()
-            if res.status_code != 200: return "Sunny (22°C)"
-            return f"{data['weather'][0]['main']} ({data['main']['temp']}°C)"
-    except:
-        return "Mild (20°C)"
+    """Current conditions for the researcher prompt, from the cached city forecast."""
+    return current_summary(await weather_service.forecast(city))
 
 
-async def resolve_place_details(place_name: str, city: str):
-    """
-    Overwrites AI 'guesses' with verified Google Geocoding coordinates.
-    Uses Geocoding API first, falls back to Places search.
-    """
+def _lookup_place(place_name: str, city: str):
+    """Blocking cache -> Geocoding -> Places lookup. Always run off the event loop."""
+    cached = geocode_cache.get(place_name, city)
+    if cached is not CACHE_MISS:
+        return cached
+
     try:
         query = f"{place_name}, {city}"
+        result = None
 
         # 1. Use Geocoding API for the most accurate Lat/Lon
-        geo_result = gmaps.geocode(query)
+        with track_upstream("geocode", "geocode"):
+            geo_result = services.gmaps.geocode(query)
         if geo_result:
             location = geo_result[0]['geometry']['location']
-            return {
+            result = {
                 "lat": location['lat'],
                 "lon": location['lng'],
                 "address": geo_result[0].get('formatted_address', query),
                 "price_level": 2
             }
+        else:
+            # 2. Fallback to Places search if Geocoding is vague
+            with track_upstream("geocode", "places"):
+                places_result = services.gmaps.places(query=query)
+            if places_result.get('results'):
+                loc = places_result['results'][0]['geometry']['location']
+                result = {
+                    "lat": loc['lat'],
+                    "lon": loc['lng'],
+                    "address": places_result['results'][0].get('formatted_address', query),
+                    "price_level": places_result['results'][0].get('price_level', 2)
+                }
+    except Exception as e:
+        # Transient failure: don't poison the cache with a negative entry
+        logger.warning("Geospatial error for %s: %s", place_name, e)
+        return None
 
-        # 2. Fallback to Places search if Geocoding is vague
-        places_result = gmaps.places(query=query)
-        if places_result.get('results'):
-            loc = places_result['results'][0]['geometry']['location']
-            return {
-                "lat": loc['lat'],
-                "lon": loc['lng'],
-                "address": places_result['results'][0].get('formatted_address', query),
-                "price_level": places_result['results'][0].get('price_level', 2)
-            }
+    geocode_cache.set(place_name, city, result)
+    return result
 
-    except Exception as e:
-        print(f"Geospatial error for {place_name}: {e}")
-    return None
+
+async def resolve_place_details(place_name: str, city: str):
+    """
+    Overwrites AI 'guesses' with verified Google Geocoding coordinates.
+    Uses Geocoding API first, falls back to Places search.
+    """
+    # Warm landmarks are answered from the in-process LRU without a thread hop
+    cached = geocode_cache.get_memory(place_name, city)
+    if cached is not CACHE_MISS:
+        return cached
+
+    async with budgets["maps"].slot():
+        loop = asyncio.get_running_loop()
+        # Copy the context so the worker thread logs under the request's trace ID
+        lookup = functools.partial(contextvars.copy_context().run, _lookup_place, place_name, city)
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(geo_executor(), lookup),
+                timeout=settings.GEOCODE_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Geospatial timeout for %s", place_name)
+            return None
+
+
+async def resolve_places_batch(candidates: list, city: str, limit: int = 15):
+    """
+    Geocodes candidates concurrently (bounded by the Maps budget) while
+    keeping their original order. Stops as soon as `limit` places resolved,
+    cancelling lookups that haven't reached Google yet.
+    """
+    tasks = [
+        asyncio.create_task(resolve_place_details(c['title'], city))
+        for c in candidates
+    ]
+    poi_pool = []
+    try:
+        for cand, task in zip(candidates, tasks):
+            geo = await task
+            if geo:
+                poi_pool.append({
+                    "title": cand['title'],
+                    "type": cand['type'],
+                    "description": cand['description'],
+                    "lat": geo['lat'],
+                    "lon": geo['lon'],
+                    "loc": geo['address'],
+                    "price_level": geo['price_level']
+                })
+            if len(poi_pool) >= limit:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+    return poi_pool
+
+
+DEFAULT_CENTER = {"lat": 41.3851, "lon": 2.1734}  # Barcelona fallback
 
 
 def get_destination_coords(city: str):
     """Geocode the destination itself for map centering."""
-    try:
-        res = gmaps.geocode(city)
-        if res:
-            loc = res[0]['geometry']['location']
-            return {"lat": loc['lat'], "lon": loc['lng']}
-    except:
-        pass
-    return {"lat": 41.3851, "lon": 2.1734}  # Barcelona fallback
-
+    center = geocode_cache.get(city, "")
+    if center is CACHE_MISS:
+        try:
+            with track_upstream("geocode", "center"):
+                res = services.gmaps.geocode(city)
+            center = None
+            if res:
+                loc = res[0]['geometry']['location']
+                center = {"lat": loc['lat'], "lon": loc['lng']}
+            geocode_cache.set(city, "", center)
+        except:
+            center = None
+    return center or DEFAULT_CENTER
+
+
+async def locate_destination(city: str):
+    """Non-blocking get_destination_coords for the graph's sensing stage."""
+    cached = geocode_cache.get_memory(city, "")
+    if cached is not CACHE_MISS:
+        return cached or DEFAULT_CENTER
+    async with budgets["maps"].slot():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(geo_executor(), get_destination_coords, city)
+
+
+def parse_poi_candidates(text: str) -> list:
+    """Turns 'Name | Type | Description' lines into candidate dicts."""
+    candidates = []
+    for line in text.strip().split('\n'):
+        if "|" in line:
+            parts = [p.strip() for p in line.split('|')]
+            if len(parts) >= 2:
+                # Clean name: remove **, numbers, extra spaces
+                raw_name = parts[0]
+                clean_name = raw_name.replace("**", "").strip()
+                if ". " in clean_name[:4]:
+                    clean_name = clean_name.split(". ", 1)[-1]
 
-async def run_researcher(target: str, persona: str, budget: int, interests: list, accommodation: str):
-    """The core Researcher execution pipeline."""
+                candidates.append({
+                    "title": clean_name,
+                    "type": parts[1],
+                    "description": parts[2] if len(parts) > 2 else ""
+                })
+    return candidates
 
-    # 1. Environmental Sensing
-    weather = await get_weather_context(target)
-    interest_str = ", ".join(interests) if interests else "Sightseeing"
-    accommodation = "hotel" if budget > 250 else "hostel"
 
-    # 2. Source POI candidates from Claude
-    prompt = f"""
+def _research_prompt(target, persona, budget, interest_str, accommodation, weather, forecast, memories,
+                     count: int, need_stay: bool, known: list) -> str:
+    if need_stay:
+        task = f"""TASK: Find {count} high-value POIs. 
+    CRITICAL RULE: The very first POI (Index 0) MUST be a real, highly-rated {accommodation} in {target}.
+    The other {count - 1} should be vibe-aligned landmarks and cafes."""
+    else:
+        task = f"TASK: Find {count} more high-value, vibe-aligned landmarks and cafes (no accommodation)."
+    if known:
+        task += f"\n    ALREADY PLANNED (do not repeat): {', '.join(known)}"
+    return f"""
     SYSTEM: You are the Lead Researcher for ITERA.
     DESTINATION: {target}
     WEATHER: {weather}
+    FORECAST: {forecast or "Unavailable"}
     PERSONA: {persona}
     INTERESTS: {interest_str}
     STAY_PREFERENCE: {accommodation}
+    PAST_PREFERENCES: {memories or "None recorded"}
 
     Note: The user is traveling from India. 
     Calculate the 'Transit_Cost' (Flight/Visa) for a round trip to {target}.
     Factor this into the 'Total Budget' of ${budget}.
 
-    TASK: Find 15 high-value POIs. 
-    CRITICAL RULE: The very first POI (Index 0) MUST be a real, highly-rated {accommodation} in {target}.
-    The other 14 should be vibe-aligned landmarks and cafes.
+    {task}
     
     Format: Name | Type (Indoor/Outdoor/Stay) | Description
     """
 
-    response = client.messages.create(
-        model=settings.CLAUDE_MODEL,
+
+async def run_researcher(target: str, persona: str, budget: int, interests: list, accommodation: str,
+                         weather: str = None, memories: str = "", forecast: str = "",
+                         center: dict = None, is_religious: bool = True, wet_share: float = 0.0):
+    """The core Researcher execution pipeline."""
+
+    # 1. Environmental Sensing (normally done upfront by the graph's sensing stage)
+    if weather is None:
+        weather = await get_weather_context(target)
+    interest_str = ", ".join(interests) if interests else "Sightseeing"
+    accommodation = "hotel" if budget > 250 else "hostel"
+
+    # 2. Catalog first: popular destinations are answered by an index lookup
+    limit = 15
+    pool = await asyncio.to_thread(
+        poi_catalog.assemble, target, interests, budget, limit=limit, near=center,
+        is_religious=is_religious, min_indoor=round(wet_share * (limit - 1)),
+    )
+    has_stay = bool(pool) and pool[0]["type"] == "Stay"
+    if not has_stay:
+        pool = pool[:limit - 1]   # Leave index 0 for the stay Claude finds
+    gap = limit - len(pool)
+    if not gap:
+        return {"poi_pool": pool, "weather": weather}
+
+    # 3. Source the missing POI candidates from Claude
+    known = [p["title"] for p in pool]
+    prompt = _research_prompt(target, persona, budget, interest_str, accommodation, weather, forecast, memories,
+                              count=gap, need_stay=not has_stay, known=known)
+    response = await ask_claude(
+        "research",
         max_tokens=2000,
         messages=[{"role": "user", "content": prompt}]
     )
 
-    raw_lines = response.content[0].text.strip().split('\n')
-    poi_pool = []
+    seen = {name_key(t) for t in known}
+    candidates = [c for c in parse_poi_candidates(response.content[0].text) if name_key(c["title"]) not in seen]
 
-    # 3. Geospatial Validation
-    for line in raw_lines:
-        if "|" in line:
-            parts = [p.strip() for p in line.split('|')]
-            if len(parts) >= 2:
-                # Clean name: remove **, numbers, extra spaces
-                raw_name = parts[0]
-                clean_name = raw_name.replace("**", "").strip()
-                if ". " in clean_name[:4]:
-                    clean_name = clean_name.split(". ", 1)[-1]
+    # 4. Geospatial Validation (concurrent, order-preserving)
+    found = await resolve_places_batch(candidates, target, limit=gap)   # Catalogued after vibe validation
 
-                p_type = parts[1]
-                desc = parts[2] if len(parts) > 2 else ""
-
-                geo = await resolve_place_details(clean_name, target)
-                if geo:
-                    poi_pool.append({
-                        "title": clean_name,
-                        "type": p_type,
-                        "description": desc,
-                        "lat": geo['lat'],
-                        "lon": geo['lon'],
-                        "loc": geo['address'],
-                        "price_level": geo['price_level']
-                    })
-
-        if len(poi_pool) >= 15:
-            break
-
-    return {"poi_pool": poi_pool, "weather": weather}
\ No newline at end of file
+    # The stay stays at index 0 whichever side it came from
+    poi_pool = pool[:1] + found + pool[1:] if has_stay else found[:1] + pool + found[1:]
+    return {"poi_pool": poi_pool[:limit], "weather": weather}
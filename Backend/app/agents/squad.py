@@ -1,13 +1,24 @@
-from typing import TypedDict, List
-from anthropic import Anthropic
-from langgraph.graph import StateGraph, END
+import asyncio
+import logging
+from typing import Any, TypedDict, List
+from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_stream_writer
 from app.core.config import settings
-from app.core.toon_engine import TOONEngine
-from app.agents.researcher import run_researcher
+from app.core.day_planner import plan_days, day_spread_km
+from app.core.scheduler import schedule_plan, is_anchor
+from app.core.llm_client import stream_claude
+from app.core.memory_engine import get_relevant_memories
+from app.core.poi_catalog import poi_catalog
+from app.core.toon_engine import TOONEngine, TOONStreamParser
+from app.core.prompt_codec import encode_itinerary, SCHEDULE_FIELDS
+from app.core.telemetry import timed_node
+from app.core.weather_service import weather_service, current_summary, trip_outlook, describe_outlook
+from app.agents.researcher import run_researcher, locate_destination, DEFAULT_CENTER
 from app.agents.vibe import run_vibe_validator
 from app.agents.logistics import run_logistics
+from app.core.route_solver import travel_time_matrix
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+logger = logging.getLogger(__name__)
 
 class AgentState(TypedDict):
     target: str
@@ -17,23 +28,74 @@ class AgentState(TypedDict):
     is_religious: bool
     accommodation: str
     interests: List[str]
+    startDate: str
     startTime: str
     endTime: str
     hotel_name: str
+    weather: str
+    forecast: List[dict]         # Trip days covered by the cached 5-day forecast
+    center: dict
+    memories: str
+    candidate_pool: List[dict]   # Everything the researcher resolved, kept for replans
     # These must be initialized in main.py
     poi_pool: List[dict]
     final_json: List[dict]
     insights: List[dict]
     efficiency: str
+    travel_times: Any            # Seconds between poi_pool entries (logistics order), reused by day planning
+    schedule: List[dict]         # Timed skeleton from the scheduler; format only adds prose
+
+# --- SENSING STAGE: independent branches that run in parallel, joined at research ---
+
+async def _sense(label: str, coro, timeout: float, fallback):
+    """Bounds one sensing branch so a slow upstream can't hold the plan hostage."""
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Sensing timeout (%s) after %ss, using fallback", label, timeout)
+    except Exception as e:
+        logger.warning("Sensing error (%s): %s", label, e)
+    return fallback
+
+
+async def sense_center_node(state: AgentState):
+    center = await _sense("center", locate_destination(state['target']),
+                          settings.SENSE_GEOCODE_TIMEOUT_SECONDS, DEFAULT_CENTER)
+    return {"center": center}
+
+
+async def sense_weather_node(state: AgentState):
+    # One cached forecast per city; a timeout here still leaves the fetch running to fill the cache
+    forecast = await _sense("weather", weather_service.forecast(state['target']),
+                            settings.SENSE_WEATHER_TIMEOUT_SECONDS, None)
+    return {
+        "weather": current_summary(forecast),
+        "forecast": trip_outlook(forecast, state.get('startDate'), state['days']),
+    }
+
+
+async def sense_memory_node(state: AgentState):
+    context = f"{state['persona']} {' '.join(state['interests'])}"
+    memories = await _sense("memory", get_relevant_memories(state['target'], context),
+                            settings.SENSE_MEMORY_TIMEOUT_SECONDS, "")
+    return {"memories": memories}
+
 
 async def researcher_node(state: AgentState):
-    # Calling the 4-argument function we fixed in Step 1
+    # Sensing already ran, so the researcher goes straight to the catalog (and Claude for any gaps)
+    outlook = state.get('forecast') or []
     data = await run_researcher(
         state['target'], 
         state['persona'], 
         state['budgetMax'], 
         state['interests'],
-        state["accommodation"]
+        state["accommodation"],
+        weather=state.get('weather'),
+        memories=state.get('memories', ""),
+        forecast=describe_outlook(outlook),
+        center=state.get('center'),
+        is_religious=state.get('is_religious', True),
+        wet_share=sum(day['wet'] for day in outlook) / len(outlook) if outlook else 0.0,
     )
     found_hotel = "The Selected Stay"
     if data['poi_pool']:
@@ -41,14 +103,19 @@ async def researcher_node(state: AgentState):
 
     return {
         "poi_pool": data['poi_pool'], 
+        "candidate_pool": data['poi_pool'],
         "hotel_name": found_hotel, # Save it to the state
         "weather": data['weather']
 
     }
 
 
-def vibe_node(state: AgentState):
-    filtered = run_vibe_validator(state['poi_pool'], state['persona'], state['days'], state['is_religious'])
+async def vibe_node(state: AgentState):
+    filtered = await run_vibe_validator(
+        state['poi_pool'], state['persona'], state['days'], state['is_religious'], city=state['target']
+    )
+    # Only places that passed validation reach the catalog (and count as used by a plan)
+    await asyncio.to_thread(poi_catalog.ingest, state['target'], filtered)
     return {"poi_pool": filtered}
 # Backend/app/agents/squad.py -> logistics_node
 # Backend/app/agents/squad.py -> Update only this node
@@ -65,27 +132,83 @@ async def logistics_node(state: AgentState):
         result = await run_logistics(state['poi_pool'])
         return {
             "poi_pool": result['optimized_pool'], 
-            "efficiency": result['efficiency']
+            "efficiency": result['efficiency'],
+            "travel_times": result['durations'],
         }
     except Exception as e:
-        print(f"!!! CRITICAL LOGISTICS BYPASS: {e}")
+        logger.error("!!! CRITICAL LOGISTICS BYPASS: %s", e)
         # Return original pool so the user still gets a plan
         return {
             "poi_pool": state['poi_pool'], 
             "efficiency": "35% (Optimized)" 
         }
 
+async def cluster_node(state: AgentState):
+    """
+    Splits the pool into compact, balanced days around the hotel (local, no upstream calls).
+    The scheduler then times each day instead of the format prompt re-deriving the geography.
+    """
+    pool = state['poi_pool']
+    durations = state.get('travel_times')
+    if durations is None or len(durations) != len(pool):
+        durations = travel_time_matrix(pool)   # Logistics bypassed: haversine estimate
+    wet_days = [False] * state['days']
+    for day in state.get('forecast') or []:
+        if day['day'] <= state['days']:
+            wet_days[day['day'] - 1] = day['wet']
+    planned = plan_days(pool, state['days'], durations, wet_days,
+                        time_budget=settings.DAY_PLANNER_BUDGET_MS / 1000.0)
+    logger.info("Day plan: %d stops over %d days, spread %.2f km", len(planned) - 1,
+                max((p['day'] for p in planned), default=0), day_spread_km(planned))
+    return {"poi_pool": planned}
+
+
+async def schedule_node(state: AgentState):
+    """Start times for every stop from the traveller's daily window, dwell estimates and travel times."""
+    result = schedule_plan(state['poi_pool'], state['days'], state.get('hotel_name'),
+                           state.get('startTime'), state.get('endTime'))
+    if result['unscheduled']:
+        logger.info("Schedule: %d stops didn't fit the %s-%s window", len(result['unscheduled']),
+                    state.get('startTime'), state.get('endTime'))
+    return {"schedule": result['itinerary']}
+
+
+def _title_key(title: str) -> str:
+    return " ".join(str(title).replace("_", " ").lower().split())
+
+
+def _row_index(item: dict, by_title: dict):
+    """'N3' -> 3; falls back to the title when the model echoed a place name instead of its ID."""
+    ref = str(item.get('title', '')).strip().upper()
+    if ref.startswith("N") and ref[1:].isdigit():
+        return int(ref[1:])
+    return by_title.get(_title_key(item.get('title', '')))
+
+
+def _with_prose(node: dict, item: dict) -> dict:
+    """Scheduled node + the model's prose; anchors keep their compliance Logic."""
+    merged = dict(node)
+    for field in ("logic", "description", "price"):
+        if item.get(field) and not (field == "logic" and is_anchor(node)):
+            merged[field] = item[field]
+    return merged
+
+
 # Backend/app/agents/squad.py -> toon_master_node
 # Backend/app/agents/squad.py -> toon_master_node
-def toon_master_node(state: AgentState):
-    system_prompt = TOONEngine.get_system_prompt()
+async def toon_master_node(state: AgentState):
+    system_prompt = TOONEngine.get_prose_prompt()
     h_name = state.get('hotel_name', 'The selected accommodation')
+    schedule = state.get('schedule') or []
     
+    # Places, days and times are fixed by the scheduler; the model only writes prose and insights.
     # FIX: We use {{ and }} for literal TOON syntax so Python f-strings don't crash
     prompt = f"""
-    DATA: {state['poi_pool']}
+    SCHEDULE (one activity per row, already placed and timed):
+    {encode_itinerary(schedule, SCHEDULE_FIELDS)}
     MAX_BUDGET: ${state['budgetMax']}
     HOTEL_NAME: {h_name}
+    FORECAST: {describe_outlook(state.get('forecast') or []) or "Unavailable"}
     STARTING_POINT: India
     TARGET: {state['target']}
 
@@ -101,50 +224,77 @@ def toon_master_node(state: AgentState):
     }}
     
     COMPLIANCE:
-    - Include the Check-in (Day 1) and Heritage (Day 2) rules as before.
+    - Write the prose for the {state['days']}-day itinerary in TOON: one Activity(N<row id>) block per SCHEDULE row, in row order.
+    - Do not add, drop, move or re-time rows; only write Logic, Description and Price.
+    - On days the FORECAST marks as rain, say so in the Logic of Outdoor rows.
     - Ensure Activity prices are realistic for the remaining budget.
-
-    TASK: Generate a {state['days']}-day itinerary in TOON format.
     
     COMPLIANCE RULES (MANDATORY):
-    1. DAY 1: The first activity MUST be Activity(Check-in_{h_name.replace(' ', '_')}) {{ Time: 09:00; Logic: 'Checking into optimized anchor location'; }}
-    
-    2. DAY 2: One activity MUST be Activity(Heritage_Site_Visit) {{ 
-       Time: 09:00; 
-       Logic: 'Heritage site visit (low crowd window)'; 
-       Description: 'Exploring the cultural soul of the city during the quietest morning hours.';
-    }}
-    
-    3. DAY 2: Follow heritage visit with Activity(Lunch) {{ 
-       Time: 12:00; 
-       Logic: 'Lunch near stay location.'; 
-    }}
-    
-    4. Generate exactly 3 TripInsight blocks using these EXACT quotes:
+    1. Generate exactly 3 TripInsight blocks using these EXACT quotes:
        - TripInsight(Stay_Optimization) {{ Content: '{h_name} selected within 1.2 km of major attractions—travel time reduced by 35%.'; Value: '1.2km'; }}
        - TripInsight(Booking_Insight) {{ Content: 'Best price window detected for Day 4 activity—booking recommended within next 6 hours.'; Value: '6h Window'; }}
        - TripInsight(Schedule_Adjustment) {{ Content: 'Rain forecast detected—outdoor activity shifted to Day 5; museum visit scheduled for Day 3 afternoon.'; Value: 'Weather Heal'; }}
     """
     
-    res = client.messages.create(
-        model=settings.CLAUDE_MODEL,
+    # Stream tokens so /plan (SSE mode) can push each activity as soon as its prose block closes
+    writer = get_stream_writer()
+    parser = TOONStreamParser(require_coords=False)
+    by_title = {_title_key(node['title']): i for i, node in enumerate(schedule)}
+    final = list(schedule)
+    written = set()
+
+    def emit(events):
+        for kind, item in events:
+            if kind == "activity":
+                idx = _row_index(item, by_title)
+                if idx is None or not 0 <= idx < len(final) or idx in written:
+                    continue
+                final[idx] = _with_prose(final[idx], item)
+                written.add(idx)
+                item = final[idx]
+            writer({"event": kind, "data": item})
+
+    async for chunk in stream_claude(
+        "format",
         max_tokens=4000,
         system=system_prompt,
         messages=[{"role": "user", "content": prompt}]
-    )
-    
-    # Using the upgraded parser that handles insights
-    parsed = TOONEngine.parse_with_insights(res.content[0].text)
+    ):
+        emit(parser.feed(chunk))
+    emit(parser.close())
+
+    # Rows the model skipped still go out, with the POI's own description
+    for idx in range(len(final)):
+        if idx not in written:
+            writer({"event": "activity", "data": final[idx]})
+
+    parsed = parser.result()
     
     return {
-        "final_json": parsed['itinerary'],
+        "final_json": final,
         "insights": parsed['insights']
     }
 
 
-builder = StateGraph(AgentState)
-builder.add_node("research", researcher_node); builder.add_node("vibe", vibe_node)
-builder.add_node("logistics", logistics_node); builder.add_node("format", toon_master_node)
-builder.set_entry_point("research"); builder.add_edge("research", "vibe"); builder.add_edge("vibe", "logistics")
-builder.add_edge("logistics", "format"); builder.add_edge("format", END)
-itera_brain = builder.compile()
\ No newline at end of file
+SENSING_NODES = ["sense_center", "sense_weather", "sense_memory"]
+
+NODES = {
+    "sense_center": sense_center_node, "sense_weather": sense_weather_node, "sense_memory": sense_memory_node,
+    "research": researcher_node, "vibe": vibe_node, "logistics": logistics_node,
+    "cluster": cluster_node, "schedule": schedule_node, "format": toon_master_node,
+}
+
+
+def build_graph():
+    """Compiles the squad graph; called once by the service container (services.graph)."""
+    builder = StateGraph(AgentState)
+    for name, node in NODES.items():
+        builder.add_node(name, timed_node(name, node))   # Per-node latency histogram + log line
+    for node in SENSING_NODES:
+        builder.add_edge(START, node)
+    builder.add_edge(SENSING_NODES, "research")  # Join: waits for every sensing branch
+    builder.add_edge("research", "vibe"); builder.add_edge("vibe", "logistics")
+    builder.add_edge("logistics", "cluster"); builder.add_edge("cluster", "schedule")
+    builder.add_edge("schedule", "format")
+    builder.add_edge("format", END)
+    return builder.compile()
@@ -1,49 +1,111 @@
-from anthropic import Anthropic
-from app.core.config import settings
+import json
+import logging
+import re
+from app.core.llm_client import ask_claude
+from app.core.prompt_codec import encode_pois, poi_index
+from app.agents.researcher import resolve_places_batch
+from app.core.poi_catalog import RELIGIOUS_KEYWORDS
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+logger = logging.getLogger(__name__)
 
-def run_vibe_validator(poi_pool: list, persona: str, days: int, is_religious: bool):
+_RELIGIOUS_PATTERN = re.compile(r"\b(" + "|".join(map(re.escape, RELIGIOUS_KEYWORDS)) + r")\b", re.IGNORECASE)
+
+
+def is_religious_site(poi: dict) -> bool:
+    """Local keyword/type classifier over the POI title and type."""
+    text = f"{poi.get('title', '')} {poi.get('type', '')}"
+    return bool(_RELIGIOUS_PATTERN.search(text))
+
+
+def _parse_reply(text: str) -> dict:
+    """Reads {'keep': [...], 'replace': [...]}; tolerates fences and stray prose."""
+    clean = text.strip().replace('```json', '').replace('```', '')
+    match = re.search(r"\{[\s\S]*\}", clean)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            return {"keep": data.get("keep") or [], "replace": data.get("replace") or []}
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    # Fallback: any P<n> references in the text
+    return {"keep": re.findall(r"\bP\d+\b", clean), "replace": []}
+
+
+async def run_vibe_validator(poi_pool: list, persona: str, days: int, is_religious: bool, city: str = ""):
     """
-    Maintains density (4 nodes/day). 
+    Maintains density (4 nodes/day).
     Swaps religious sites for 'Hidden Gems' if the user prefers none.
+    The hotel (index 0) always stays. Religious filtering runs locally; the
+    model only returns selected IDs, or short names when new places are needed.
     """
     target_count = int(days) * 4
-    filtered_list = poi_pool[:int(days) * 4] # or your substitution logic
+    if not poi_pool:
+        return []
+
+    hotel, candidates = poi_pool[0], poi_pool[1:]
+    if not is_religious:
+        candidates = [p for p in candidates if not is_religious_site(p)]
+
+    slots = max(target_count - 1, 0)
+    shortfall = slots - len(candidates)
+
+    # Nothing to choose and nothing missing: no model call at all
+    if shortfall == 0:
+        return [hotel] + candidates
+
+    if shortfall < 0:
+        task = f"""
+    1. Select the best {slots} POIs for this persona.
+    2. Reply ONLY with JSON: {{"keep": ["P0", "P3", ...]}}"""
+    else:
+        rules = [f"We are {shortfall} POIs short. Suggest {shortfall} 'Hidden Gem' or 'Local Secret'\n"
+                 f"       places in {city} that match the {persona} vibe and are NOT already listed."]
+        if not is_religious:
+            rules.append("No churches, temples, mosques or other religious sites.")
+        rules.append('Reply ONLY with JSON: {"replace": ["Exact Place Name|Indoor", "Exact Place Name|Outdoor"]}')
+        task = "".join(f"\n    {i}. {rule}" for i, rule in enumerate(rules, 1))
 
-    # We use Claude to handle the "Substitution" logic intelligently
     prompt = f"""
     PERSONA: {persona}
     RELIGIOUS SITES ALLOWED: {is_religious}
-    TARGET COUNT: {target_count}
-    POOL: {poi_pool}
-
-    TASK:
-    1. Select the best {target_count} items.
-    2. IF 'is_religious' is False: 
-       Identify any religious sites (Church, Temple, Cathedral, Mosque) 
-       and REPLACE them with a 'Hidden Gem' or 'Local Secret' in the same city 
-       that matches the {persona} vibe.
-    3. Return the FINAL list of {target_count} POIs as a Python list of dicts.
-    
-    Output ONLY the list.
+    POOL:
+    {encode_pois(candidates)}
+
+    TASK:{task}
     """
 
-    reindexed_pool = []
-    for i, poi in enumerate(filtered_list):
-        poi['id'] = i  # Resetting the ID to match the list position
-        reindexed_pool.append(poi)
+    try:
+        res = await ask_claude(
+            "vibe",
+            max_tokens=200,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        reply = _parse_reply(res.content[0].text)
+    except Exception as e:
+        logger.warning("Vibe Validator Bypass: %s", e)
+        reply = {"keep": [], "replace": []}
 
-    res = client.messages.create(
-        model=settings.CLAUDE_MODEL,
-        max_tokens=2500,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    if shortfall < 0:
+        keep = []
+        for ref in reply["keep"]:
+            idx = poi_index(ref)
+            if idx is not None and idx < len(candidates) and idx not in keep:
+                keep.append(idx)
+        # Top up in sourced order if the model returned too few IDs
+        for idx in range(len(candidates)):
+            if len(keep) >= slots:
+                break
+            if idx not in keep:
+                keep.append(idx)
+        return [hotel] + [candidates[i] for i in sorted(keep[:slots])]
 
-    try:
-        import ast
-        clean_res = res.content[0].text.strip().replace('```python', '').replace('```', '')
-        return ast.literal_eval(clean_res)[:target_count]
-    except:
-        # Emergency Fallback: If AI fails, return the first available nodes
-        return reindexed_pool
+    # Replacements go through the same geocoding path as the researcher
+    known = {p['title'].lower() for p in poi_pool}
+    new_places = []
+    for entry in reply["replace"]:
+        name, _, p_type = str(entry).partition("|")
+        place = {"title": name.strip(), "type": p_type.strip() or "Outdoor", "description": "Hidden Gem"}
+        if place['title'] and place['title'].lower() not in known and (is_religious or not is_religious_site(place)):
+            new_places.append(place)
+    resolved = await resolve_places_batch(new_places, city, limit=shortfall) if new_places and city else []
+    return [hotel] + candidates + resolved
@@ -0,0 +1,320 @@
+# Backend/app/core/admission.py
+"""
+Admission control: who gets to start work, and in what order.
+
+Both layers share one primitive, a priority gate: a counting semaphore
+whose waiters are served by priority, then arrival order, with a bounded
+queue per priority.
+
+- Endpoints: /chat and /plan pass `endpoint_gate` before their handler
+  runs. Chats queue ahead of plans, plans are capped below the total so
+  chats always have headroom, and a full queue or a wait past the deadline
+  is turned away at once (429 / 503 with Retry-After) instead of piling up
+  open sockets.
+- Upstreams: every Anthropic, Maps, Weather and Supabase call takes a slot
+  (and, where a rate is configured, a token) from that upstream's budget.
+  Waiters are ordered by the priority of the request that caused the call,
+  so a chat's Claude call overtakes a queue of plan calls. The configured
+  budgets are for the whole deployment: the API holds UPSTREAM_API_SHARE
+  of each (it serves every chat and sync plan) and the job workers split
+  the rest, so together they stay under the provider's limits.
+
+Gates are thread-safe: googlemaps and Supabase are blocking clients that
+run on worker threads, which wait with `hold()`; coroutines use `slot()`.
+"""
+import asyncio
+import bisect
+import contextvars
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from app.core.config import settings
+from app.core.telemetry import ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+CHAT, PLAN, BACKGROUND = 0, 1, 2   # Lower runs first
+PRIORITY_NAMES = {CHAT: "chat", PLAN: "plan", BACKGROUND: "background"}
+
+# Set per request by the HTTP middleware; upstream calls made while serving it inherit it.
+# Work nobody is waiting on (insight extraction, write-behind flushes) runs as BACKGROUND.
+priority_var = contextvars.ContextVar("admission_priority", default=BACKGROUND)
+
+ROUTE_PRIORITY = {("POST", "/chat"): CHAT, ("POST", "/plan"): PLAN}
+HOLD_EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class Rejected(Exception):
+    """Raised instead of queueing: the queue is full (429) or the wait ran out (503)."""
+
+    def __init__(self, scope: str, reason: str, retry_after: int):
+        super().__init__(f"{scope} {reason}")
+        self.scope = scope
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = 429 if reason == "queue_full" else 503
+
+
+class TokenBucket:
+    """Start rate limit; a taken token may go negative, which is a reservation to wait out."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes one token; returns the seconds to wait before using it (0 = now)."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "wake", "granted")
+
+    def __init__(self, priority: int, seq: int, wake):
+        self.priority = priority
+        self.seq = seq
+        self.wake = wake
+        self.granted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def _wake_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class PriorityGate:
+    """
+    `limit` holders at a time (and at most `class_limits[p]` of priority p);
+    waiters are woken in (priority, arrival) order. `max_queue` bounds the
+    waiters per priority (0 = unbounded) and `max_wait` bounds each wait.
+    """
+
+    def __init__(self, scope: str, limit: int, max_queue: int = 0, max_wait: float = None,
+                 class_limits: dict = None, bucket: TokenBucket = None):
+        self.scope = scope
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.class_limits = class_limits or {}
+        self.bucket = bucket
+        self.active = 0
+        self.active_by = {}
+        self.hold_seconds = 0.0   # EWMA, feeds Retry-After
+        self.stats = {"admitted": 0, "queued": 0, "queue_full": 0, "timeout": 0}
+        self._waiters = []        # Sorted by (priority, seq)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # --- Bookkeeping (caller holds the lock) ---
+
+    def _can_run(self, priority: int) -> bool:
+        cap = self.class_limits.get(priority)
+        return self.active < self.limit and (cap is None or self.active_by.get(priority, 0) < cap)
+
+    def _take(self, priority: int):
+        self.active += 1
+        self.active_by[priority] = self.active_by.get(priority, 0) + 1
+        self.stats["admitted"] += 1
+
+    def _dispatch(self):
+        """Hands freed slots to the first waiters allowed to run."""
+        for waiter in list(self._waiters):
+            if self.active >= self.limit:
+                break
+            if self._can_run(waiter.priority):
+                self._waiters.remove(waiter)
+                self._take(waiter.priority)
+                waiter.granted = True
+                waiter.wake()
+        ADMISSION_QUEUED.labels(self.scope).set(len(self._waiters))
+
+    def _enter(self, priority: int, wake):
+        """None when admitted straight away, else the queued waiter; raises when the queue is full."""
+        with self._lock:
+            ahead = any(w.priority <= priority and self._can_run(w.priority) for w in self._waiters)
+            if self._can_run(priority) and not ahead:
+                self._take(priority)
+                return None
+            queued = sum(1 for w in self._waiters if w.priority == priority)
+            if self.max_queue and queued >= self.max_queue:
+                self.stats["queue_full"] += 1
+                raise self._rejected(priority, "queue_full")
+            waiter = _Waiter(priority, next(self._seq), wake)
+            bisect.insort(self._waiters, waiter)
+            self.stats["queued"] += 1
+            ADMISSION_QUEUED.labels(self.scope).set(len(self._waiters))
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Withdraws a waiter that timed out or was cancelled; True if it had been granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            ADMISSION_QUEUED.labels(self.scope).set(len(self._waiters))
+            return False
+
+    def _rejected(self, priority: int, reason: str) -> Rejected:
+        ADMISSION_REJECTED.labels(self.scope, PRIORITY_NAMES[priority], reason).inc()
+        return Rejected(self.scope, reason, self.retry_after())
+
+    def _observe(self, priority: int, started: float):
+        ADMISSION_WAIT_SECONDS.labels(self.scope, PRIORITY_NAMES[priority]).observe(time.perf_counter() - started)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead should have drained, from the recent hold time."""
+        backlog = (len(self._waiters) + 1) * self.hold_seconds / self.limit
+        return min(MAX_RETRY_AFTER_SECONDS, max(settings.ADMISSION_RETRY_AFTER_SECONDS, math.ceil(backlog)))
+
+    # --- Public API ---
+
+    async def acquire(self, priority: int) -> float:
+        """Waits for a slot (and token); returns the grant time to pass to release()."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enter(priority, lambda: loop.call_soon_threadsafe(_wake_future, future))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(future, timeout=self.max_wait)
+            except BaseException as e:
+                if self._abandon(waiter):
+                    self.release(priority, time.perf_counter())
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeout"] += 1
+                    raise self._rejected(priority, "timeout") from None
+                raise
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                try:
+                    await asyncio.sleep(delay)
+                except BaseException:
+                    self.release(priority, time.perf_counter())
+                    raise
+        self._observe(priority, started)
+        return time.perf_counter()
+
+    def acquire_sync(self, priority: int) -> float:
+        """Blocking acquire() for worker threads."""
+        started = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enter(priority, event.set)
+        if waiter is not None and not event.wait(self.max_wait):
+            if not self._abandon(waiter):
+                self.stats["timeout"] += 1
+                raise self._rejected(priority, "timeout")
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+        self._observe(priority, started)
+        return time.perf_counter()
+
+    def release(self, priority: int, granted_at: float):
+        with self._lock:
+            held = time.perf_counter() - granted_at
+            self.hold_seconds += HOLD_EWMA_ALPHA * (held - self.hold_seconds)
+            self.active -= 1
+            self.active_by[priority] -= 1
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = None):
+        """`async with gate.slot():` at the caller's request priority unless one is given."""
+        priority = priority_var.get() if priority is None else priority
+        granted_at = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority, granted_at)
+
+    @contextmanager
+    def hold(self, priority: int = None):
+        """Blocking slot() for worker threads."""
+        priority = priority_var.get() if priority is None else priority
+        granted_at = self.acquire_sync(priority)
+        try:
+            yield
+        finally:
+            self.release(priority, granted_at)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waiting = {}
+            for w in self._waiters:
+                name = PRIORITY_NAMES[w.priority]
+                waiting[name] = waiting.get(name, 0) + 1
+            return {
+                **self.stats,
+                "limit": self.limit,
+                "active": self.active,
+                "waiting": waiting,
+                "hold_ms": round(self.hold_seconds * 1000, 1),
+            }
+
+
+UPSTREAMS = ("anthropic", "maps", "weather", "supabase")   # Each sized by <NAME>_MAX_CONCURRENCY / _RATE_PER_SECOND / _BURST
+
+
+def budget_share(worker: bool = False) -> float:
+    """
+    This process's part of the deployment-wide budgets: UPSTREAM_API_SHARE
+    for the API, an even split of the rest for each job worker. A process
+    with no workers beside it (or a lone worker) gets everything.
+    """
+    workers = settings.UPSTREAM_BUDGET_WORKERS or settings.JOB_WORKERS
+    if workers <= 0:
+        return 1.0
+    api_share = min(max(settings.UPSTREAM_API_SHARE, 0.0), 1.0)
+    return (1.0 - api_share) / workers if worker else api_share
+
+
+def size_budgets(worker: bool = False):
+    """Sizes every upstream budget to this process's share (never below one call at a time)."""
+    share = budget_share(worker)
+    for name, gate in budgets.items():
+        prefix = name.upper()
+        gate.limit = max(1, int(getattr(settings, f"{prefix}_MAX_CONCURRENCY") * share))
+        gate.bucket = TokenBucket(getattr(settings, f"{prefix}_RATE_PER_SECOND") * share,
+                                  max(1, int(getattr(settings, f"{prefix}_BURST") * share)))
+
+
+# Upstream budgets: no queue bound or deadline here, the endpoint gate and the callers' own timeouts cover that.
+# Sized for the API at import; job workers re-size theirs at start. Priority orders calls within a process.
+budgets = {name: PriorityGate(name, 1) for name in UPSTREAMS}
+size_budgets()
+
+endpoint_gate = PriorityGate(
+    "http",
+    settings.ADMISSION_MAX_INFLIGHT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    max_wait=settings.ADMISSION_MAX_WAIT_SECONDS,
+    class_limits={PLAN: settings.ADMISSION_PLAN_MAX_INFLIGHT},
+)
+
+
+def route_priority(method: str, path: str):
+    """Priority for an admitted route; None for routes that bypass admission (stats, metrics)."""
+    return ROUTE_PRIORITY.get((method, path.rstrip("/") or "/"))
+
+
+def snapshot() -> dict:
+    return {
+        "endpoints": endpoint_gate.snapshot(),
+        "upstreams": {name: gate.snapshot() for name, gate in budgets.items()},
+    }
@@ -4,19 +4,145 @@ from typing import Optional
 
 class Settings(BaseSettings):
     # --- API KEYS (The Squad's Sensory Inputs) ---
-    # We do not provide defaults here so Pydantic forces a crash if missing
-    ANTHROPIC_API_KEY: str 
-    GOOGLE_MAPS_KEY: str   # Fixed the AttributeError by adding this schema definition
-    OPENWEATHER_KEY: str
+    # Empty defaults keep imports (and the offline benchmarks) working without keys;
+    # each client is built on first use and fails there if its key is missing
+    ANTHROPIC_API_KEY: str = ""
+    GOOGLE_MAPS_KEY: str = ""   # Fixed the AttributeError by adding this schema definition
+    OPENWEATHER_KEY: str = ""
     
     # --- DATABASE (The Psychographic Memory) ---
-    SUPABASE_URL: str
-    SUPABASE_SERVICE_ROLE_KEY: str
+    SUPABASE_URL: str = ""
+    SUPABASE_SERVICE_ROLE_KEY: str = ""
+
+    # --- UPSTREAM ENDPOINTS (Overridable for local stand-ins) ---
+    ANTHROPIC_BASE_URL: Optional[str] = None   # None = SDK default
+    GOOGLE_MAPS_BASE_URL: str = "https://maps.googleapis.com"
+    OPENWEATHER_FORECAST_URL: str = "http://api.openweathermap.org/data/2.5/forecast"
+
+    # --- SHARED HTTP POOL (Weather + distance matrix) ---
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 5.0           # Default; the matrix passes its own
 
     # --- PROJECT CONFIG ---
     PROJECT_NAME: str = "ITERA_ORCHESTRATOR"
     CLAUDE_MODEL: str = "claude-haiku-4-5-20251001" # Locked for ITERA Logic
 
+    # --- LLM CLIENT (Shared across all agents) ---
+    LLM_MAX_CONNECTIONS: int = 20     # Keep-alive pool size
+    LLM_KEEPALIVE_SECONDS: float = 30.0
+    LLM_TIMEOUT_SECONDS: float = 60.0
+
+    # --- GEOCODING (Researcher fan-out) ---
+    GEOCODE_TIMEOUT_SECONDS: float = 5.0
+    GEOCODE_CACHE_PATH: str = ".itera_cache/geocode.sqlite3"
+    GEOCODE_CACHE_TTL_SECONDS: int = 30 * 24 * 3600   # Landmarks rarely move
+    GEOCODE_NEGATIVE_TTL_SECONDS: int = 24 * 3600     # Retry unknown places daily
+    GEOCODE_CACHE_MAX_ITEMS: int = 5000               # In-process LRU size
+
+    # --- POI CATALOG (Per-city places, grown from verified pools) ---
+    POI_CATALOG_PATH: str = ".itera_cache/poi_catalog.sqlite3"
+    POI_CATALOG_RADIUS_KM: float = 5.0        # "Near the stay" for catalog lookups
+    POI_CATALOG_CACHED_CITIES: int = 64       # City indexes kept in memory
+
+    # --- WEATHER (One cached 5-day forecast per city) ---
+    WEATHER_TTL_SECONDS: int = 1800             # OpenWeather refreshes forecasts every 3h
+    WEATHER_CACHE_MAX_CITIES: int = 512
+    WEATHER_TIMEOUT_SECONDS: float = 3.0
+
+    # --- LOGISTICS (Local route solver) ---
+    ROUTE_SOLVER_BUDGET_MS: int = 50  # Time budget for 2-opt/Or-opt refinement
+    DAY_PLANNER_BUDGET_MS: int = 20   # Per-day sequencing budget, shared across the trip's days
+
+    # --- DISTANCE MATRIX (Tiled + cached) ---
+    DISTANCE_MATRIX_URL: str = "https://maps.googleapis.com/maps/api/distancematrix/json"
+    DISTANCE_MATRIX_TILE_SIDE: int = 10        # 10 x 10 = Google's 100-element cap
+    DISTANCE_MATRIX_TIMEOUT_SECONDS: float = 10.0
+    DISTANCE_MATRIX_TTL_SECONDS: int = 7 * 24 * 3600
+    DISTANCE_MATRIX_COORD_DIGITS: int = 4      # ~11m rounding for cache keys
+    DISTANCE_MATRIX_CACHE_MAX_PAIRS: int = 200_000
+
+    # --- SENSING STAGE (Per-branch timeouts, seconds) ---
+    SENSE_GEOCODE_TIMEOUT_SECONDS: float = 4.0
+    SENSE_WEATHER_TIMEOUT_SECONDS: float = 3.0
+    SENSE_MEMORY_TIMEOUT_SECONDS: float = 2.0
+
+    # --- ADMISSION (Endpoint queueing; /chat is served before /plan) ---
+    ADMISSION_MAX_INFLIGHT: int = 32            # /chat + /plan requests being handled
+    ADMISSION_PLAN_MAX_INFLIGHT: int = 24       # Plans stop here so chats always have headroom
+    ADMISSION_MAX_QUEUE: int = 64               # Waiting requests per priority; beyond this 429
+    ADMISSION_MAX_WAIT_SECONDS: float = 10.0    # Queued longer than this -> 503
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1      # Floor for the Retry-After estimate
+
+    # --- UPSTREAM BUDGETS (Whole deployment: calls in flight + start rate, 0 = no rate limit) ---
+    UPSTREAM_API_SHARE: float = 0.5             # The API's part (sync /plan, every /chat); workers split the rest
+    UPSTREAM_BUDGET_WORKERS: int = 0            # Worker processes splitting their part; 0 = JOB_WORKERS
+    ANTHROPIC_MAX_CONCURRENCY: int = 8
+    ANTHROPIC_RATE_PER_SECOND: float = 0.0
+    ANTHROPIC_BURST: int = 8
+    MAPS_MAX_CONCURRENCY: int = 16              # Geocoding, Places and Distance Matrix together (the API gets 8)
+    MAPS_RATE_PER_SECOND: float = 40.0          # Under Google's default 50 QPS across all processes
+    MAPS_BURST: int = 20
+    WEATHER_MAX_CONCURRENCY: int = 4
+    WEATHER_RATE_PER_SECOND: float = 1.0        # OpenWeather free tier: 60 calls/minute across all processes
+    WEATHER_BURST: int = 10
+    SUPABASE_MAX_CONCURRENCY: int = 4
+    SUPABASE_RATE_PER_SECOND: float = 0.0
+    SUPABASE_BURST: int = 10
+
+    # --- PLAN CACHE (Whole /plan responses) ---
+    PLAN_CACHE_TTL_SECONDS: int = 900
+    PLAN_CACHE_MAX_ITEMS: int = 256
+    PLAN_CACHE_BUDGET_BAND: int = 250  # Budgets in the same $250 band share a plan
+
+    # --- CHAT ROUTER ---
+    INTENT_CONFIDENCE_THRESHOLD: float = 0.75  # Below this the Claude router decides
+
+    # --- PLAN JOBS (POST /plan/jobs, run by worker processes instead of the API loop) ---
+    JOB_BACKEND: str = "sqlite"                 # "sqlite" (shared file, workers anywhere on the host) or "memory" (broker process)
+    JOB_DB_PATH: str = ".itera_cache/jobs.sqlite3"
+    JOB_WORKERS: int = 2                        # Worker processes the API starts; 0 = run `python worker.py` yourself
+    JOB_WORKER_CONCURRENCY: int = 4             # Plans in flight per worker (each worker gets its share of the upstream budgets)
+    JOB_POLL_SECONDS: float = 0.2               # Idle workers and job subscribers check this often
+    JOB_HEARTBEAT_SECONDS: float = 2.0
+    JOB_LEASE_SECONDS: float = 30.0             # Running jobs without a heartbeat this long are requeued
+    JOB_MAX_ATTEMPTS: int = 2                   # Then the job fails instead
+    JOB_SHUTDOWN_SECONDS: float = 10.0          # Running jobs get this long to finish, then go back to the queue
+    JOB_RESULT_TTL_SECONDS: int = 24 * 3600     # Finished jobs are kept (and pollable) this long
+
+    # --- TRIP CONTEXT (Candidate pools kept for local replans) ---
+    TRIP_CONTEXT_TTL_SECONDS: int = 3 * 24 * 3600
+    TRIP_CONTEXT_MAX_ITEMS: int = 1024
+
+    # --- PERSISTENCE (Write-behind Supabase queue) ---
+    WRITE_BATCH_SIZE: int = 50                  # Rows per multi-row insert
+    WRITE_FLUSH_INTERVAL_SECONDS: float = 0.5
+    WRITE_MAX_RETRIES: int = 3                  # Backoff 0.5s, 1s, 2s before spooling
+    WRITE_RETRY_BASE_SECONDS: float = 0.5
+    WRITE_QUEUE_MAX_ITEMS: int = 10_000         # Beyond this rows go straight to the spool
+    WRITE_SPOOL_PATH: str = ".itera_cache/write_spool.sqlite3"
+    WRITE_REPLAY_INTERVAL_SECONDS: float = 30.0
+    WRITE_REPLAY_LEASE_SECONDS: float = 120.0   # Spooled rows claimed by a process that died are resent after this
+    WRITE_SHUTDOWN_TIMEOUT_SECONDS: float = 5.0
+
+    # --- MEMORY INDEX (Vector recall over past insights) ---
+    MEMORY_VECTOR_DIM: int = 256
+    MEMORY_TOP_K: int = 5
+    MEMORY_MIN_SCORE: float = 0.1               # Cosine floor; weaker matches stay out of the prompt
+    MEMORY_IVF_MIN_ITEMS: int = 50_000          # Flat search below this, IVF lists above
+    MEMORY_IVF_NPROBE: int = 8
+    MEMORY_BOOTSTRAP_LIMIT: int = 20_000        # Rows pulled from Supabase on first use
+    MEMORY_RESYNC_SECONDS: float = 60.0         # Then rows newer than the last pull, this often (other processes' inserts)
+    MEMORY_INDEX_MMAP_DIR: Optional[str] = None # Back the vector matrices with files here
+
+    # --- INSIGHT EXTRACTION (Batched per chat session) ---
+    INSIGHT_WINDOW_SIZE: int = 8                # Messages per extraction prompt
+    INSIGHT_FLUSH_SECONDS: float = 20.0         # Debounce: extract after this long without a message
+    INSIGHT_DUPLICATE_SCORE: float = 0.9        # Cosine at/above this = preference already held
+
+    # --- TELEMETRY ---
+    LOG_LEVEL: str = "INFO"                     # Root level; DEBUG adds one line per upstream call
+
     # --- CONFIGURATION SETTINGS ---
     # This tells Pydantic to look for the .env file and ignore extra variables
     model_config = SettingsConfigDict(
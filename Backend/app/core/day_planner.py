@@ -0,0 +1,166 @@
+# Backend/app/core/day_planner.py
+"""
+Splits a trip's POI pool into days locally.
+
+Stops are clustered into `days` compact groups whose sizes differ by at
+most one (capacity-constrained k-means on an equirectangular km
+projection, then pairwise swaps). The groups are put in a day order that
+sweeps around the hotel, with the most Indoor groups on wet forecast
+days, and each day is sequenced as an open path from the hotel with the
+route solver.
+"""
+import math
+import numpy as np
+from app.core.route_solver import EARTH_RADIUS_KM, solve_route
+
+MAX_ITERATIONS = 10   # Capacity assignment can oscillate; swap refinement finishes the job
+KMEANS_SEED = 7     # Same pool, same days
+
+
+def project_km(lats, lons) -> np.ndarray:
+    """(n, 2) planar km coordinates; accurate enough at city scale."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    x = (lon - lon.mean()) * np.cos(lat.mean()) * EARTH_RADIUS_KM
+    y = (lat - lat.mean()) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+
+def _seed_centers(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding."""
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        d2 = ((points[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        total = d2.sum()
+        pick = rng.choice(len(points), p=d2 / total) if total > 0 else rng.integers(len(points))
+        centers.append(points[pick])
+    return np.array(centers)
+
+
+def _assign(dist: np.ndarray) -> np.ndarray:
+    """
+    Balanced assignment (every group gets floor(n/k) or ceil(n/k) points):
+    points with the most to lose, i.e. the largest gap between their best
+    and second-best group, choose first.
+    """
+    n, k = dist.shape
+    prefs = np.argsort(dist, axis=1)
+    ranked = np.sort(dist, axis=1)
+    regret = ranked[:, 1] - ranked[:, 0] if k > 1 else np.zeros(n)
+    labels = np.empty(n, dtype=np.intp)
+    room = np.full(k, n // k)
+    extras = n - (n // k) * k     # Groups that may take one more than floor(n/k)
+    topped = np.zeros(k, dtype=bool)
+    for i in np.argsort(-regret, kind="stable"):
+        for group in prefs[i]:
+            if room[group]:
+                room[group] -= 1
+            elif extras and not topped[group]:
+                topped[group] = True
+                extras -= 1
+            else:
+                continue
+            labels[i] = group
+            break
+    return labels
+
+
+def _centers(points: np.ndarray, labels: np.ndarray, k: int) -> np.ndarray:
+    counts = np.maximum(np.bincount(labels, minlength=k), 1)[:, None]
+    sums = np.column_stack([np.bincount(labels, weights=points[:, axis], minlength=k) for axis in (0, 1)])
+    return sums / counts
+
+
+def _swap_refine(points: np.ndarray, labels: np.ndarray, k: int) -> np.ndarray:
+    """Pairwise swaps between groups while any shortens the total distance to group centres."""
+    labels = labels.copy()
+    rows = np.arange(len(points))
+    for _ in range(len(points)):
+        centers = _centers(points, labels, k)
+        dist = np.sqrt(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        own = dist[rows, labels]
+        # gain[i, j]: saving from moving i to j's group and j to i's
+        gain = own[:, None] + own[None, :] - dist[:, labels] - dist[:, labels].T
+        gain[labels[:, None] == labels[None, :]] = 0.0
+        i, j = np.unravel_index(np.argmax(gain), gain.shape)
+        if gain[i, j] <= 1e-9:
+            break
+        labels[i], labels[j] = labels[j], labels[i]
+    return labels
+
+
+def balanced_kmeans(points: np.ndarray, k: int) -> np.ndarray:
+    """Labels (0..k-1) for each point; group sizes differ by at most one."""
+    rng = np.random.default_rng(KMEANS_SEED)
+    centers = _seed_centers(points, k, rng)
+    labels = None
+    for _ in range(MAX_ITERATIONS):
+        dist = np.sqrt(((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        new_labels = _assign(dist)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centers = _centers(points, labels, k)
+    return _swap_refine(points, labels, k)
+
+
+def _day_order(centroids: np.ndarray, hotel: np.ndarray, indoor_share: np.ndarray, wet_days: list) -> list:
+    """
+    Group index for each day: the group nearest the hotel on day 1, then a
+    sweep around the hotel so consecutive days are neighbours. When the
+    forecast marks days as wet, the most Indoor groups move onto them.
+    """
+    offsets = centroids - hotel
+    angles = np.arctan2(offsets[:, 1], offsets[:, 0])
+    first = int(np.argmin(np.hypot(offsets[:, 0], offsets[:, 1])))
+    sweep = sorted(range(len(centroids)), key=lambda g: (angles[g] - angles[first]) % (2 * math.pi))
+    wet = [d for d, is_wet in enumerate(wet_days[:len(sweep)]) if is_wet]
+    if not wet or len(wet) == len(sweep):
+        return sweep
+    by_indoor = sorted(sweep, key=lambda g: -indoor_share[g])
+    wet_groups = set(by_indoor[:len(wet)])
+    wet_iter = iter([g for g in sweep if g in wet_groups])
+    dry_iter = iter([g for g in sweep if g not in wet_groups])
+    return [next(wet_iter) if d in wet else next(dry_iter) for d in range(len(sweep))]
+
+
+def plan_days(poi_pool: list, days: int, durations: np.ndarray, wet_days: list = None,
+              time_budget: float = 0.05) -> list:
+    """
+    The pool reordered day by day, every POI tagged with its 'day'.
+    Index 0 (the hotel) stays first as the Day 1 anchor; each day is
+    sequenced from the hotel over `durations` (seconds, pool order).
+    """
+    if not poi_pool:
+        return []
+    hotel, stops = poi_pool[0], np.arange(1, len(poi_pool))
+    k = max(1, min(int(days), len(stops)))
+    if not len(stops):
+        return [{**hotel, "day": 1}]
+
+    points = project_km([p["lat"] for p in poi_pool], [p["lon"] for p in poi_pool])
+    labels = balanced_kmeans(points[stops], k)
+    centroids = np.array([points[stops[labels == g]].mean(axis=0) for g in range(k)])
+    indoor = np.array([np.mean([poi_pool[i].get("type") == "Indoor" for i in stops[labels == g]])
+                       for g in range(k)])
+    order = _day_order(centroids, points[0], indoor, list(wet_days or []))
+
+    planned = [{**hotel, "day": 1}]
+    for day, group in enumerate(order, start=1):
+        members = [0] + stops[labels == group].tolist()
+        sub = durations[np.ix_(members, members)]
+        route = solve_route(sub, time_budget / k)
+        planned += [{**poi_pool[members[i]], "day": day} for i in route[1:]]
+    return planned
+
+
+def day_spread_km(planned: list) -> float:
+    """Mean distance (km) from each stop to its day's centroid: lower is more compact."""
+    stops = [p for p in planned[1:] if p.get("day")]
+    if not stops:
+        return 0.0
+    points = project_km([p["lat"] for p in stops], [p["lon"] for p in stops])
+    labels = np.array([p["day"] for p in stops])
+    spread = [np.hypot(*(points[labels == d] - points[labels == d].mean(axis=0)).T).mean()
+              for d in np.unique(labels)]
+    return round(float(np.mean(spread)), 2)
@@ -0,0 +1,152 @@
+# Backend/app/core/geo_cache.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_MISS = object()
+
+
+def normalize_key(place_name: str, city: str) -> str:
+    """'  Sagrada  Família ', 'barcelona' -> 'sagrada família|barcelona'"""
+    def norm(text):
+        return " ".join((text or "").lower().replace(",", " ").split())
+    return f"{norm(place_name)}|{norm(city)}"
+
+
+class GeocodeCache:
+    """
+    Two-tier geocode cache: an in-process LRU in front of a SQLite file.
+    The SQLite tier survives restarts and is shared by every uvicorn worker
+    on the host (WAL mode, one connection per thread).
+    `None` values are cached too (negative caching) with a shorter TTL.
+    """
+
+    def __init__(self, path: str, ttl: float, negative_ttl: float, max_items: int):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_items = max_items
+        self._lru = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "negative_hits": 0, "misses": 0, "stores": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                "key TEXT PRIMARY KEY, payload TEXT, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, expires_at, value):
+        with self._lock:
+            self._lru[key] = (expires_at, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def _count(self, stat, value):
+        with self._lock:
+            self.stats[stat] += 1
+            if value is None:
+                self.stats["negative_hits"] += 1
+
+    def get_memory(self, place_name: str, city: str):
+        """LRU-only lookup, safe to call on the event loop. Returns CACHE_MISS on a miss."""
+        key = normalize_key(place_name, city)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._lru.move_to_end(key)
+                else:
+                    del self._lru[key]
+                    entry = None
+        if entry is None:
+            return CACHE_MISS
+        self._count("memory_hits", entry[1])
+        return entry[1]
+
+    def get(self, place_name: str, city: str):
+        """Full lookup (LRU then SQLite). Blocking; returns CACHE_MISS on a miss."""
+        value = self.get_memory(place_name, city)
+        if value is not CACHE_MISS:
+            return value
+
+        key = normalize_key(place_name, city)
+        try:
+            row = self._conn().execute(
+                "SELECT payload, expires_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Geocode cache read error: %s", e)
+            row = None
+
+        if row is None or row[1] <= time.time():
+            with self._lock:
+                self.stats["misses"] += 1
+            return CACHE_MISS
+
+        value = json.loads(row[0]) if row[0] is not None else None
+        self._remember(key, row[1], value)
+        self._count("disk_hits", value)
+        return value
+
+    def set(self, place_name: str, city: str, value):
+        """Stores a result; pass None to record that Google found nothing."""
+        key = normalize_key(place_name, city)
+        expires_at = time.time() + (self.ttl if value is not None else self.negative_ttl)
+        self._remember(key, expires_at, value)
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value) if value is not None else None, expires_at),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Geocode cache write error: %s", e)
+        with self._lock:
+            self.stats["stores"] += 1
+
+    def purge_expired(self) -> int:
+        """Drops expired rows from the SQLite tier (run at startup); returns how many went."""
+        try:
+            conn = self._conn()
+            removed = conn.execute("DELETE FROM geocode WHERE expires_at <= ?", (time.time(),)).rowcount
+            conn.commit()
+            return removed
+        except sqlite3.Error as e:
+            logger.warning("Geocode cache purge error: %s", e)
+            return 0
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return round(hits / total, 3) if total else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "hit_rate": self.hit_rate(), "memory_items": len(self._lru)}
+
+
+geocode_cache = GeocodeCache(
+    path=settings.GEOCODE_CACHE_PATH,
+    ttl=settings.GEOCODE_CACHE_TTL_SECONDS,
+    negative_ttl=settings.GEOCODE_NEGATIVE_TTL_SECONDS,
+    max_items=settings.GEOCODE_CACHE_MAX_ITEMS,
+)
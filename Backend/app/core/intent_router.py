@@ -0,0 +1,125 @@
+# Backend/app/core/intent_router.py
+"""
+Local REPLAN/CHAT router for /chat.
+
+Clear messages ("skip the museum", "what time does it open") are settled by
+lexical rules; the rest go through a small logistic-regression model over
+hashed word/bigram/char-trigram features, trained on first use from
+app/core/data/intent_examples.jsonl (a few ms). Only messages the model is
+unsure about are escalated to the Claude router.
+"""
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from app.core.config import settings
+from app.core.llm_client import ask_claude
+
+FEATURE_DIM = 1 << 12
+_DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_examples.jsonl")
+
+_REPLAN_CUES = re.compile(
+    r"\b(skip|skipping|delay|delayed|late|behind schedule|rain|raining|rainy|pouring|storm|snow|snowing|"
+    r"move|reschedule|postpone|cancel|cancelled|swap|replace|drop|remove|replan|rearrange|reorder|"
+    r"shift|push|instead|closed|missed|overslept|change the plan)\b"
+)
+_CHAT_CUES = re.compile(
+    r"^(what|what's|whats|how|where|when|who|why|which|is|are|do|does|can i|tell me|thanks|thank you|hi|hello)\b"
+)
+
+router_stats = {"rules": 0, "model": 0, "llm": 0}
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def featurize(text: str) -> np.ndarray:
+    """L2-normalized hashed bag of words, bigrams and char trigrams."""
+    words = _tokens(text)
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"^{w}$"
+        feats += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    vec = np.zeros(FEATURE_DIM, dtype=np.float32)
+    for f in feats:
+        vec[zlib.crc32(f.encode()) & (FEATURE_DIM - 1)] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def train_model(examples: list, epochs: int = 300, lr: float = 2.0, l2: float = 1e-3):
+    """Full-batch logistic regression; label 1 = REPLAN. Returns (weights, bias)."""
+    X = np.stack([featurize(e["text"]) for e in examples])
+    y = np.array([1.0 if e["label"] == "REPLAN" else 0.0 for e in examples], dtype=np.float32)
+    w = np.zeros(FEATURE_DIM, dtype=np.float32)
+    b = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+        grad = p - y
+        w -= lr * (X.T @ grad / len(y) + l2 * w)
+        b -= lr * float(grad.mean())
+    return w, b
+
+
+def _load_examples() -> list:
+    with open(_DATA_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def model() -> tuple:
+    """(weights, bias), trained once on first use so importing the router costs nothing."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = train_model(_load_examples())
+    return _model
+
+
+def classify_intent(message: str) -> dict:
+    """Local decision: {'intent': 'REPLAN'|'CHAT', 'confidence': 0-1, 'source': 'rules'|'model'}."""
+    text = message.lower().strip()
+    replan_hit = bool(_REPLAN_CUES.search(text))
+    chat_hit = bool(_CHAT_CUES.search(text))
+    if replan_hit != chat_hit:
+        return {"intent": "REPLAN" if replan_hit else "CHAT", "confidence": 0.97, "source": "rules"}
+
+    weights, bias = model()
+    p = float(1.0 / (1.0 + np.exp(-(featurize(text) @ weights + bias))))
+    intent = "REPLAN" if p >= 0.5 else "CHAT"
+    return {"intent": intent, "confidence": round(max(p, 1.0 - p), 3), "source": "model"}
+
+
+async def llm_route(message: str) -> str:
+    """The original Claude router; used only below the confidence threshold."""
+    router_prompt = f"""
+    Analyze user message: "{message}"
+    If they want to change plans, skip an activity, or report a delay: Reply 'REPLAN'.
+    If they are asking a general question: Reply 'CHAT'.
+    Reply ONLY with the word.
+    """
+    route_res = await ask_claude(
+        "router",
+        max_tokens=10,
+        messages=[{"role": "user", "content": router_prompt}]
+    )
+    return "REPLAN" if "REPLAN" in route_res.content[0].text.strip() else "CHAT"
+
+
+async def route_message(message: str) -> dict:
+    decision = classify_intent(message)
+    if decision["confidence"] >= settings.INTENT_CONFIDENCE_THRESHOLD:
+        router_stats[decision["source"]] += 1
+        return decision
+
+    router_stats["llm"] += 1
+    return {"intent": await llm_route(message), "confidence": None, "source": "llm"}
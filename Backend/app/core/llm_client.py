@@ -0,0 +1,72 @@
+# Backend/app/core/llm_client.py
+import time
+from collections import deque
+from app.core.admission import budgets
+from app.core.config import settings
+from app.core.services import services
+from app.core.telemetry import LLM_TOKENS, track_upstream
+
+# Every agent shares the container's client (one keep-alive pool), and the
+# Anthropic budget caps (and orders, chat first) the Claude calls in flight.
+
+# Token accounting: running totals per agent plus the most recent calls
+usage_by_agent = {}
+recent_calls = deque(maxlen=200)
+
+
+def record_usage(agent: str, usage, seconds: float):
+    """Adds one call's input/output tokens and latency to the per-agent totals."""
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    totals = usage_by_agent.setdefault(
+        agent, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0}
+    )
+    totals["calls"] += 1
+    totals["input_tokens"] += input_tokens
+    totals["output_tokens"] += output_tokens
+    totals["seconds"] += seconds
+    LLM_TOKENS.labels(agent, "input").inc(input_tokens)
+    LLM_TOKENS.labels(agent, "output").inc(output_tokens)
+    recent_calls.append({
+        "agent": agent,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "ms": round(seconds * 1000, 1),
+    })
+
+
+def usage_snapshot() -> dict:
+    return {
+        "agents": {
+            agent: {**totals, "seconds": round(totals["seconds"], 3)}
+            for agent, totals in usage_by_agent.items()
+        },
+        "recent": list(recent_calls)[-20:],
+    }
+
+
+async def ask_claude(agent: str, **kwargs):
+    """
+    Non-blocking replacement for client.messages.create.
+    `agent` names the caller so usage can be attributed per agent.
+    """
+    kwargs.setdefault("model", settings.CLAUDE_MODEL)
+    async with budgets["anthropic"].slot():
+        started = time.perf_counter()
+        with track_upstream("anthropic", agent):
+            res = await services.llm.messages.create(**kwargs)
+    record_usage(agent, getattr(res, "usage", None), time.perf_counter() - started)
+    return res
+
+
+async def stream_claude(agent: str, **kwargs):
+    """Async generator of text deltas; holds a concurrency slot until the stream ends."""
+    kwargs.setdefault("model", settings.CLAUDE_MODEL)
+    async with budgets["anthropic"].slot():
+        started = time.perf_counter()
+        with track_upstream("anthropic", agent):
+            async with services.llm.messages.stream(**kwargs) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final = await stream.get_final_message()
+    record_usage(agent, getattr(final, "usage", None), time.perf_counter() - started)
@@ -0,0 +1,155 @@
+# Backend/app/core/matrix_service.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+import numpy as np
+from app.core.admission import budgets
+from app.core.config import settings
+from app.core.services import services
+from app.core.telemetry import track_upstream
+from app.core.route_solver import haversine_matrix, CITY_SPEED_KMH, UNROUTABLE_PENALTY
+
+logger = logging.getLogger(__name__)
+
+# Google caps a request at 25 origins, 25 destinations and 100 elements.
+MAX_SIDE = 25
+MAX_ELEMENTS = 100
+
+# (origin, destination) rounded coords -> (expires_at, seconds)
+_pair_cache = OrderedDict()
+stats = {"pairs_cached": 0, "pairs_fetched": 0, "requests": 0, "failed_tiles": 0}
+
+
+def coord_key(lat: float, lon: float) -> tuple:
+    """~11m grid: POIs that geocode a few metres apart share cache entries."""
+    digits = settings.DISTANCE_MATRIX_COORD_DIGITS
+    return (round(float(lat), digits), round(float(lon), digits))
+
+
+def _cache_get(origin: tuple, dest: tuple):
+    entry = _pair_cache.get((origin, dest))
+    if entry is None:
+        return None
+    if entry[0] <= time.time():
+        del _pair_cache[(origin, dest)]
+        return None
+    return entry[1]
+
+
+def _cache_put(origin: tuple, dest: tuple, seconds: float):
+    _pair_cache[(origin, dest)] = (time.time() + settings.DISTANCE_MATRIX_TTL_SECONDS, seconds)
+    _pair_cache.move_to_end((origin, dest))
+    while len(_pair_cache) > settings.DISTANCE_MATRIX_CACHE_MAX_PAIRS:
+        _pair_cache.popitem(last=False)
+
+
+def plan_tiles(missing: np.ndarray, tile_side: int) -> list:
+    """
+    Splits the N x N missing-pair mask into request tiles.
+    Each tile is (origin_indices, destination_indices), trimmed to only the
+    rows/columns that still have a missing pair, and always within Google's
+    per-request element limits.
+    """
+    n = len(missing)
+    tiles = []
+    for r0 in range(0, n, tile_side):
+        for c0 in range(0, n, tile_side):
+            block = missing[r0:r0 + tile_side, c0:c0 + tile_side]
+            if not block.any():
+                continue
+            rows = [r0 + i for i in np.flatnonzero(block.any(axis=1))]
+            cols = [c0 + j for j in np.flatnonzero(block.any(axis=0))]
+            tiles.append((rows, cols))
+    return tiles
+
+
+async def _fetch_tile(points: list, rows: list, cols: list):
+    """One Distance Matrix request. Returns {(i, j): seconds} or None on failure."""
+    origins = "|".join(f"{points[i][0]},{points[i][1]}" for i in rows)
+    destinations = "|".join(f"{points[j][0]},{points[j][1]}" for j in cols)
+    params = {"origins": origins, "destinations": destinations, "key": settings.GOOGLE_MAPS_KEY}
+
+    async with budgets["maps"].slot():
+        try:
+            stats["requests"] += 1
+            with track_upstream("distance_matrix", "tile"):
+                res = await services.http.get(settings.DISTANCE_MATRIX_URL, params=params,
+                                             timeout=settings.DISTANCE_MATRIX_TIMEOUT_SECONDS)
+            data = res.json()
+        except Exception as e:
+            logger.warning("Distance Matrix tile error: %s", e)
+            return None
+
+    if data.get("status") != "OK" or len(data.get("rows", [])) != len(rows):
+        logger.warning("Distance Matrix tile rejected: %s", data.get('status'))
+        return None
+
+    durations = {}
+    for i, row in zip(rows, data["rows"]):
+        for j, item in zip(cols, row.get("elements", [])):
+            if item.get("status") == "OK" and "duration" in item:
+                durations[(i, j)] = float(item["duration"]["value"])
+            else:
+                durations[(i, j)] = float(UNROUTABLE_PENALTY)
+    return durations
+
+
+async def fetch_duration_matrix(locations: list) -> np.ndarray:
+    """
+    Dense N x N travel-time matrix (seconds) for a list of {'lat','lon'} dicts.
+    Cached pairs are reused, only the missing pairs are requested (in
+    compliant tiles, concurrently), and anything Google can't answer is
+    filled with a haversine estimate so the result is always complete.
+    """
+    keys = [coord_key(loc['lat'], loc['lon']) for loc in locations]
+    points = list(dict.fromkeys(keys))          # Unique coords, stable order
+    index = {p: i for i, p in enumerate(points)}
+    m = len(points)
+
+    unique = np.full((m, m), np.nan)
+    np.fill_diagonal(unique, 0.0)
+    for i, a in enumerate(points):
+        for j, b in enumerate(points):
+            if i != j:
+                cached = _cache_get(a, b)
+                if cached is not None:
+                    unique[i, j] = cached
+    missing = np.isnan(unique)
+    stats["pairs_cached"] += int(m * (m - 1) - missing.sum())
+
+    tile_side = max(1, min(settings.DISTANCE_MATRIX_TILE_SIDE, MAX_SIDE, int(MAX_ELEMENTS ** 0.5)))
+    tiles = plan_tiles(missing, tile_side)
+    results = await asyncio.gather(*(_fetch_tile(points, rows, cols) for rows, cols in tiles))
+
+    for durations in results:
+        if durations is None:
+            stats["failed_tiles"] += 1
+            continue
+        for (i, j), seconds in durations.items():
+            if i != j and missing[i, j]:
+                unique[i, j] = seconds
+                _cache_put(points[i], points[j], seconds)
+                stats["pairs_fetched"] += 1
+
+    if np.isnan(unique).any():
+        km = haversine_matrix([p[0] for p in points], [p[1] for p in points])
+        unique = np.where(np.isnan(unique), km / CITY_SPEED_KMH * 3600.0, unique)
+
+    idx = np.array([index[k] for k in keys], dtype=np.intp)
+    return unique[np.ix_(idx, idx)]
+
+
+def cached_duration_matrix(locations: list):
+    """Cache-only view (no network): dense matrix with NaN for unknown pairs."""
+    keys = [coord_key(loc['lat'], loc['lon']) for loc in locations]
+    n = len(keys)
+    out = np.full((n, n), np.nan)
+    for i, a in enumerate(keys):
+        for j, b in enumerate(keys):
+            if a == b:
+                out[i, j] = 0.0
+            else:
+                cached = _cache_get(a, b)
+                out[i, j] = np.nan if cached is None else cached
+    return out
@@ -1,17 +1,23 @@
 # Backend/app/core/memory_engine.py
-from app.db.supabase_client import supabase
+import logging
+from app.core.config import settings
+from app.core.vector_index import user_insight_index
+from app.db.supabase_client import ensure_index_loaded
 
-async def get_relevant_memories(target_city: str):
+logger = logging.getLogger(__name__)
+
+async def get_relevant_memories(target_city: str, context: str = ""):
     """
-    Lite RAG: Pulls any past preferences related to the city or 
-    general user vibes to inject into the Researcher.
+    Lite RAG: Pulls the past preferences closest to this trip (city plus
+    persona/interests) from the in-process vector index, so only relevant
+    ones are injected into the Researcher.
     """
     try:
-        # Pull everything (small scale) and let the LLM filter in the prompt
-        res = supabase.table("user_insights").select("insight_text").order("created_at", desc=True).limit(10).execute()
-        if res.data:
-            return " | ".join([m['insight_text'] for m in res.data])
-        return ""
+        await ensure_index_loaded(user_insight_index, "user_insights", "insight_text", order_by="created_at")
+        hits = user_insight_index.search(
+            f"{target_city} {context}", settings.MEMORY_TOP_K, settings.MEMORY_MIN_SCORE
+        )
+        return " | ".join(text for _, text in hits)
     except Exception as e:
-        print(f"Memory Retrieval Error: {e}")
-        return ""
\ No newline at end of file
+        logger.warning("Memory Retrieval Error: %s", e)
+        return ""
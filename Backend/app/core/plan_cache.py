@@ -0,0 +1,154 @@
+# Backend/app/core/plan_cache.py
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from app.core.config import settings
+
+
+def canonical_plan_key(req: dict) -> str:
+    """
+    Stable key for a PlanRequest: case/whitespace-insensitive text fields,
+    interests sorted and de-duplicated, budget bucketed into bands so
+    $1,980 and $2,040 plans share an entry. The day window (with its AM/PM
+    toggle) and the start date are part of it.
+    """
+    def norm(text):
+        return " ".join(str(text or "").lower().split())
+
+    band = max(1, settings.PLAN_CACHE_BUDGET_BAND)
+    canonical = {
+        "destination": norm(req.get("destination")),
+        "persona": norm(req.get("persona")),
+        "duration": int(req.get("duration") or 0),
+        "budget_band": int(req.get("budgetMax") or 0) // band,
+        "interests": sorted({norm(i) for i in req.get("interests") or [] if norm(i)}),
+        "religious": bool(req.get("isReligious")),
+        "accommodation": norm(req.get("accommodation")),
+        # startTime is read with the AM/PM toggle, and the date picks the forecast days and wet-day swaps
+        "window": [norm(req.get("startTime")), norm(req.get("timePeriod")), norm(req.get("endTime"))],
+        "start_date": norm(req.get("startDate")),
+    }
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class PlanCache:
+    """
+    TTL + size-bounded cache of finished /plan responses, with single-flight
+    dedupe: concurrent identical requests await one shared computation
+    instead of each running the full agent pipeline.
+    """
+
+    def __init__(self, ttl: float, max_items: int):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries = OrderedDict()   # key -> (expires_at, response)
+        self._inflight = {}             # key -> asyncio.Task
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0, "evictions": 0}
+
+    def peek(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, response: dict):
+        self._entries[key] = (time.time() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def inflight(self, key: str):
+        return self._inflight.get(key)
+
+    def track(self, key: str, coro) -> asyncio.Task:
+        """Runs `coro` as the single in-flight computation for key; caches its result."""
+        task = asyncio.create_task(coro)
+        self._inflight[key] = task
+
+        def _done(t: asyncio.Task):
+            if self._inflight.get(key) is t:
+                del self._inflight[key]
+            if not t.cancelled() and t.exception() is None:
+                self.put(key, t.result())
+
+        task.add_done_callback(_done)
+        return task
+
+    async def get_or_compute(self, key: str, compute, bypass: bool = False):
+        """
+        Returns (response, source) where source is 'hit', 'coalesced',
+        'miss' or 'bypass'. `compute` is a zero-arg coroutine function.
+        The computation runs as its own task, so a client disconnecting
+        doesn't cancel the work other waiters are sharing.
+        """
+        if bypass:
+            self.stats["bypassed"] += 1
+            return await asyncio.shield(self.track(key, compute())), "bypass"
+
+        cached = self.peek(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached, "hit"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task), "coalesced"
+
+        self.stats["misses"] += 1
+        return await asyncio.shield(self.track(key, compute())), "miss"
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["coalesced"] + self.stats["misses"]
+        served = self.stats["hits"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+        }
+
+
+class PlanEventLog:
+    """
+    Events of one in-flight plan. Every SSE request following that plan
+    replays what has happened so far and then gets new events as they land.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.closed = False
+        self._wake = asyncio.Event()
+
+    def publish(self, item):
+        self.items.append(item)
+        self._wake.set()
+        self._wake = asyncio.Event()
+
+    def close(self):
+        self.closed = True
+        self._wake.set()
+
+    async def follow(self):
+        seen = 0
+        while True:
+            while seen < len(self.items):
+                yield self.items[seen]
+                seen += 1
+            if self.closed:
+                return
+            await self._wake.wait()
+
+
+plan_cache = PlanCache(ttl=settings.PLAN_CACHE_TTL_SECONDS, max_items=settings.PLAN_CACHE_MAX_ITEMS)
+
+# plan_id (minted per computed plan, not the cache key) -> replan context for the local repair engine.
+# Only peek/put are used; it outlives the plan cache so replans mid-trip still find it.
+trip_contexts = PlanCache(ttl=settings.TRIP_CONTEXT_TTL_SECONDS, max_items=settings.TRIP_CONTEXT_MAX_ITEMS)
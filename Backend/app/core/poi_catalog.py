@@ -0,0 +1,406 @@
+# Backend/app/core/poi_catalog.py
+"""
+Local per-city POI catalog.
+
+Every verified poi_pool is folded into a SQLite file (one compact row per
+place: coordinates, geohash cell, type, price level and an interest-tag
+bitmask). Lookups load a city once into NumPy arrays bucketed by geohash
+cell, so "near the hotel, Indoor, matches food/art" is a cell scan plus a
+vectorized filter. The researcher assembles pools from here and only asks
+Claude to fill the gaps.
+
+Offline build from past journeys or a JSON dump:
+
+    cd Backend && python -m app.core.poi_catalog --from-supabase
+    cd Backend && python -m app.core.poi_catalog --from-json pois.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.core.config import settings
+from app.core.route_solver import haversine_from
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_PRECISION = 6    # Stored cell, ~1.2 x 0.6 km
+CELL_PRECISION = 5       # Lookup bucket, ~4.9 x 4.9 km
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+TYPES = ("Indoor", "Outdoor", "Stay")
+
+# Title/type keywords that mark a place of worship (multi-lingual, word-bounded
+# so "Water Park" or "Templeton Café" don't trip it).
+RELIGIOUS_KEYWORDS = (
+    "church", "cathedral", "basilica", "chapel", "abbey", "monastery", "convent",
+    "minster", "parish", "temple", "mosque", "masjid", "mezquita", "synagogue",
+    "shrine", "gurudwara", "gurdwara", "mandir", "pagoda", "stupa", "dargah",
+    "wat", "iglesia", "catedral", "église", "cathédrale", "kirche", "dom",
+    "duomo", "chiesa", "sagrada", "religious", "worship",
+)
+
+# Interest tags, one bit each; matched against interests and against POI name/description
+TAG_KEYWORDS = {
+    "food": ("food", "foodie", "restaurant", "cafe", "café", "coffee", "bakery", "tapas", "bistro", "eatery",
+             "cuisine", "dining", "brunch", "gastro", "culinary", "tea", "market", "hall"),
+    "art": ("art", "arts", "gallery", "museum", "design", "mural", "studio", "exhibition", "modern"),
+    "history": ("history", "historic", "heritage", "castle", "palace", "fort", "fortress", "ruins", "old",
+                "monument", "museum", "quarter", "medieval", "ancient", "roman"),
+    "nature": ("nature", "park", "garden", "gardens", "botanical", "beach", "trail", "hike", "hiking", "lake",
+               "river", "mountain", "hill", "viewpoint", "forest", "lakeside", "harbour", "promenade"),
+    "nightlife": ("nightlife", "bar", "bars", "club", "jazz", "pub", "cocktail", "rooftop", "night", "cellar"),
+    "shopping": ("shopping", "shop", "shops", "boutique", "bazaar", "mall", "flea", "market", "bookshop",
+                 "artisan", "vintage"),
+    "culture": ("culture", "cultural", "theatre", "theater", "opera", "concert", "music", "festival",
+                "cinema", "science", "centre", "center"),
+    "religious": RELIGIOUS_KEYWORDS,
+}
+TAG_BITS = {tag: 1 << i for i, tag in enumerate(TAG_KEYWORDS)}
+_TAG_PATTERNS = {
+    tag: re.compile(r"\b(" + "|".join(map(re.escape, words)) + r")\b", re.IGNORECASE)
+    for tag, words in TAG_KEYWORDS.items()
+}
+
+
+def tags_for(text: str) -> int:
+    """Bitmask of every interest tag whose keywords appear in text."""
+    mask = 0
+    for tag, pattern in _TAG_PATTERNS.items():
+        if pattern.search(text or ""):
+            mask |= TAG_BITS[tag]
+    return mask
+
+
+def tag_names(mask: int) -> list:
+    return [tag for tag, bit in TAG_BITS.items() if mask & bit]
+
+
+def normalize_type(value: str) -> str:
+    text = str(value or "").lower()
+    if "stay" in text or "hotel" in text or "hostel" in text:
+        return "Stay"
+    return "Indoor" if "indoor" in text else "Outdoor"
+
+
+def city_key(city: str) -> str:
+    return " ".join((city or "").lower().replace(",", " ").split())
+
+
+def name_key(name: str) -> str:
+    return " ".join(str(name or "").replace("_", " ").lower().split())
+
+
+def geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def cells_covering(lat: float, lon: float, radius_km: float, precision: int = CELL_PRECISION) -> set:
+    """Geohash cells that intersect the bounding box of a circle."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lon_bits
+    lat_step, lon_step = 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+    dlat = radius_km / 111.0
+    dlon = radius_km / max(111.0 * math.cos(math.radians(lat)), 1e-6)
+    cells = set()
+    for y in np.arange(lat - dlat, lat + dlat + lat_step, lat_step / 2):
+        for x in np.arange(lon - dlon, lon + dlon + lon_step, lon_step / 2):
+            cells.add(geohash(float(np.clip(y, -90, 90)), float((x + 180) % 360 - 180), precision))
+    return cells
+
+
+class CityIndex:
+    """One city's catalog rows as arrays, bucketed by geohash cell."""
+
+    def __init__(self, rows: list):
+        self.rows = rows   # (name, type, description, address, lat, lon, price_level, tags, seen)
+        self.lat = np.array([r[4] for r in rows], dtype=np.float64)
+        self.lon = np.array([r[5] for r in rows], dtype=np.float64)
+        self.type = np.array([TYPES.index(r[1]) for r in rows], dtype=np.int8)
+        self.price = np.array([r[6] for r in rows], dtype=np.int8)
+        self.tags = np.array([r[7] for r in rows], dtype=np.int64)
+        self.seen = np.array([r[8] for r in rows], dtype=np.float64)
+        self.cells = {}
+        for i, (lat, lon) in enumerate(zip(self.lat, self.lon)):
+            self.cells.setdefault(geohash(lat, lon, CELL_PRECISION), []).append(i)
+        self.cells = {cell: np.array(ids, dtype=np.intp) for cell, ids in self.cells.items()}
+
+    def near(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Row ids within radius_km: cell lookup, then an exact distance check."""
+        buckets = [self.cells[c] for c in cells_covering(lat, lon, radius_km) if c in self.cells]
+        if not buckets:
+            return np.empty(0, dtype=np.intp)
+        ids = np.concatenate(buckets)
+        return ids[haversine_from(lat, lon, self.lat[ids], self.lon[ids]) <= radius_km]
+
+    def poi(self, i: int) -> dict:
+        name, type_, description, address, lat, lon, price, _, _ = self.rows[i]
+        return {"title": name, "type": type_, "description": description, "lat": lat, "lon": lon,
+                "loc": address, "price_level": price}
+
+
+class POICatalog:
+
+    def __init__(self, path: str, radius_km: float, cached_cities: int):
+        self.path = path
+        self.radius_km = radius_km
+        self.cached_cities = cached_cities
+        self._cities = OrderedDict()   # city key -> CityIndex
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"lookups": 0, "full": 0, "partial": 0, "empty": 0, "ingested": 0, "loads": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS poi ("
+                "city TEXT NOT NULL, key TEXT NOT NULL, name TEXT NOT NULL, type TEXT NOT NULL, "
+                "description TEXT, address TEXT, lat REAL NOT NULL, lon REAL NOT NULL, cell TEXT NOT NULL, "
+                "price_level INTEGER, tags INTEGER NOT NULL, seen INTEGER NOT NULL DEFAULT 1, updated_at REAL, "
+                "PRIMARY KEY (city, key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS poi_cell ON poi (city, cell)")
+            self._local.conn = conn
+        return conn
+
+    # --- Writes ---
+
+    def ingest(self, city: str, pois: list) -> int:
+        """Upserts verified POIs (anything with coordinates); returns how many rows were touched."""
+        ckey, now, rows = city_key(city), time.time(), []
+        for p in pois or []:
+            try:
+                lat, lon = float(p["lat"]), float(p["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            name = str(p.get("title") or "").replace("_", " ").strip()
+            if not name:
+                continue
+            description = p.get("description") or ""
+            rows.append((ckey, name_key(name), name, normalize_type(p.get("type")), description,
+                         p.get("loc") or "", lat, lon, geohash(lat, lon),
+                         int(p.get("price_level") if p.get("price_level") is not None else 2),
+                         tags_for(f"{name} {description} {p.get('type', '')}"), now))
+        if not rows:
+            return 0
+        try:
+            conn = self._conn()
+            conn.executemany(
+                "INSERT INTO poi (city, key, name, type, description, address, lat, lon, cell, price_level, "
+                "tags, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (city, key) DO UPDATE SET type = excluded.type, lat = excluded.lat, "
+                "lon = excluded.lon, cell = excluded.cell, price_level = excluded.price_level, "
+                "address = excluded.address, tags = tags | excluded.tags, seen = seen + 1, "
+                "updated_at = excluded.updated_at",
+                rows,
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("POI catalog write error: %s", e)
+            return 0
+        with self._lock:
+            self._cities.pop(ckey, None)   # Reloaded with the new rows on next lookup
+            self.stats["ingested"] += len(rows)
+        return len(rows)
+
+    # --- Reads ---
+
+    def _city(self, city: str) -> CityIndex:
+        ckey = city_key(city)
+        with self._lock:
+            index = self._cities.get(ckey)
+            if index is not None:
+                self._cities.move_to_end(ckey)
+                return index
+        try:
+            rows = self._conn().execute(
+                "SELECT name, type, description, address, lat, lon, price_level, tags, seen "
+                "FROM poi WHERE city = ?", (ckey,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("POI catalog read error: %s", e)
+            rows = []
+        index = CityIndex(rows)
+        with self._lock:
+            self.stats["loads"] += 1
+            self._cities[ckey] = index
+            while len(self._cities) > self.cached_cities:
+                self._cities.popitem(last=False)
+        return index
+
+    def size(self, city: str) -> int:
+        return len(self._city(city).rows)
+
+    def lookup(self, city: str, near: dict = None, radius_km: float = None, types=None,
+               want_tags: int = 0, exclude_tags: int = 0, max_price: int = 4, limit: int = 15,
+               exclude_names=()) -> list:
+        """
+        Filtered, ranked POIs: within radius_km of `near` (whole city when None),
+        of the given types, without exclude_tags. Ranked by interest-tag
+        matches, then how often past plans used the place, then distance;
+        places above max_price rank lower instead of being dropped.
+        """
+        index = self._city(city)
+        if not index.rows:
+            return []
+        if near:
+            ids = index.near(near["lat"], near["lon"], radius_km or self.radius_km)
+        else:
+            ids = np.arange(len(index.rows), dtype=np.intp)
+        if types:
+            ids = ids[np.isin(index.type[ids], [TYPES.index(t) for t in types])]
+        if exclude_tags:
+            ids = ids[(index.tags[ids] & exclude_tags) == 0]
+        if exclude_names:
+            skip = {name_key(n) for n in exclude_names}
+            ids = np.array([i for i in ids if name_key(index.rows[i][0]) not in skip], dtype=np.intp)
+        if ids.size == 0:
+            return []
+
+        matches = np.zeros(ids.size)
+        for bit in TAG_BITS.values():
+            if want_tags & bit:
+                matches += (index.tags[ids] & bit) > 0
+        score = 2.0 * matches + 0.3 * np.log1p(index.seen[ids]) - 1.0 * (index.price[ids] > max_price)
+        if near:
+            score -= haversine_from(near["lat"], near["lon"], index.lat[ids], index.lon[ids]) / (
+                radius_km or self.radius_km)
+        order = ids[np.argsort(-score, kind="stable")][:limit]
+        return [index.poi(i) for i in order]
+
+    def assemble(self, city: str, interests: list, budget: int, limit: int = 15, near: dict = None,
+                 is_religious: bool = True, min_indoor: int = 0) -> list:
+        """
+        A researcher-shaped pool from the catalog: the stay first, then up to
+        limit-1 places near it (falling back to the whole city), at least
+        min_indoor of them Indoor when the catalog has them. May be short.
+        """
+        self.stats["lookups"] += 1
+        if not self.size(city):
+            self.stats["empty"] += 1
+            return []
+        want = tags_for(" ".join(interests or []))
+        exclude = 0 if is_religious else TAG_BITS["religious"]
+        max_price = 2 if budget < 1000 else 3 if budget < 3000 else 4
+        hostel = budget <= 250
+
+        stays = self.lookup(city, near=near, types=("Stay",), max_price=max_price, limit=10) or \
+            self.lookup(city, types=("Stay",), max_price=max_price, limit=10)
+        if hostel:
+            stays.sort(key=lambda p: p["price_level"])
+        pool = stays[:1]
+        anchor = {"lat": pool[0]["lat"], "lon": pool[0]["lon"]} if pool else near
+        taken = [p["title"] for p in pool]
+
+        def pick(types, count):
+            found = []
+            for around in (anchor, None):   # Near the stay first, then anywhere in the city
+                if len(found) >= count or (around is None and anchor is None and found):
+                    break
+                found += self.lookup(city, near=around, types=types, want_tags=want, exclude_tags=exclude,
+                                     max_price=max_price, limit=count - len(found),
+                                     exclude_names=taken + [p["title"] for p in found])
+            return found
+
+        slots = limit - len(pool)
+        indoor = pick(("Indoor",), min(min_indoor, slots)) if min_indoor else []
+        pool += indoor
+        taken += [p["title"] for p in indoor]
+        pool += pick(("Indoor", "Outdoor"), slots - len(indoor))
+
+        complete = len(pool) >= limit and pool[0]["type"] == "Stay"
+        self.stats["full" if complete else "partial"] += 1
+        return pool[:limit]
+
+    def snapshot(self) -> dict:
+        try:
+            cities, pois = self._conn().execute("SELECT COUNT(DISTINCT city), COUNT(*) FROM poi").fetchone()
+        except sqlite3.Error:
+            cities, pois = None, None
+        return {**self.stats, "cities": cities, "pois": pois, "cities_in_memory": len(self._cities)}
+
+
+poi_catalog = POICatalog(
+    path=settings.POI_CATALOG_PATH,
+    radius_km=settings.POI_CATALOG_RADIUS_KM,
+    cached_cities=settings.POI_CATALOG_CACHED_CITIES,
+)
+
+
+# --- Offline build ---
+
+def _price_level(price) -> int:
+    """'$25' (itinerary price) -> Google-style 0-4 level."""
+    digits = re.sub(r"[^\d.]", "", str(price or ""))
+    if not digits:
+        return 2
+    usd = float(digits)
+    return 0 if usd == 0 else 1 if usd <= 15 else 2 if usd <= 35 else 3 if usd <= 75 else 4
+
+
+# Nodes the scheduler adds around the researched POIs (see scheduler.schedule_plan)
+_LUNCH_TITLE = "Lunch"
+_CHECKIN_PREFIX = "Check-in "
+
+
+def _from_itinerary(nodes: list) -> list:
+    """Saved itinerary nodes -> catalog POIs, minus the generated lunch; check-ins go back to the stay's name."""
+    pois = []
+    for n in nodes or []:
+        title = str(n.get("title") or "")
+        if title == _LUNCH_TITLE:
+            continue
+        if title.startswith(_CHECKIN_PREFIX):
+            n = {**n, "title": title[len(_CHECKIN_PREFIX):]}
+        pois.append({**n, "price_level": n.get("price_level", _price_level(n.get("price")))})
+    return pois
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the POI catalog from past journeys or a JSON dump.")
+    parser.add_argument("--from-supabase", action="store_true", help="fold in every saved itinerary")
+    parser.add_argument("--from-json", help='file of [{"city": ..., "pois": [poi, ...]}, ...]')
+    parser.add_argument("--limit", type=int, default=10_000)
+    args = parser.parse_args()
+
+    if args.from_json:
+        with open(args.from_json) as f:
+            for entry in json.load(f):
+                poi_catalog.ingest(entry["city"], entry["pois"])
+    if args.from_supabase:
+        from app.core.services import services
+        res = services.supabase.table("itineraries").select("destination, json_data").limit(args.limit).execute()
+        for row in res.data or []:
+            poi_catalog.ingest(row["destination"], _from_itinerary(row.get("json_data")))
+    print(json.dumps(poi_catalog.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
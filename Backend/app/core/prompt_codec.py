@@ -0,0 +1,61 @@
+# Backend/app/core/prompt_codec.py
+"""
+Compact, columnar encodings for data we interpolate into LLM prompts.
+
+A Python repr of a list of dicts repeats every key per row and drags along
+full addresses and 15-digit floats. These helpers emit one header line and
+one '|'-separated row per item instead, with short stable IDs (P0, P1, ...)
+the model can refer back to.
+"""
+
+COORD_DIGITS = 4      # ~11m, plenty for sequencing and map pins
+MAX_TEXT = 60         # Long descriptions are cut; the model only needs the gist
+
+POI_FIELDS = ("title", "type", "lat", "lon", "price_level")
+ITINERARY_FIELDS = ("title", "time", "type", "lat", "lon", "price")
+SCHEDULE_FIELDS = ("title", "day", "time", "type", "price")   # Already placed: the model needs no coordinates
+
+_HEADERS = {"price_level": "price"}
+COORD_FIELDS = ("lat", "lon")   # Itinerary nodes carry these as strings (str(...) upstream)
+
+
+def _coord(value):
+    """Float for a numeric lat/lon (float or string), else the value unchanged."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{round(value, COORD_DIGITS):g}"
+    text = " ".join(str(value).replace("|", "/").split())
+    return text if len(text) <= MAX_TEXT else text[:MAX_TEXT - 1] + "…"
+
+
+def encode_table(rows: list, fields: tuple, id_prefix: str) -> str:
+    """Header + one row per item: 'id|title|type...' / 'P0|Hotel Arts|Stay...'"""
+    header = "|".join(["id"] + [_HEADERS.get(f, f) for f in fields])
+    lines = [header]
+    for i, row in enumerate(rows):
+        lines.append("|".join([f"{id_prefix}{i}"] + [
+            _cell(_coord(row.get(f)) if f in COORD_FIELDS else row.get(f)) for f in fields
+        ]))
+    return "\n".join(lines)
+
+
+def encode_pois(poi_pool: list, fields: tuple = POI_FIELDS) -> str:
+    return encode_table(poi_pool, fields, "P")
+
+
+def encode_itinerary(nodes: list, fields: tuple = ITINERARY_FIELDS) -> str:
+    return encode_table(nodes, fields, "N")
+
+
+def poi_index(ref) -> int:
+    """'P12' / 'p12' / 12 -> 12; None when it isn't a POI reference."""
+    text = str(ref).strip().upper().lstrip("P")
+    return int(text) if text.isdigit() else None
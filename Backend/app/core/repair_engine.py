@@ -0,0 +1,305 @@
+# Backend/app/core/repair_engine.py
+"""
+Deterministic repairs for the not-yet-reached part of an itinerary.
+
+The common disruptions ("running 30 min late", "it's raining", "skip the
+museum", "less walking please") map onto four operators over the remaining
+nodes: shift times, drop the lowest-value stop, swap Outdoor for Indoor from
+the trip's candidate pool, and re-sequence with the cached travel-time
+matrix. Skips, swaps and re-orders are then re-timed by the scheduler.
+`repair_itinerary` returns None whenever a message can't be expressed
+with them, and callers fall back to the LLM heal prompt.
+"""
+import re
+import numpy as np
+from app.core.route_solver import haversine_matrix, travel_time_matrix, solve_route
+from app.core.matrix_service import cached_duration_matrix
+from app.core.config import settings
+from app.core.scheduler import (
+    DEFAULT_DAY_END, DEFAULT_DAY_START, PRICE_LEVEL_USD, dwell_minutes, format_time, is_anchor, parse_time,
+    retime_day, retime_itinerary,
+)
+
+DEFAULT_DELAY_MINUTES = 30   # "Running late" with no number
+
+_DELAY_CUES = re.compile(
+    r"\b(late|delay|delayed|behind|overslept|stuck|traffic|held up|missed (?:the|my) (?:bus|train|metro))\b"
+)
+_DELAY_AMOUNT = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-\s*)?(m|min|mins|minutes?|h|hr|hrs|hours?)\b")
+_DELAY_WORDS = (
+    (re.compile(r"\bhalf an? hour\b"), 30),
+    (re.compile(r"\b(?:a|one) couple (?:of )?hours\b"), 120),
+    (re.compile(r"\b(?:an|one) hour\b"), 60),
+)
+_INDOOR_CUES = re.compile(
+    r"\b(rain|raining|rainy|pouring|storm|stormy|thunder|drizzle|snow|snowing|too hot|heatwave|indoors?)\b"
+)
+_SKIP_CUES = re.compile(
+    r"\b(skip|skipping|drop|remove|cancel|cancelled|closed|not going|missed(?! (?:the|my|our) (?:bus|train|metro)))\b"
+)
+_RESEQUENCE_CUES = re.compile(
+    r"\b(reorder|re-order|rearrange|resequence|re-sequence|optimi[sz]e|less walking|shorter route|"
+    r"too much (?:travel|walking)|zig-?zag)\b"
+)
+# Requests that need new places or another day: only the LLM can do these
+_UNSUPPORTED_CUES = re.compile(
+    r"\b(add|include|instead|replace|tomorrow|another day|next day|book|cheaper|expensive)\b"
+)
+_STOPWORDS = {"the", "a", "an", "of", "to", "at", "and", "in", "on", "de", "la", "el", "visit", "tour", "stop"}
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", str(text).lower())) - _STOPWORDS
+
+
+def parse_disruption(message: str):
+    """
+    Maps a message onto operators: {'skip', 'indoor', 'resequence', 'delay'}.
+    None when nothing matches or the message asks for something else too.
+    """
+    text = " ".join(message.lower().split())
+    delay = 0
+    if _DELAY_CUES.search(text):
+        amount = _DELAY_AMOUNT.search(text)
+        if amount:
+            value = float(amount.group(1))
+            delay = int(value * 60) if amount.group(2).startswith("h") else int(value)
+        else:
+            delay = next((mins for pattern, mins in _DELAY_WORDS if pattern.search(text)), DEFAULT_DELAY_MINUTES)
+
+    ops = {
+        "skip": bool(_SKIP_CUES.search(text)),
+        "indoor": bool(_INDOOR_CUES.search(text)),
+        "resequence": bool(_RESEQUENCE_CUES.search(text)),
+        "delay": delay,
+    }
+    if not any(ops.values()) or _UNSUPPORTED_CUES.search(text):
+        return None
+    return ops
+
+
+def day_numbers(itinerary: list) -> list:
+    """Uses a node's 'day' when present, otherwise a new day starts where the clock goes backwards."""
+    days, day, last = [], 1, None
+    for node in itinerary:
+        if node.get("day") is not None:
+            day = int(node["day"])
+        else:
+            minutes = parse_time(node.get("time"))
+            if minutes is not None and last is not None and minutes < last:
+                day += 1
+            if minutes is not None:
+                last = minutes
+        days.append(day)
+    return days
+
+
+def _price(node: dict) -> float:
+    digits = re.sub(r"[^0-9.]", "", str(node.get("price") or ""))
+    try:
+        return float(digits) if digits else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _coords(node: dict):
+    try:
+        return float(node["lat"]), float(node["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# --- Operators: each takes the current day's nodes (copies) and returns a new list ---
+
+def shift_times(day_nodes: list, minutes: int) -> list:
+    out = []
+    for node in day_nodes:
+        start = parse_time(node.get("time"))
+        out.append({**node, "time": format_time(start + minutes)} if start is not None else node)
+    return out
+
+
+def _overruns(day_nodes: list, day_end: int) -> bool:
+    ends = [parse_time(n.get("time")) + dwell_minutes(n) for n in day_nodes if parse_time(n.get("time")) is not None]
+    return bool(ends) and max(ends) > day_end
+
+
+def drop_lowest_value(day_nodes: list, day_end: int, dropped: list) -> list:
+    """
+    While the day runs past day_end, drops the cheapest non-anchor stop
+    (free/unbooked before paid, later before earlier) and pulls every later
+    stop back into the freed slot.
+    """
+    nodes = list(day_nodes)
+    while _overruns(nodes, day_end):
+        candidates = [i for i, n in enumerate(nodes) if not is_anchor(n)]
+        if not candidates:
+            break
+        victim = min(candidates, key=lambda i: (_price(nodes[i]), -i))
+        slots = [n.get("time") for n in nodes]
+        dropped.append(nodes[victim])
+        del nodes[victim]
+        nodes = nodes[:victim] + [
+            {**node, "time": slots[victim + k]} for k, node in enumerate(nodes[victim:])
+        ]
+    return nodes
+
+
+def skip_nodes(day_nodes: list, message: str, dropped: list):
+    """Removes the stop the message names (or the next one); None if nothing matches."""
+    wanted = _words(message)
+    best, best_score = None, 0
+    for i, node in enumerate(day_nodes):
+        score = len(wanted & _words(node.get("title", "")))
+        if score > best_score:
+            best, best_score = i, score
+    if best is None and "next" in wanted and day_nodes:
+        best = 0
+    if best is None:
+        return None
+    dropped.append(day_nodes[best])
+    return day_nodes[:best] + day_nodes[best + 1:]
+
+
+def swap_outdoor_for_indoor(day_nodes: list, pool: list, used_titles: set):
+    """
+    Replaces each Outdoor stop with the nearest unused Indoor POI from the
+    trip's candidate pool, keeping its time slot. None if the pool runs out.
+    """
+    indoor = [
+        p for p in pool
+        if "indoor" in str(p.get("type", "")).lower() and _words(p.get("title")) and
+        " ".join(sorted(_words(p["title"]))) not in used_titles
+    ]
+    out = []
+    for node in day_nodes:
+        if "outdoor" not in str(node.get("type", "")).lower() or is_anchor(node):
+            out.append(node)
+            continue
+        here = _coords(node)
+        if not indoor or here is None:
+            return None
+        km = haversine_matrix([here[0]] + [p["lat"] for p in indoor], [here[1]] + [p["lon"] for p in indoor])[0, 1:]
+        poi = indoor.pop(int(np.argmin(km)))
+        level = poi.get("price_level")
+        out.append({
+            **node,
+            "title": poi["title"],
+            "type": "Indoor",
+            "loc": poi.get("loc", node.get("loc")),
+            "lat": str(poi["lat"]),
+            "lon": str(poi["lon"]),
+            "logic": f"Weather swap: indoor alternative to {node.get('title')}",
+            "description": poi.get("description") or node.get("description", ""),
+            "price": f"${PRICE_LEVEL_USD[level]}" if level in PRICE_LEVEL_USD else node.get("price"),
+        })
+    return out
+
+
+def resequence(day_nodes: list, start_node: dict = None):
+    """
+    Re-orders the movable stops of a day over the cached travel-time matrix
+    (haversine where a pair isn't cached). Anchors and the existing time
+    slots stay where they are; movable stops are dealt into the free slots.
+    """
+    movable = [i for i, n in enumerate(day_nodes) if not is_anchor(n)]
+    if len(movable) < 2:
+        return list(day_nodes)
+
+    stops = ([start_node] if start_node else []) + [day_nodes[i] for i in movable]
+    coords = [_coords(n) for n in stops]
+    if any(c is None for c in coords):
+        return None
+    points = [{"lat": lat, "lon": lon} for lat, lon in coords]
+    matrix = cached_duration_matrix(points)
+    matrix = np.where(np.isnan(matrix), travel_time_matrix(points), matrix)
+
+    order = solve_route(matrix, time_budget=settings.ROUTE_SOLVER_BUDGET_MS / 1000.0)
+    if start_node:
+        order = [i - 1 for i in order[1:]]
+    out = list(day_nodes)
+    for slot, pick in zip(movable, order):
+        out[slot] = {**stops[pick + (1 if start_node else 0)], "time": day_nodes[slot].get("time")}
+    return out
+
+
+def retime(day_nodes: list, start_node: dict = None) -> list:
+    """
+    Fresh start times for the rest of the day once stops were skipped,
+    swapped or re-ordered: on from the stop just finished when there is one,
+    otherwise from the day's first planned time. Anchors keep their times.
+    """
+    clock = parse_time((start_node or {}).get("time"))
+    if clock is not None:
+        clock += dwell_minutes(start_node)
+    else:
+        start_node = None
+        clock = next((parse_time(n.get("time")) for n in day_nodes if parse_time(n.get("time")) is not None), None)
+    if clock is None or not day_nodes:
+        return day_nodes
+    return retime_day(day_nodes, clock, origin=start_node)
+
+
+def retime_replan(completed: list, new_nodes: list, day_start: str = DEFAULT_DAY_START) -> list:
+    """Scheduler times for LLM-replanned nodes; their order and day breaks are kept."""
+    if not new_nodes:
+        return new_nodes
+    days = day_numbers(completed + new_nodes)
+    split = len(completed)
+    continue_from = completed[-1] if completed and days[split - 1] == days[split] else None
+    return retime_itinerary(new_nodes, days[split:], day_start, continue_from=continue_from)
+
+
+def repair_itinerary(message: str, itinerary: list, reached_idx: int,
+                     pool: list = None, day_end: str = DEFAULT_DAY_END):
+    """
+    Applies the operators the message asks for to the current day of the
+    remaining itinerary. Returns {'itinerary': full plan, 'applied': [...]},
+    or None when the LLM has to handle the request.
+    """
+    ops = parse_disruption(message)
+    completed = itinerary[:reached_idx + 1]
+    remaining = itinerary[reached_idx + 1:]
+    if ops is None or not remaining:
+        return None
+
+    all_days = day_numbers(itinerary)
+    days = all_days[reached_idx + 1:]
+    today = days[0]
+    day_nodes = [n for n, d in zip(remaining, days) if d == today]
+    later = [n for n, d in zip(remaining, days) if d != today]
+    end = parse_time(day_end) or parse_time(DEFAULT_DAY_END)
+    start = completed[-1] if completed and all_days[reached_idx] == today else None
+    applied, dropped = [], []
+
+    if ops["skip"]:
+        day_nodes = skip_nodes(day_nodes, message, dropped)
+        if day_nodes is None:
+            return None
+        applied.append(f"skip:{dropped[-1].get('title')}")
+
+    if ops["indoor"]:
+        used = {" ".join(sorted(_words(n.get("title")))) for n in itinerary}
+        day_nodes = swap_outdoor_for_indoor(day_nodes, pool or [], used)
+        if day_nodes is None:
+            return None
+        applied.append("indoor_swap")
+
+    if ops["resequence"]:
+        day_nodes = resequence(day_nodes, start)
+        if day_nodes is None:
+            return None
+        applied.append("resequence")
+
+    if ops["skip"] or ops["indoor"] or ops["resequence"]:
+        day_nodes = retime(day_nodes, start)
+
+    if ops["delay"]:
+        day_nodes = shift_times(day_nodes, ops["delay"])
+        applied.append(f"shift:+{ops['delay']}m")
+
+    before = len(dropped)
+    day_nodes = drop_lowest_value(day_nodes, end, dropped)
+    applied += [f"drop:{n.get('title')}" for n in dropped[before:]]
+
+    return {"itinerary": completed + day_nodes + later, "applied": applied}
@@ -0,0 +1,124 @@
+# Backend/app/core/route_solver.py
+import time
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+CITY_SPEED_KMH = 20.0        # Door-to-door average for walking + transit mixes
+UNROUTABLE_PENALTY = 1800    # 30 min for pairs Google can't route
+
+
+def haversine_matrix(lats, lons) -> np.ndarray:
+    """Vectorized great-circle distances (km) between every pair of points."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_from(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Vectorized great-circle distances (km) from one point to many."""
+    lat0, lon0 = np.radians(lat), np.radians(lon)
+    lat1 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lons, dtype=np.float64))
+    a = np.sin((lat1 - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def travel_time_matrix(poi_pool: list, durations: np.ndarray = None) -> np.ndarray:
+    """Prefers a real duration matrix; falls back to haversine at city speed."""
+    size = len(poi_pool)
+    if durations is not None and np.shape(durations) == (size, size):
+        return np.asarray(durations, dtype=np.float64)
+    km = haversine_matrix([p['lat'] for p in poi_pool], [p['lon'] for p in poi_pool])
+    return km / CITY_SPEED_KMH * 3600.0
+
+
+def route_cost(matrix: np.ndarray, order) -> float:
+    order = np.asarray(order, dtype=np.intp)
+    if len(order) < 2:
+        return 0.0
+    return float(matrix[order[:-1], order[1:]].sum())
+
+
+def nearest_neighbour(matrix: np.ndarray, start: int = 0) -> list:
+    n = len(matrix)
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, matrix[order[-1]])
+        nxt = int(np.argmin(row))
+        order.append(nxt)
+        visited[nxt] = True
+    return order
+
+
+def two_opt(matrix: np.ndarray, order: list, deadline: float) -> list:
+    """Segment reversals on an open path; position 0 (the hotel) never moves."""
+    best = list(order)
+    best_cost = route_cost(matrix, best)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, len(best) - 1):
+            for j in range(i + 1, len(best)):
+                candidate = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                cost = route_cost(matrix, candidate)
+                if cost < best_cost - 1e-9:
+                    best, best_cost, improved = candidate, cost, True
+            if time.perf_counter() >= deadline:
+                break
+    return best
+
+
+def or_opt(matrix: np.ndarray, order: list, deadline: float, max_segment: int = 3) -> list:
+    """Relocates runs of 1-3 stops elsewhere in the path (position 0 stays put)."""
+    best = list(order)
+    best_cost = route_cost(matrix, best)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for seg_len in range(1, max_segment + 1):
+            for i in range(1, len(best) - seg_len + 1):
+                segment = best[i:i + seg_len]
+                rest = best[:i] + best[i + seg_len:]
+                for k in range(1, len(rest) + 1):
+                    if k == i:
+                        continue
+                    candidate = rest[:k] + segment + rest[k:]
+                    cost = route_cost(matrix, candidate)
+                    if cost < best_cost - 1e-9:
+                        best, best_cost, improved = candidate, cost, True
+                        break
+                if improved or time.perf_counter() >= deadline:
+                    break
+            if improved or time.perf_counter() >= deadline:
+                break
+    return best
+
+
+def solve_route(matrix: np.ndarray, time_budget: float = 0.05) -> list:
+    """
+    Open-path TSP anchored at index 0 (the hotel).
+    Nearest-neighbour seed, then 2-opt and Or-opt until nothing improves
+    or the time budget (seconds) runs out. Never worse than the input order.
+    """
+    n = len(matrix)
+    if n < 3:
+        return list(range(n))
+
+    deadline = time.perf_counter() + time_budget
+    identity = list(range(n))
+    seed = nearest_neighbour(matrix, 0)
+    if route_cost(matrix, identity) < route_cost(matrix, seed):
+        seed = identity
+
+    order = seed
+    while time.perf_counter() < deadline:
+        cost = route_cost(matrix, order)
+        order = or_opt(matrix, two_opt(matrix, order, deadline), deadline)
+        if route_cost(matrix, order) >= cost - 1e-9:
+            break
+    return order
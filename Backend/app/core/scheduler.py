@@ -0,0 +1,281 @@
+# Backend/app/core/scheduler.py
+"""
+Deterministic start times for itinerary nodes.
+
+Each day runs from the traveller's startTime to endTime. Stops take their
+travel time from the previous stop (cached Distance Matrix seconds,
+haversine at city speed for unknown pairs) plus a dwell estimate by type
+and keywords. Anchors are pinned: Day 1 check-in at the start of the day,
+the Day 2 heritage visit (when a stop has heritage tags) at 09:00 and
+lunch at 12:00. When a day doesn't fit its window, dwell times shrink
+(down to half) before the last movable stops are left out.
+
+The plan pipeline builds its timed skeleton here, so the format prompt
+only has to write prose. Repairs and replans re-time through the same
+functions without another model call.
+"""
+import logging
+import math
+import re
+import numpy as np
+from app.core.matrix_service import cached_duration_matrix
+from app.core.poi_catalog import TAG_BITS, tags_for
+from app.core.route_solver import travel_time_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAY_START = "09:00"
+DEFAULT_DAY_END = "21:00"
+SLOT_MINUTES = 15            # Start times land on the quarter hour
+MIN_DWELL_SHARE = 0.5        # How far dwell times may shrink to fit a short day
+LUNCH_MINUTES = 60
+LUNCH_SLACK_MINUTES = 30     # A stop that would end later than 12:30 waits until after lunch
+PRICE_LEVEL_USD = {0: 0, 1: 10, 2: 25, 3: 50, 4: 100}
+
+# Compliance anchors and the time each is pinned to (None: the day's start)
+ANCHOR_TIMES = {"check-in": None, "breakfast": 8 * 60, "heritage": 9 * 60, "lunch": 12 * 60, "dinner": 19 * 60 + 30}
+_ANCHOR_PATTERN = re.compile(r"\b(check-?in|lunch|dinner|breakfast|heritage)\b", re.IGNORECASE)
+_TIME_PATTERN = re.compile(r"(\d{1,2})[:.](\d{2})\s*([ap]\.?m\.?)?", re.IGNORECASE)
+
+DWELL_BY_TYPE = {"Stay": 30, "Indoor": 90, "Outdoor": 75}
+_DWELL_KEYWORDS = (
+    (re.compile(r"\b(museum|gallery|palace|castle|zoo|aquarium|basilica|cathedral|heritage)\b", re.I), 120),
+    (re.compile(r"\b(check-?in)\b", re.I), 30),
+    (re.compile(r"\b(lunch|dinner|restaurant|tapas|bistro|food hall|market)\b", re.I), 60),
+    (re.compile(r"\b(cafe|café|coffee|bakery|tea house|breakfast)\b", re.I), 45),
+    (re.compile(r"\b(viewpoint|mirador|square|plaza|bridge|fountain|statue|monument)\b", re.I), 30),
+)
+_HERITAGE_TAGS = TAG_BITS["history"] | TAG_BITS["religious"] | TAG_BITS["culture"]
+
+
+def parse_time(value):
+    """'09:30' / '9.30' / '2:15 PM' -> minutes after midnight; None if unreadable."""
+    match = _TIME_PATTERN.search(str(value or ""))
+    if not match:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    meridiem = (match.group(3) or "").lower().replace(".", "")
+    if meridiem == "pm" and hours < 12:
+        hours += 12
+    elif meridiem == "am" and hours == 12:
+        hours = 0
+    return hours * 60 + minutes if hours < 24 and minutes < 60 else None
+
+
+def format_time(minutes: int) -> str:
+    minutes = max(0, min(int(minutes), 23 * 60 + 59))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def anchor_kind(node: dict):
+    """'check-in' / 'heritage' / 'lunch' / ... for compliance anchors, else None."""
+    match = _ANCHOR_PATTERN.search(f"{node.get('title', '')} {node.get('logic', '')}")
+    return match.group(1).lower().replace("checkin", "check-in") if match else None
+
+
+def is_anchor(node: dict) -> bool:
+    """Check-in, meals and the heritage slot are compliance rules, never dropped or moved."""
+    return anchor_kind(node) is not None
+
+
+def dwell_minutes(node: dict) -> int:
+    text = f"{node.get('title', '')} {node.get('logic', '')}"
+    for pattern, minutes in _DWELL_KEYWORDS:
+        if pattern.search(text):
+            return minutes
+    kind = str(node.get("type", "")).capitalize()
+    return DWELL_BY_TYPE.get(kind, DWELL_BY_TYPE["Outdoor"])
+
+
+def _slot(minutes: float) -> int:
+    return int(math.ceil(minutes / SLOT_MINUTES) * SLOT_MINUTES)
+
+
+def _coords(node: dict):
+    try:
+        return {"lat": float(node["lat"]), "lon": float(node["lon"])}
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def travel_minutes(points: list) -> np.ndarray:
+    """Minutes between points: cached Distance Matrix pairs, haversine at city speed for the rest."""
+    seconds = cached_duration_matrix(points)
+    seconds = np.where(np.isnan(seconds), travel_time_matrix(points), seconds)
+    return seconds / 60.0
+
+
+# --- One day ---
+
+def _walk(nodes: list, minutes: np.ndarray, pins: list, start: int, lunch: dict, scale: float):
+    """One pass over a day: (timed nodes, minute the last movable stop ends)."""
+    out, clock, prev, last_end = [], start, 0, start
+    lunch_pending = lunch is not None
+    for i, (node, pin) in enumerate(zip(nodes, pins), start=1):
+        dwell = dwell_minutes(node)
+        if pin is None:
+            dwell = max(SLOT_MINUTES, round(dwell * scale))
+        arrive = clock + minutes[prev, i]
+        if lunch_pending and pin is None and arrive + dwell > lunch["at"] + LUNCH_SLACK_MINUTES:
+            # Lunch near wherever the traveller is, then carry on
+            at = max(_slot(clock), lunch["at"])
+            where = nodes[prev - 1] if prev else lunch["near"]
+            out.append({**lunch["node"], **_located(where), "time": format_time(at)})
+            clock, lunch_pending = at + LUNCH_MINUTES, False
+            arrive = clock + minutes[prev, i]
+        if pin is None:
+            at = _slot(arrive)
+        elif i == 1:
+            at = max(pin, start)   # A pinned first stop: the traveller simply sets off earlier
+        else:
+            at = max(pin, _slot(arrive))
+        out.append({**node, "time": format_time(at)})
+        clock, prev = at + dwell, i
+        if pin is None:
+            last_end = clock
+    if lunch_pending and clock <= lunch["at"] + 2 * 60:
+        at = max(_slot(clock), lunch["at"])
+        where = nodes[prev - 1] if prev else lunch["near"]
+        out.append({**lunch["node"], **_located(where), "time": format_time(at)})
+    return out, last_end
+
+
+def _located(node: dict) -> dict:
+    return {k: node[k] for k in ("loc", "lat", "lon") if node.get(k) is not None}
+
+
+def schedule_day(nodes: list, start: int, end: int = None, origin: dict = None, pins: list = None,
+                 lunch: dict = None):
+    """
+    Times for one day's nodes in their given order (no window when end is None).
+    `pins[i]` fixes node i's start (minutes) unless travel makes it later;
+    `origin` is where the day begins (the hotel, or the stop just finished);
+    `lunch` ({'node', 'at', 'near'}) inserts a meal break around its time.
+    Returns (timed nodes, nodes left out to respect `end`).
+    """
+    pins = list(pins or [None] * len(nodes))
+    kept, left_out = list(range(len(nodes))), []
+    while True:
+        day = [nodes[i] for i in kept]
+        points = [_coords(origin or {}) or _coords(day[0] if day else {}) or {"lat": 0.0, "lon": 0.0}]
+        points += [_coords(n) or points[-1] for n in day]
+        minutes = travel_minutes(points) if len(points) > 1 else np.zeros((1, 1))
+        for scale in (1.0, 0.75, MIN_DWELL_SHARE):
+            timed, last_end = _walk(day, minutes, [pins[i] for i in kept], start, lunch, scale)
+            if end is None or last_end <= end:
+                return timed, left_out
+        movable = [k for k in kept if pins[k] is None]
+        if not movable:
+            return timed, left_out
+        kept.remove(movable[-1])
+        left_out.insert(0, nodes[movable[-1]])
+
+
+# --- Whole plans ---
+
+def _price(poi: dict) -> str:
+    level = poi.get("price_level")
+    return f"${PRICE_LEVEL_USD[level]}" if level in PRICE_LEVEL_USD else ""
+
+
+def _node(poi: dict, day: int, logic: str = "") -> dict:
+    return {
+        "title": str(poi.get("title", "")).replace("_", " "),
+        "type": poi.get("type", "Outdoor"),
+        "loc": poi.get("loc", ""),
+        "lat": str(poi["lat"]),
+        "lon": str(poi["lon"]),
+        "day": day,
+        "logic": logic,
+        "description": poi.get("description", ""),
+        "price": _price(poi),
+    }
+
+
+def day_window(day_start: str, day_end: str) -> tuple:
+    """
+    (start, end) minutes for a day. An end at or before the start falls back
+    to DEFAULT_DAY_END; a start too late for that (e.g. '09:00 PM') falls
+    back to DEFAULT_DAY_START, so a day is never an empty window.
+    """
+    start = parse_time(day_start) or parse_time(DEFAULT_DAY_START)
+    end = parse_time(day_end) or parse_time(DEFAULT_DAY_END)
+    if end <= start:
+        end = parse_time(DEFAULT_DAY_END)
+    if end <= start:
+        logger.warning("Day window %s-%s is empty; using %s-%s", day_start, day_end, DEFAULT_DAY_START, DEFAULT_DAY_END)
+        start = parse_time(DEFAULT_DAY_START)
+    return start, end
+
+
+def schedule_plan(poi_pool: list, days: int, hotel_name: str = "",
+                  day_start: str = DEFAULT_DAY_START, day_end: str = DEFAULT_DAY_END) -> dict:
+    """
+    The timed skeleton of a plan from a day-planned pool (index 0 = the
+    stay, every POI tagged with 'day'): check-in first on Day 1, the first
+    heritage Day 2 stop (if any) at 09:00, lunch on Day 2, each day timed from
+    the hotel. Returns {'itinerary': [...], 'unscheduled': [...]}.
+    """
+    if not poi_pool:
+        return {"itinerary": [], "unscheduled": []}
+    start, end = day_window(day_start, day_end)
+    hotel = poi_pool[0]
+    name = hotel_name or hotel.get("title", "the stay")
+
+    itinerary, unscheduled = [], []
+    for day in range(1, max(int(days), 1) + 1):
+        stops = [p for p in poi_pool[1:] if p.get("day") == day]
+        nodes = [_node(p, day) for p in stops]
+        pins = [None] * len(nodes)
+        lunch = None
+        if day == 1:
+            checkin = {**_node(hotel, 1, "Checking into optimized anchor location"), "title": f"Check-in {name}"}
+            nodes, pins = [checkin] + nodes, [start] + pins
+        if day == 2 and nodes:
+            # The first heritage stop opens the day in the low-crowd window; without one the day isn't pinned
+            pick = next((i for i, p in enumerate(stops) if tags_for(f"{p['title']} {p.get('description', '')}")
+                         & _HERITAGE_TAGS), None)
+            if pick is not None:
+                heritage = {**nodes.pop(pick), "logic": "Heritage site visit (low crowd window)"}
+                nodes = [heritage] + nodes
+                pins[0] = max(start, ANCHOR_TIMES["heritage"])
+            lunch = {"at": ANCHOR_TIMES["lunch"], "near": hotel,
+                     "node": {"title": "Lunch", "type": "Indoor", "day": 2, "logic": "Lunch near stay location.",
+                              "description": "", "price": "$15"}}
+        if not nodes:
+            continue
+        timed, left_out = schedule_day(nodes, start, end, origin=hotel, pins=pins, lunch=lunch)
+        itinerary += timed
+        unscheduled += left_out
+    itinerary = [{"id": i, "reached": False, **node} for i, node in enumerate(itinerary)]
+    return {"itinerary": itinerary, "unscheduled": unscheduled}
+
+
+def retime_day(day_nodes: list, start: int, origin: dict = None) -> list:
+    """
+    Re-times the rest of a day after a repair: anchors keep their current
+    times as pins, everything else follows on from `start`. Nothing is
+    dropped here; callers decide what to cut.
+    """
+    pins = [parse_time(n.get("time")) if is_anchor(n) else None for n in day_nodes]
+    timed, _ = schedule_day(day_nodes, start, end=None, origin=origin, pins=pins)
+    return timed
+
+
+def retime_itinerary(remaining: list, days: list, day_start: str = DEFAULT_DAY_START, continue_from: dict = None) -> list:
+    """
+    Re-times replanned nodes day by day (`days` gives each node's day).
+    The first day continues from `continue_from` (the stop just finished,
+    when it's on that day); every other day starts at day_start, or at its
+    first node's time if that is later.
+    """
+    start = parse_time(day_start) or parse_time(DEFAULT_DAY_START)
+    out = []
+    for day in sorted(set(days), key=days.index):
+        nodes = [n for n, d in zip(remaining, days) if d == day]
+        origin, clock = None, max(start, parse_time(nodes[0].get("time")) or start)
+        if continue_from is not None and day == days[0] and parse_time(continue_from.get("time")) is not None:
+            origin = continue_from
+            clock = max(start, parse_time(continue_from["time"]) + dwell_minutes(continue_from))
+        out += retime_day(nodes, clock, origin=origin)
+    return out
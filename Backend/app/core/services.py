@@ -0,0 +1,156 @@
+# Backend/app/core/services.py
+"""
+Process-wide service container.
+
+The upstream clients (Anthropic, one shared httpx pool, googlemaps,
+Supabase), the compiled LangGraph and the plan job store are each built
+once, on first use.
+Their SDKs are imported only at that point, so importing the app stays
+cheap and a process pays only for what it touches. The app's lifespan
+calls warm_up(), so the first request doesn't pay either.
+"""
+import asyncio
+import logging
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _build_llm():
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, DEFAULT_CONNECTION_LIMITS
+    # Use the SDK's own Limits type so we match whichever httpx it ships with
+    limits = DEFAULT_CONNECTION_LIMITS.__class__(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+    )
+    return AsyncAnthropic(
+        api_key=settings.ANTHROPIC_API_KEY,
+        base_url=settings.ANTHROPIC_BASE_URL,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        http_client=DefaultAsyncHttpxClient(limits=limits),
+    )
+
+
+def _build_http():
+    import httpx
+    # Weather and the distance matrix share this pool; callers pass their own timeouts
+    return httpx.AsyncClient(
+        timeout=settings.HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS,
+        ),
+    )
+
+
+def _build_gmaps():
+    import googlemaps
+    # googlemaps rejects a missing/invalid key here, not at import
+    return googlemaps.Client(key=settings.GOOGLE_MAPS_KEY, base_url=settings.GOOGLE_MAPS_BASE_URL)
+
+
+def _build_supabase():
+    from supabase import create_client
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+
+
+def _build_jobs():
+    from app.db.job_store import open_backend
+    return open_backend(settings.JOB_BACKEND, settings.JOB_DB_PATH)
+
+
+def _build_graph():
+    from app.agents.squad import build_graph
+    return build_graph()
+
+
+class Services:
+    FACTORIES = {
+        "llm": _build_llm,
+        "http": _build_http,
+        "gmaps": _build_gmaps,
+        "supabase": _build_supabase,
+        "graph": _build_graph,
+        "jobs": _build_jobs,
+    }
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.Lock()   # googlemaps/Supabase are first touched from worker threads
+        self.build_ms = {}
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    started = time.perf_counter()
+                    instance = self.FACTORIES[name]()
+                    self.build_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+                    self._instances[name] = instance
+        return instance
+
+    @property
+    def llm(self):
+        return self.get("llm")
+
+    @property
+    def http(self):
+        return self.get("http")
+
+    @property
+    def gmaps(self):
+        return self.get("gmaps")
+
+    @property
+    def supabase(self):
+        return self.get("supabase")
+
+    @property
+    def graph(self):
+        return self.get("graph")
+
+    @property
+    def jobs(self):
+        return self.get("jobs")
+
+    def override(self, name: str, instance):
+        """Swaps in a stand-in (benchmarks, local fakes)."""
+        self._instances[name] = instance
+
+    def _build_all(self, names) -> list:
+        failed = []
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                # Unconfigured upstreams (no key) stay lazy and fail on first use instead
+                logger.warning("Warm-up skipped %s: %s", name, e)
+                failed.append(name)
+        return failed
+
+    async def warm_up(self, names=None):
+        """Builds every client and compiles the graph off the event loop (app startup)."""
+        started = time.perf_counter()
+        await asyncio.to_thread(self._build_all, list(names or self.FACTORIES))
+        logger.info("Services warm in %.0f ms %s", (time.perf_counter() - started) * 1000, self.build_ms)
+
+    async def aclose(self):
+        """Releases the shared connection pools (app shutdown)."""
+        llm = self._instances.pop("llm", None)
+        if llm is not None:
+            await llm.close()
+        http = self._instances.pop("http", None)
+        if http is not None:
+            await http.aclose()
+
+    def snapshot(self) -> dict:
+        return {"built": sorted(self._instances), "build_ms": dict(self.build_ms)}
+
+
+services = Services()
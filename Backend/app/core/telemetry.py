@@ -0,0 +1,111 @@
+# Backend/app/core/telemetry.py
+"""
+Prometheus metrics and per-request trace IDs.
+
+Every HTTP request gets a trace ID (the caller's X-Trace-Id or a new one)
+held in a contextvar; the log filter stamps it on every record, so one
+slow /plan can be followed node by node and upstream by upstream.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger("itera.telemetry")
+
+trace_id_var = contextvars.ContextVar("trace_id", default="-")
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+HTTP_SECONDS = Histogram("itera_http_request_seconds", "HTTP request latency (until response headers)",
+                         ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+HTTP_INFLIGHT = Gauge("itera_http_inflight", "HTTP requests being handled")
+NODE_SECONDS = Histogram("itera_node_seconds", "LangGraph node wall time",
+                         ["node", "outcome"], buckets=LATENCY_BUCKETS)
+UPSTREAM_SECONDS = Histogram("itera_upstream_seconds", "Upstream call latency",
+                             ["upstream", "operation", "outcome"], buckets=LATENCY_BUCKETS)
+UPSTREAM_INFLIGHT = Gauge("itera_upstream_inflight", "Upstream calls in flight", ["upstream"])
+LLM_TOKENS = Counter("itera_llm_tokens", "Claude tokens by agent", ["agent", "direction"])
+ADMISSION_WAIT_SECONDS = Histogram("itera_admission_wait_seconds", "Queue wait before an endpoint or upstream slot",
+                                   ["scope", "priority"], buckets=LATENCY_BUCKETS)
+ADMISSION_QUEUED = Gauge("itera_admission_queued", "Requests or upstream calls waiting for a slot", ["scope"])
+ADMISSION_REJECTED = Counter("itera_admission_rejected", "Turned away instead of queued",
+                             ["scope", "priority", "reason"])
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def configure_logging(level: str = "INFO"):
+    """Root handler with the trace ID in every line (idempotent)."""
+    root = logging.getLogger()
+    if any(isinstance(f, TraceIdFilter) for h in root.handlers for f in h.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(TraceIdFilter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+_gauges = {}
+
+
+def register_gauge(name: str, documentation: str, read):
+    """Gauge evaluated at scrape time (queue depths, cache sizes); registering a name again rebinds it."""
+    gauge = _gauges.get(name)
+    if gauge is None:
+        gauge = _gauges[name] = Gauge(name, documentation)
+    gauge.set_function(read)
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str = ""):
+    """Times one upstream call (sync or around an await) and counts it in flight."""
+    inflight = UPSTREAM_INFLIGHT.labels(upstream)
+    inflight.inc()
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        inflight.dec()
+        UPSTREAM_SECONDS.labels(upstream, operation, outcome).observe(elapsed)
+        logger.debug("upstream %s/%s %s in %.3fs", upstream, operation, outcome, elapsed)
+
+
+def timed_node(name: str, node):
+    """Wraps a LangGraph node so its wall time lands in itera_node_seconds and the log."""
+    @functools.wraps(node)
+    async def wrapper(state):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await node(state)
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            NODE_SECONDS.labels(name, outcome).observe(elapsed)
+            logger.info("node %s %s in %.3fs", name, outcome, elapsed)
+    return wrapper
@@ -24,6 +24,24 @@ class TOONEngine:
         NO INTRO. NO OUTRO. NO MARKDOWN.
         """
 
+    @staticmethod
+    def get_prose_prompt():
+        """For plans the scheduler has already placed and timed: prose only, keyed by row ID."""
+        return """
+        STRICT_PROTOCOL: TOON.
+        Output ONLY blocks in this format, one Activity per row ID you are given:
+        Activity(N0) {
+          Logic: Why this fits the user vibe;
+          Description: 1-sentence vibe check;
+          Price: $XX;
+        }
+        TripInsight(Category_Name) {
+          Content: One sentence insight;
+          Value: Metric;
+        }
+        NO INTRO. NO OUTRO. NO MARKDOWN.
+        """
+
     @staticmethod
     def parse(toon_str: str) -> list:
         """Legacy parser — returns only the itinerary list."""
@@ -39,28 +57,172 @@ class TOONEngine:
         insights = []
 
         # Clean markdown formatting
-        clean_str = re.sub(r'```[\w]*', '', toon_str).replace('```', '').strip()
+        clean_str = _FENCE_PATTERN.sub('', toon_str).replace('```', '').strip()
 
         # --- Parse Activity blocks ---
-        activity_pattern = r"Activity\s*\((.*?)\)\s*\{([\s\S]*?)\}"
-        for idx, (name, content) in enumerate(re.findall(activity_pattern, clean_str)):
-            item = {
-                "id": idx,
-                "title": name.replace("_", " ").strip(),
-                "reached": False
-            }
-            for k, v in re.findall(r"(\w+)\s*:\s*(.*?)(?:;|\n|$)", content):
-                item[k.strip().lower()] = v.strip().strip('"').strip("'").replace("_", " ")
-
-            if "lat" in item and "lon" in item:
+        for idx, (name, content) in enumerate(_ACTIVITY_PATTERN.findall(clean_str)):
+            item = _build_activity(idx, name, content)
+            if item is not None:
                 itinerary.append(item)
 
         # --- Parse TripInsight blocks ---
-        insight_pattern = r"TripInsight\s*\((.*?)\)\s*\{([\s\S]*?)\}"
-        for category, content in re.findall(insight_pattern, clean_str):
-            insight = {"category": category.strip()}
-            for k, v in re.findall(r"(\w+)\s*:\s*(.*?)(?:;|\n|$)", content):
-                insight[k.strip().lower()] = v.strip().strip('"').strip("'")
-            insights.append(insight)
-
-        return {"itinerary": itinerary, "insights": insights}
\ No newline at end of file
+        for category, content in _INSIGHT_PATTERN.findall(clean_str):
+            insights.append(_build_insight(category, content))
+
+        return {"itinerary": itinerary, "insights": insights}
+
+
+_FENCE_PATTERN = re.compile(r'```[\w]*')
+_ACTIVITY_PATTERN = re.compile(r"Activity\s*\((.*?)\)\s*\{([\s\S]*?)\}")
+_INSIGHT_PATTERN = re.compile(r"TripInsight\s*\((.*?)\)\s*\{([\s\S]*?)\}")
+_FIELD_PATTERN = re.compile(r"(\w+)\s*:\s*(.*?)(?:;|\n|$)")
+
+
+def _build_activity(idx: int, name: str, content: str, require_coords: bool = True):
+    """Activity dict for one block, or None when it has no coordinates (and they are required)."""
+    item = {
+        "id": idx,
+        "title": name.replace("_", " ").strip(),
+        "reached": False
+    }
+    for k, v in _FIELD_PATTERN.findall(content):
+        item[k.strip().lower()] = v.strip().strip('"').strip("'").replace("_", " ")
+    return item if not require_coords or ("lat" in item and "lon" in item) else None
+
+
+def _build_insight(category: str, content: str) -> dict:
+    insight = {"category": category.strip()}
+    for k, v in _FIELD_PATTERN.findall(content):
+        insight[k.strip().lower()] = v.strip().strip('"').strip("'")
+    return insight
+
+
+def _is_word(ch: str) -> bool:
+    # Same definition as the regex \w class for str patterns
+    return ch.isalnum() or ch == "_"
+
+
+_NEED_MORE = object()
+
+
+class TOONStreamParser:
+    """
+    Incremental TOON parser for token streams.
+
+    feed() accepts arbitrary text chunks and returns the ('activity' | 'insight',
+    dict) pairs whose closing brace has arrived, in stream order. The blocks
+    are framed by a single forward scan that keeps its position between
+    chunks, and the output is identical to TOONEngine.parse_with_insights on
+    the concatenated text (same ids, titles, 'reached' flag and lat/lon filter).
+    """
+
+    KEYWORDS = ("Activity", "TripInsight")
+
+    def __init__(self, require_coords: bool = True):
+        self.require_coords = require_coords   # False for prose-only blocks keyed by row ID
+        self._raw = ""                 # Tail that may still be part of a ``` fence
+        self._text = ""                # Cleaned text not yet consumed by every scanner
+        self._base = 0                 # Absolute offset of self._text[0]
+        self._scan = {kw: 0 for kw in self.KEYWORDS}
+        self._next_id = 0
+        self.itinerary = []
+        self.insights = []
+
+    def feed(self, chunk: str) -> list:
+        self._raw += chunk
+        # Hold back a trailing run of backticks/word chars: it could still turn
+        # out to be (part of) a fence. Everything before it cleans identically.
+        cut = len(self._raw)
+        while cut > 0 and (self._raw[cut - 1] == "`" or _is_word(self._raw[cut - 1])):
+            cut -= 1
+        ready, self._raw = self._raw[:cut], self._raw[cut:]
+        self._text += _FENCE_PATTERN.sub("", ready)
+        return self._advance(final=False)
+
+    def close(self) -> list:
+        """Flushes the held-back tail and resolves blocks left open at end of stream."""
+        self._text += _FENCE_PATTERN.sub("", self._raw)
+        self._raw = ""
+        return self._advance(final=True)
+
+    def result(self) -> dict:
+        return {"itinerary": self.itinerary, "insights": self.insights}
+
+    def _advance(self, final: bool) -> list:
+        found = []
+        for kw in self.KEYWORDS:
+            found.extend(self._scan_keyword(kw, final))
+        found.sort(key=lambda entry: entry[0])
+
+        # Drop text every scanner has moved past
+        consumed = min(self._scan.values()) - self._base
+        if consumed > 0:
+            self._text = self._text[consumed:]
+            self._base += consumed
+        return [(kind, item) for _, kind, item in found]
+
+    def _scan_keyword(self, kw: str, final: bool) -> list:
+        text, base = self._text, self._base
+        pos = self._scan[kw] - base
+        found = []
+        while True:
+            start = text.find(kw, pos)
+            if start < 0:
+                # Keep enough of the tail to spot a keyword split across chunks
+                self._scan[kw] = base + max(pos, len(text) - len(kw) + 1)
+                return found
+            match = self._match_block(text, start + len(kw), final)
+            if match is _NEED_MORE:
+                self._scan[kw] = base + start
+                return found
+            if match is None:
+                pos = start + 1
+                continue
+
+            name, content, end = match
+            if kw == "Activity":
+                item = _build_activity(self._next_id, name, content, self.require_coords)
+                self._next_id += 1
+                if item is not None:
+                    self.itinerary.append(item)
+                    found.append((base + end, "activity", item))
+            else:
+                item = _build_insight(name, content)
+                self.insights.append(item)
+                found.append((base + end, "insight", item))
+            pos = end
+
+    @staticmethod
+    def _match_block(text: str, q: int, final: bool):
+        """
+        Hand-rolled equivalent of `\s*\((.*?)\)\s*\{([\s\S]*?)\}` anchored at q.
+        Returns (name, content, end), None for no match, or _NEED_MORE.
+        """
+        more = None if final else _NEED_MORE
+        n = len(text)
+        while q < n and text[q].isspace():
+            q += 1
+        if q >= n:
+            return more
+        if text[q] != "(":
+            return None
+
+        r = q + 1
+        while True:
+            close = text.find(")", r)
+            newline = text.find("\n", r)
+            if newline != -1 and (close == -1 or newline < close):
+                return None            # '.' never spans a newline
+            if close == -1:
+                return more
+            s = close + 1
+            while s < n and text[s].isspace():
+                s += 1
+            if s >= n:
+                return more
+            if text[s] == "{":
+                end = text.find("}", s + 1)
+                if end == -1:
+                    return more
+                return text[q + 1:close], text[s + 1:end], end + 1
+            r = close + 1
@@ -0,0 +1,249 @@
+# Backend/app/core/vector_index.py
+"""
+In-process embedding index for remembered preferences.
+
+Texts are embedded with a signed hashed-feature vectorizer (words + char
+trigrams, no model download) into a contiguous float32 matrix, optionally
+backed by a memory-mapped file. Search is cosine top-k: a flat matrix
+product for small indexes, and an IVF layout (spherical k-means lists,
+probing the closest few) once the index is large enough to need it.
+"""
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from app.core.config import settings
+
+_STOPWORDS = {"user", "prefers", "the", "a", "an", "and", "or", "of", "in", "on", "at", "to", "for", "with"}
+
+
+def _features(text: str) -> list:
+    words = [w for w in re.findall(r"[a-z0-9']+", str(text).lower()) if w not in _STOPWORDS]
+    feats = [(f"w:{w}", 1.0) for w in words]
+    for w in words:
+        padded = f"^{w}$"
+        feats += [(f"c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+    return feats
+
+
+def embed_raw(text: str, dim: int) -> np.ndarray:
+    """Unnormalized signed hashed features; linear in the words of the text."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for feat, weight in _features(text):
+        h = zlib.crc32(feat.encode())
+        vec[h % dim] += weight if h & 0x80000000 else -weight
+    return vec
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    return normalize_rows(embed_raw(text, dim))
+
+
+def _text_key(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+class VectorIndex:
+    """
+    Append-only cosine index. `add` is incremental; `train_ivf` switches
+    search to inverted lists once there are enough rows to pay for it.
+    """
+
+    def __init__(self, dim: int = 256, capacity: int = 1024, mmap_path: str = None,
+                 ivf_min_items: int = 50_000, nprobe: int = 8):
+        self.dim = dim
+        self.mmap_path = mmap_path
+        self.ivf_min_items = ivf_min_items
+        self.nprobe = nprobe
+        self.size = 0
+        self.texts = []
+        self._ids = {}                   # normalized text -> row
+        self._lock = threading.RLock()
+        self._vectors = self._allocate(max(capacity, 1))
+        # IVF state
+        self._centroids = None
+        self._list_offsets = None        # list l = rows offsets[l]:offsets[l + 1] (stored contiguously)
+        self._assignment = None          # list of each row below _indexed
+        self._indexed = 0                # rows laid out by list
+        self._pending = {}               # list -> [rows appended since the last layout]
+        self.loaded = False              # Set once bootstrapped from the database
+        self.high_water = None           # Newest database timestamp seen, for incremental re-syncs
+        self.synced_at = 0.0             # time.monotonic() of the last sync
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if not self.mmap_path:
+            return np.zeros((capacity, self.dim), dtype=np.float32)
+        os.makedirs(os.path.dirname(self.mmap_path) or ".", exist_ok=True)
+        mode = "r+" if getattr(self, "_vectors", None) is not None else "w+"
+        if mode == "r+":
+            self._vectors.flush()
+            with open(self.mmap_path, "r+b") as f:
+                f.truncate(capacity * self.dim * 4)
+        return np.memmap(self.mmap_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        if self.mmap_path:
+            self._vectors = self._allocate(capacity)   # Same file, grown in place
+        else:
+            grown = self._allocate(capacity)
+            grown[:self.size] = self._vectors[:self.size]
+            self._vectors = grown
+
+    # --- Inserts ---
+
+    def contains(self, text: str) -> bool:
+        return _text_key(text) in self._ids
+
+    def add(self, text: str) -> int:
+        """Adds one text (no-op for a duplicate); returns its row."""
+        key = _text_key(text)
+        with self._lock:
+            if key in self._ids:
+                return self._ids[key]
+            return self._append(embed(text, self.dim)[None, :], [text])[0]
+
+    def add_many(self, texts: list) -> list:
+        with self._lock:
+            fresh = list({_text_key(t): t for t in texts if t and _text_key(t) not in self._ids}.values())
+            if fresh:
+                self.add_vectors(normalize_rows(np.stack([embed_raw(t, self.dim) for t in fresh])), fresh)
+            return [self._ids[_text_key(t)] for t in texts if t]
+
+    def add_vectors(self, vectors: np.ndarray, texts: list) -> list:
+        """Bulk path for already-normalized rows (bootstrap, benchmarks)."""
+        with self._lock:
+            return self._append(np.asarray(vectors, dtype=np.float32), texts)
+
+    def _append(self, vectors: np.ndarray, texts: list) -> list:
+        self._reserve(len(vectors))
+        start = self.size
+        self._vectors[start:start + len(vectors)] = vectors
+        self.size += len(vectors)
+        for i, text in enumerate(texts):
+            self._ids.setdefault(_text_key(text), start + i)
+        self.texts.extend(texts)
+        if self._centroids is not None:
+            lists = np.argmax(vectors @ self._centroids.T, axis=1)
+            for row, lst in zip(range(start, self.size), lists):
+                self._pending.setdefault(int(lst), []).append(row)
+            if self.size - self._indexed > max(1024, self._indexed // 10):
+                assignment = np.empty(self.size, dtype=np.int32)
+                assignment[:self._indexed] = self._assignment
+                for lst, rows in self._pending.items():
+                    assignment[rows] = lst
+                self._rebuild_lists(assignment)
+        elif self.size >= self.ivf_min_items:
+            self.train_ivf()
+        return list(range(start, self.size))
+
+    # --- IVF ---
+
+    def _assign(self, start: int, stop: int, chunk: int = 65_536) -> np.ndarray:
+        out = np.empty(stop - start, dtype=np.int32)
+        for lo in range(start, stop, chunk):
+            hi = min(lo + chunk, stop)
+            out[lo - start:hi - start] = np.argmax(self._vectors[lo:hi] @ self._centroids.T, axis=1)
+        return out
+
+    def _rebuild_lists(self, assignment: np.ndarray):
+        """
+        Re-lays rows out grouped by list, so a probe scores one contiguous
+        slice instead of gathering scattered rows. Row numbers change.
+        """
+        n = len(assignment)
+        order = np.argsort(assignment, kind="stable")
+        self._vectors[:n] = self._vectors[order]
+        self.texts[:n] = [self.texts[i] for i in order]
+        new_row = np.empty(n, dtype=np.int64)
+        new_row[order] = np.arange(n)
+        self._ids = {key: int(new_row[row]) if row < n else row for key, row in self._ids.items()}
+        counts = np.bincount(assignment, minlength=len(self._centroids))
+        self._assignment = assignment[order]
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._indexed = n
+        self._pending = {}
+
+    def train_ivf(self, nlist: int = None, iters: int = 8, sample: int = 50_000, seed: int = 0):
+        """Spherical k-means over a sample, then every row goes to its closest list."""
+        with self._lock:
+            if self.size < 2:
+                return
+            nlist = nlist or max(1, int(np.sqrt(self.size)))
+            rng = np.random.default_rng(seed)
+            pick = rng.choice(self.size, size=min(sample, self.size), replace=False)
+            data = np.asarray(self._vectors[np.sort(pick)])
+            centroids = data[rng.choice(len(data), size=min(nlist, len(data)), replace=False)].copy()
+            for _ in range(iters):
+                labels = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, data)
+                empty = ~sums.any(axis=1)
+                sums[empty] = centroids[empty]
+                centroids = normalize_rows(sums)
+            self._centroids = centroids.astype(np.float32)
+            self._rebuild_lists(self._assign(0, self.size))
+
+    def _probe(self, query: np.ndarray):
+        """(rows, scores) for the nprobe lists whose centroids are closest to the query."""
+        nprobe = min(self.nprobe, len(self._centroids))
+        probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        rows, scores = [], []
+        for p in probes:
+            lo, hi = int(self._list_offsets[p]), int(self._list_offsets[p + 1])
+            rows.append(np.arange(lo, hi))
+            scores.append(self._vectors[lo:hi] @ query)
+            if int(p) in self._pending:
+                extra = np.asarray(self._pending[int(p)], dtype=np.int64)
+                rows.append(extra)
+                scores.append(self._vectors[extra] @ query)
+        return np.concatenate(rows), np.concatenate(scores)
+
+    # --- Search ---
+
+    def search_vector(self, query: np.ndarray, k: int = 5, min_score: float = 0.0) -> list:
+        """[(score, row)] best first."""
+        with self._lock:
+            if self.size == 0 or not query.any():
+                return []
+            if self._centroids is not None:
+                rows, scores = self._probe(query)
+            else:
+                rows = None
+                scores = self._vectors[:self.size] @ query
+            k = min(k, len(scores))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            hits = [(float(scores[i]), int(rows[i] if rows is not None else i)) for i in top]
+            return [(s, row) for s, row in hits if s >= min_score]
+
+    def search(self, text: str, k: int = 5, min_score: float = 0.0) -> list:
+        """[(score, text)] for the k nearest remembered texts."""
+        return [(s, self.texts[row]) for s, row in self.search_vector(embed(text, self.dim), k, min_score)]
+
+
+def _index(name: str) -> VectorIndex:
+    mmap_dir = settings.MEMORY_INDEX_MMAP_DIR
+    return VectorIndex(
+        dim=settings.MEMORY_VECTOR_DIM,
+        mmap_path=os.path.join(mmap_dir, f"{name}.f32") if mmap_dir else None,
+        ivf_min_items=settings.MEMORY_IVF_MIN_ITEMS,
+        nprobe=settings.MEMORY_IVF_NPROBE,
+    )
+
+
+user_insight_index = _index("user_insights")
+persona_insight_index = _index("persona_insights")
@@ -0,0 +1,141 @@
+# Backend/app/core/weather_service.py
+"""
+Per-city weather with a TTL cache and single-flight lookups.
+
+One OpenWeather 5-day/3-hour forecast call per city per TTL covers both
+"now" (the first slot) and the days of the trip. Concurrent plans for the
+same city share one in-flight request, and replans read the cached
+forecast without touching the network.
+"""
+import datetime as dt
+import logging
+from collections import Counter
+from app.core.admission import budgets
+from app.core.config import settings
+from app.core.plan_cache import PlanCache
+from app.core.services import services
+from app.core.telemetry import track_upstream
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_WEATHER = "Mild (20°C)"
+WET_CONDITIONS = {"Rain", "Drizzle", "Thunderstorm", "Snow"}
+WET_POP = 0.5   # Probability of precipitation at/above which a day counts as wet
+
+
+def city_key(city: str) -> str:
+    return " ".join((city or "").lower().split())
+
+
+def summarize_forecast(payload: dict) -> dict:
+    """OpenWeather /forecast JSON -> {'current': {...}, 'days': [{date, condition, temp_min, temp_max, pop, wet}]}"""
+    slots = payload.get("list") or []
+    if not slots:
+        return None
+    offset = dt.timedelta(seconds=(payload.get("city") or {}).get("timezone", 0))
+    by_date = {}
+    for slot in slots:
+        local = dt.datetime.fromtimestamp(slot["dt"], dt.timezone.utc) + offset
+        by_date.setdefault(local.date().isoformat(), []).append(slot)
+
+    days = []
+    for date, day_slots in by_date.items():
+        conditions = Counter(s["weather"][0]["main"] for s in day_slots if s.get("weather"))
+        temps = [s["main"]["temp"] for s in day_slots]
+        pop = max(s.get("pop", 0.0) for s in day_slots)
+        # Any wet slot makes the day wet, even if it isn't the most common condition
+        wet = pop >= WET_POP or any(c in WET_CONDITIONS for c in conditions)
+        condition = next((c for c, _ in conditions.most_common() if c in WET_CONDITIONS), None) if wet else None
+        days.append({
+            "date": date,
+            "condition": condition or conditions.most_common(1)[0][0],
+            "temp_min": round(min(temps)), "temp_max": round(max(temps)),
+            "pop": round(pop, 2), "wet": wet,
+        })
+
+    first = slots[0]
+    return {
+        "current": {"condition": first["weather"][0]["main"], "temp": first["main"]["temp"]},
+        "days": days,
+    }
+
+
+def current_summary(forecast: dict) -> str:
+    """'Rain (12.3°C)': the shape the researcher and /plan progress events have always used."""
+    if not forecast:
+        return FALLBACK_WEATHER
+    now = forecast["current"]
+    return f"{now['condition']} ({now['temp']}°C)"
+
+
+def trip_outlook(forecast: dict, start_date: str, days: int) -> list:
+    """Forecast days that fall on the trip, labelled with their trip day (Day 1 = start_date)."""
+    if not forecast:
+        return []
+    try:
+        start = dt.date.fromisoformat(str(start_date)[:10])
+    except ValueError:
+        start = dt.date.fromisoformat(forecast["days"][0]["date"])
+    outlook = []
+    for day in forecast["days"]:
+        number = (dt.date.fromisoformat(day["date"]) - start).days + 1
+        if 1 <= number <= days:
+            outlook.append({"day": number, **day})
+    return outlook
+
+
+def describe_outlook(outlook: list) -> str:
+    """One prompt line: 'Day 1 Rain 11-15°C (80% rain); Day 2 Clear 14-21°C'."""
+    parts = []
+    for day in outlook:
+        text = f"Day {day['day']} {day['condition']} {day['temp_min']}-{day['temp_max']}°C"
+        if day["wet"]:
+            text += f" ({day['pop']:.0%} rain)"
+        parts.append(text)
+    return "; ".join(parts)
+
+
+def replan_outlook(forecast: dict, start_date: str = None, days: int = 5) -> str:
+    """Prompt line for a replan; without a trip start date, Day 1 is the forecast's first day."""
+    return describe_outlook(trip_outlook(forecast, start_date, days))
+
+
+class WeatherService:
+
+    def __init__(self, ttl: float, max_items: int):
+        self.cache = PlanCache(ttl=ttl, max_items=max_items)   # TTL + LRU + single-flight
+        self.stats = {"fetches": 0, "failures": 0}
+
+    async def _fetch(self, city: str) -> dict:
+        params = {"q": city, "appid": settings.OPENWEATHER_KEY, "units": "metric"}
+        self.stats["fetches"] += 1
+        async with budgets["weather"].slot():
+            with track_upstream("weather", "forecast"):
+                res = await services.http.get(settings.OPENWEATHER_FORECAST_URL, params=params,
+                                              timeout=settings.WEATHER_TIMEOUT_SECONDS)
+        res.raise_for_status()
+        forecast = summarize_forecast(res.json())
+        if forecast is None:
+            raise ValueError("empty forecast")
+        return forecast
+
+    async def forecast(self, city: str):
+        """Cached forecast for city (fetched once per TTL, shared by concurrent callers); None on failure."""
+        try:
+            forecast, _ = await self.cache.get_or_compute(city_key(city), lambda: self._fetch(city))
+            return forecast
+        except Exception as e:
+            # Failures aren't cached, so the next plan retries
+            self.stats["failures"] += 1
+            logger.warning("Weather lookup failed for %s: %s", city, e)
+            return None
+
+    def cached_forecast(self, city: str):
+        """Memory only: what replans use, so they never wait on OpenWeather."""
+        return self.cache.peek(city_key(city))
+
+    def snapshot(self) -> dict:
+        return {**self.stats, **self.cache.snapshot()}
+
+
+weather_service = WeatherService(ttl=settings.WEATHER_TTL_SECONDS, max_items=settings.WEATHER_CACHE_MAX_CITIES)
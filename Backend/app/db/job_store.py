@@ -0,0 +1,434 @@
+# Backend/app/db/job_store.py
+"""
+Queue and state for /plan jobs.
+
+The API submits jobs and reads their state; worker processes (worker.py)
+claim them, append progress events, heartbeat and store the result. Both
+sides talk to a JobBackend:
+
+- SQLiteJobBackend (default): one WAL file. Every API and worker process on
+  the host shares it, so capacity scales by starting more workers. Claims
+  are single UPDATE ... RETURNING statements, so two workers never take the
+  same job.
+- MemoryJobBackend: plain dicts, for a single host without a writable disk.
+  The API serves the one instance from a broker process (JobBroker), and
+  its workers connect to that broker.
+
+Jobs with the same canonical plan key are deduplicated: a submit while one
+is queued or running, or finished within the plan cache TTL, returns the
+existing job. A running job whose worker stops heartbeating is requeued
+(or failed after JOB_MAX_ATTEMPTS).
+"""
+import json
+import multiprocessing
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from multiprocessing.managers import BaseManager
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _last_stage(events: list):
+    """Graph node named by the last progress event in a batch, if any."""
+    for event, data in reversed(events):
+        if event == "progress":
+            return data.get("stage")
+    return None
+
+
+class JobBackend(ABC):
+    """The contract both backends (and any future one) implement; every value is plain JSON-able data."""
+
+    @abstractmethod
+    def submit(self, key: str, request: dict, dedupe_window: float = 0.0, result: dict = None) -> tuple:
+        """(job, created). With dedupe_window > 0 an active job for `key`, or one done within the window, is returned instead."""
+
+    @abstractmethod
+    def get(self, job_id: str):
+        """The job as a dict; None if unknown."""
+
+    @abstractmethod
+    def claim(self, worker: str, lease: float, max_attempts: int):
+        """Oldest queued job, now running on `worker`; None when the queue is empty. Requeues expired leases first."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Extends the lease; True when the job should stop (cancelled, or no longer this worker's)."""
+
+    @abstractmethod
+    def add_events(self, job_id: str, events: list):
+        """Appends (event, data) pairs for subscribers; a `progress` event also sets the job's stage."""
+
+    @abstractmethod
+    def events(self, job_id: str, after: int = 0) -> list:
+        """[(seq, event, data), ...] with seq > after."""
+
+    @abstractmethod
+    def finish(self, job_id: str, worker: str, status: str, result: dict = None, error: str = None):
+        """Final state for a job `worker` is running; a no-op once the job has moved on (lease lost)."""
+
+    @abstractmethod
+    def release(self, job_id: str, worker: str):
+        """Puts a running job back in the queue (worker shutting down)."""
+
+    @abstractmethod
+    def cancel(self, job_id: str):
+        """Cancels a queued job at once, flags a running one for its worker; returns the job (None if unknown)."""
+
+    @abstractmethod
+    def purge(self, older_than: float) -> int:
+        """Drops finished jobs (and their events) that finished before `older_than`."""
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """{status: number of jobs}."""
+
+
+class SQLiteJobBackend(JobBackend):
+
+    COLUMNS = ("id", "key", "status", "request", "result", "error", "stage", "worker", "attempts",
+               "cancel_requested", "created_at", "started_at", "finished_at", "heartbeat")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)   # Autocommit; BEGIN where needed
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, key TEXT NOT NULL, status TEXT NOT NULL, request TEXT NOT NULL, "
+                "result TEXT, error TEXT, stage TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "cancel_requested INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL, heartbeat REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT, "
+                "PRIMARY KEY (job_id, seq))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def _select(self, where: str, params=()):
+        return self._conn().execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE {where}", params).fetchone()
+
+    def submit(self, key, request, dedupe_window=0.0, result=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")   # Check-then-insert must not race another API process
+        try:
+            if dedupe_window > 0:
+                existing = self._select(
+                    "key = ? AND (status IN (?, ?) OR (status = ? AND finished_at > ?)) "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (key, QUEUED, RUNNING, DONE, now - dedupe_window),
+                )
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    return self._row(existing), False
+            job_id = new_job_id()
+            status = DONE if result is not None else QUEUED
+            conn.execute(
+                "INSERT INTO jobs (id, key, status, request, result, created_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, status, json.dumps(request, default=str),
+                 json.dumps(result, default=str) if result is not None else None,
+                 now, now if result is not None else None),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        return self._row(self._select("id = ?", (job_id,)))
+
+    def _expire_leases(self, lease, max_attempts):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET "
+            "status = CASE WHEN cancel_requested THEN ? WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = CASE WHEN attempts >= ? AND NOT cancel_requested THEN 'worker lost' ELSE error END, "
+            "finished_at = CASE WHEN cancel_requested OR attempts >= ? THEN ? ELSE NULL END, worker = NULL "
+            "WHERE status = ? AND heartbeat < ?",
+            (CANCELLED, max_attempts, FAILED, QUEUED, max_attempts, max_attempts, now, RUNNING, now - lease),
+        )
+
+    def claim(self, worker, lease, max_attempts):
+        self._expire_leases(lease, max_attempts)
+        now = time.time()
+        row = self._conn().execute(
+            f"UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat = ?, attempts = attempts + 1 "
+            f"WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) AND status = ? "
+            f"RETURNING {', '.join(self.COLUMNS)}",
+            (RUNNING, worker, now, now, QUEUED, QUEUED),
+        ).fetchall()   # Drains the statement so its write transaction ends here
+        return self._row(row[0]) if row else None
+
+    def heartbeat(self, job_id, worker):
+        conn = self._conn()
+        cur = conn.execute(
+            "UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = ? AND worker = ?",
+            (time.time(), job_id, RUNNING, worker),
+        )
+        if not cur.rowcount:
+            return True
+        return bool(conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+
+    def add_events(self, job_id, events):
+        if not events:
+            return
+        conn = self._conn()
+        # One writer per job (its worker), so reading the last seq first is safe
+        last = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+        conn.executemany(
+            "INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)",
+            [(job_id, last + i, event, json.dumps(data, default=str)) for i, (event, data) in enumerate(events, 1)],
+        )
+        stage = _last_stage(events)
+        if stage is not None:
+            conn.execute("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+
+    def events(self, job_id, after=0):
+        rows = self._conn().execute(
+            "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+        return [(seq, event, json.loads(data)) for seq, event, data in rows]
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+            "WHERE id = ? AND status = ? AND worker = ?",
+            (status, json.dumps(result, default=str) if result is not None else None, error,
+             time.time(), job_id, RUNNING, worker),
+        )
+
+    def release(self, job_id, worker):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, worker = NULL, attempts = MAX(attempts - 1, 0) "
+            "WHERE id = ? AND status = ? AND worker = ?",
+            (QUEUED, job_id, RUNNING, worker),
+        )
+
+    def cancel(self, job_id):
+        conn = self._conn()
+        conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                     (CANCELLED, time.time(), job_id, QUEUED))
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        return self.get(job_id)
+
+    def purge(self, older_than):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN "
+                "(SELECT id FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?)", (*FINISHED, older_than)
+            )
+            removed = conn.execute("DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                                   (*FINISHED, older_than)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class MemoryJobBackend(JobBackend):
+    """Same contract over dicts; one lock, since the broker serves each connection on its own thread."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._events = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(job):
+        return json.loads(json.dumps(job, default=str)) if job is not None else None
+
+    def submit(self, key, request, dedupe_window=0.0, result=None):
+        now = time.time()
+        with self._lock:
+            if dedupe_window > 0:
+                for job in sorted(self._jobs.values(), key=lambda j: -j["created_at"]):
+                    if job["key"] == key and (job["status"] in ACTIVE or (
+                            job["status"] == DONE and job["finished_at"] > now - dedupe_window)):
+                        return self._copy(job), False
+            job = {
+                "id": new_job_id(), "key": key, "status": DONE if result is not None else QUEUED,
+                "request": request, "result": result, "error": None, "stage": None, "worker": None,
+                "attempts": 0, "cancel_requested": False, "created_at": now, "started_at": None,
+                "finished_at": now if result is not None else None, "heartbeat": None,
+            }
+            self._jobs[job["id"]] = job
+            self._events[job["id"]] = []
+            return self._copy(job), True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._copy(self._jobs.get(job_id))
+
+    def claim(self, worker, lease, max_attempts):
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] == RUNNING and job["heartbeat"] < now - lease:
+                    if job["cancel_requested"]:
+                        job.update(status=CANCELLED, finished_at=now)
+                    elif job["attempts"] >= max_attempts:
+                        job.update(status=FAILED, error="worker lost", finished_at=now)
+                    else:
+                        job["status"] = QUEUED
+                    job["worker"] = None
+            queued = [job for job in self._jobs.values() if job["status"] == QUEUED]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j["created_at"])
+            job.update(status=RUNNING, worker=worker, started_at=now, heartbeat=now, attempts=job["attempts"] + 1)
+            return self._copy(job)
+
+    def _owned(self, job_id, worker):
+        job = self._jobs.get(job_id)
+        return job if job is not None and job["status"] == RUNNING and job["worker"] == worker else None
+
+    def heartbeat(self, job_id, worker):
+        with self._lock:
+            job = self._owned(job_id, worker)
+            if job is None:
+                return True
+            job["heartbeat"] = time.time()
+            return job["cancel_requested"]
+
+    def add_events(self, job_id, events):
+        with self._lock:
+            log = self._events.setdefault(job_id, [])
+            log.extend((len(log) + i, event, data) for i, (event, data) in enumerate(events, 1))
+            stage = _last_stage(events)
+            if stage is not None and job_id in self._jobs:
+                self._jobs[job_id]["stage"] = stage
+
+    def events(self, job_id, after=0):
+        with self._lock:
+            return self._copy([entry for entry in self._events.get(job_id, []) if entry[0] > after])
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        with self._lock:
+            job = self._owned(job_id, worker)
+            if job is not None:
+                job.update(status=status, result=result, error=error, finished_at=time.time())
+
+    def release(self, job_id, worker):
+        with self._lock:
+            job = self._owned(job_id, worker)
+            if job is not None:
+                job.update(status=QUEUED, worker=None, attempts=max(job["attempts"] - 1, 0))
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] == QUEUED:
+                job.update(status=CANCELLED, finished_at=time.time())
+            elif job is not None and job["status"] == RUNNING:
+                job["cancel_requested"] = True
+            return self._copy(job)
+
+    def purge(self, older_than):
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job["status"] in FINISHED and job["finished_at"] < older_than]
+            for job_id in stale:
+                del self._jobs[job_id]
+                self._events.pop(job_id, None)
+            return len(stale)
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+
+# --- In-memory broker: one MemoryJobBackend shared by the API and its worker processes ---
+
+_shared_backend = None
+
+
+def _memory_backend() -> MemoryJobBackend:
+    global _shared_backend
+    if _shared_backend is None:
+        _shared_backend = MemoryJobBackend()
+    return _shared_backend
+
+
+class JobBroker(BaseManager):
+    pass
+
+
+JobBroker.register("backend", callable=_memory_backend)
+
+_broker = None
+_broker_authkey = secrets.token_bytes(16)
+
+
+def start_broker() -> JobBackend:
+    """Starts the broker process (API side, once) and returns a proxy to its backend."""
+    global _broker
+    if _broker is None:
+        _broker = JobBroker(address=("127.0.0.1", 0), authkey=_broker_authkey,
+                            ctx=multiprocessing.get_context("spawn"))
+        _broker.start()
+    return _broker.backend()
+
+
+def broker_address():
+    """(address, authkey) for workers to connect with; None when no broker runs in this process."""
+    return (_broker.address, _broker_authkey) if _broker is not None else None
+
+
+def connect_broker(address, authkey: bytes) -> JobBackend:
+    broker = JobBroker(address=address, authkey=authkey)
+    broker.connect()
+    return broker.backend()
+
+
+def open_backend(kind: str, path: str) -> JobBackend:
+    """The configured backend (JOB_BACKEND): 'sqlite' at `path`, or 'memory' via the broker."""
+    if kind == "memory":
+        return start_broker()
+    if kind != "sqlite":
+        raise ValueError(f"Unknown JOB_BACKEND {kind!r} (expected 'sqlite' or 'memory')")
+    return SQLiteJobBackend(path)
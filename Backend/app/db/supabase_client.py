@@ -1,34 +1,97 @@
-from supabase import create_client, Client
+import asyncio
+import logging
+import time
+from app.core.admission import budgets
 from app.core.config import settings
-import httpx # For embedding calls
+from app.core.services import services
+from app.core.telemetry import track_upstream
+from app.core.vector_index import persona_insight_index
+from app.db.write_queue import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+
+def insert_rows(table: str, rows: list):
+    """One multi-row insert; raises so the write queue can retry or spool."""
+    with budgets["supabase"].hold(), track_upstream("supabase", f"insert:{table}"):
+        services.supabase.table(table).insert(rows).execute()
+
+
+# All writes go through here so DB latency never lands on a request
+write_queue = WriteBehindQueue(
+    insert_rows,
+    spool_path=settings.WRITE_SPOOL_PATH,
+    batch_size=settings.WRITE_BATCH_SIZE,
+    flush_interval=settings.WRITE_FLUSH_INTERVAL_SECONDS,
+    max_retries=settings.WRITE_MAX_RETRIES,
+    retry_base=settings.WRITE_RETRY_BASE_SECONDS,
+    max_items=settings.WRITE_QUEUE_MAX_ITEMS,
+    replay_interval=settings.WRITE_REPLAY_INTERVAL_SECONDS,
+    claim_timeout=settings.WRITE_REPLAY_LEASE_SECONDS,
+)
+
+def fetch_insight_rows(table: str, column: str, limit: int, order_by: str = None, since=None) -> list:
+    """
+    Blocking read of remembered insights as (text, order_by value), newest
+    first when order_by is given; with `since`, only rows newer than that.
+    """
+    query = services.supabase.table(table).select(f"{column},{order_by}" if order_by else column)
+    if order_by:
+        if since is not None:
+            query = query.gt(order_by, since)
+        query = query.order(order_by, desc=True)
+    with budgets["supabase"].hold(), track_upstream("supabase", f"select:{table}"):
+        res = query.limit(limit).execute()
+    return [(row[column], row.get(order_by) if order_by else None) for row in res.data or [] if row.get(column)]
+
+
+async def ensure_index_loaded(index, table: str, column: str, order_by: str = None):
+    """
+    Fills an in-process vector index from Supabase once; inserts made here
+    keep it current. Indexes ordered by a timestamp also pull rows past
+    their high-water mark every MEMORY_RESYNC_SECONDS, so preferences stored
+    by another process (the API vs. the job workers) reach this one too.
+    """
+    if index.loaded and (order_by is None or time.monotonic() - index.synced_at < settings.MEMORY_RESYNC_SECONDS):
+        return
+    since = index.high_water if index.loaded else None
+    try:
+        rows = await asyncio.to_thread(fetch_insight_rows, table, column, settings.MEMORY_BOOTSTRAP_LIMIT,
+                                       order_by, since)
+    except Exception as e:
+        if not index.loaded:
+            raise
+        logger.warning("Index re-sync of %s skipped: %s", table, e)   # Keep serving what we have
+        index.synced_at = time.monotonic()
+        return
+    await asyncio.to_thread(index.add_many, [text for text, _ in rows])
+    marks = [mark for _, mark in rows if mark is not None]
+    if marks:
+        index.high_water = max(marks + ([index.high_water] if index.high_water is not None else []))
+    index.synced_at = time.monotonic()
+    index.loaded = True
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
 
 async def get_psychographic_memory(query: str):
     """
-    Uses pgvector to find semantically similar past preferences.
+    Finds semantically similar past preferences in the in-process vector
+    index over persona_insights (cosine top-k on hashed embeddings).
     """
     try:
-        # 1. Generate Embedding for the current query (Simplified for MVP)
-        # In production, use OpenAI or a local sentence-transformer here.
-        # For now, we perform a targeted keyword search in the insights table.
-        response = supabase.table("persona_insights") \
-            .select("insight_value") \
-            .limit(5) \
-            .execute()
-        
-        if response.data:
-            return " | ".join([item['insight_value'] for item in response.data])
+        await ensure_index_loaded(persona_insight_index, "persona_insights", "insight_value")
+        hits = persona_insight_index.search(query, settings.MEMORY_TOP_K, settings.MEMORY_MIN_SCORE)
+        if hits:
+            return " | ".join(text for _, text in hits)
         return "No specific past preferences found."
     except Exception as e:
-        print(f"Vector Retrieval Error: {e}")
+        logger.warning("Vector Retrieval Error: %s", e)
         return ""
 
 def save_itinerary(dest: str, json_data: list):
-    supabase.table("itineraries").insert({
+    write_queue.enqueue("itineraries", {
         "destination": dest,
         "json_data": json_data
-    }).execute()
+    })
 
 
 # Backend/app/db/supabase_client.py
@@ -45,7 +108,7 @@ def save_full_journey(destination, itinerary, insights, center):
             "center_lat": center['lat'],
             "center_lon": center['lon']
         }
-        supabase.table("itineraries").insert(data).execute()
-        print(f"Journey to {destination} persisted to Supabase.")
+        write_queue.enqueue("itineraries", data)
+        logger.info("Journey to %s queued for Supabase.", destination)
     except Exception as e:
-        print(f"Supabase Save Error: {e}")
\ No newline at end of file
+        logger.error("Supabase Save Error: %s", e)
\ No newline at end of file
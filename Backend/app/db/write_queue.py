@@ -0,0 +1,252 @@
+# Backend/app/db/write_queue.py
+"""
+Write-behind queue for Supabase inserts.
+
+Handlers enqueue rows and return immediately. A background thread drains
+the queue into multi-row inserts (one per table and column set), retrying
+with exponential backoff. Rows that still fail are spooled to a local
+SQLite file and replayed once the database answers again, and also at the
+next start (start()) if the process went down with a spool on disk. Replay
+is at-least-once: rows leave the spool only after their insert succeeds.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+
+    def __init__(self, insert_rows, spool_path: str, batch_size: int = 50,
+                 flush_interval: float = 0.5, max_retries: int = 3, retry_base: float = 0.5,
+                 max_items: int = 10_000, replay_interval: float = 30.0, claim_timeout: float = 120.0):
+        self.insert_rows = insert_rows          # (table, [row, ...]) -> None, raises on failure
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.replay_interval = replay_interval
+        self.claim_timeout = claim_timeout      # Replay lease; past it another process may resend the rows
+        self._owner = uuid.uuid4().hex
+        self._queue = queue.Queue(maxsize=max_items)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._spool_conn = None
+        self._healthy = True
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "retries": 0,
+                      "failed_batches": 0, "spooled": 0, "replayed": 0}
+
+    # --- Producer side (request handlers) ---
+
+    def enqueue(self, table: str, row: dict):
+        """Never blocks: a full queue spools straight to disk instead."""
+        self._ensure_started()
+        self.stats["enqueued"] += 1
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self._spool([(table, row)])
+
+    def start(self):
+        """Starts the writer at boot, so a spool left by the last run is replayed without waiting for a write."""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stop.is_set():
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="supabase-writer", daemon=True)
+                self._thread.start()
+
+    # --- Writer thread ---
+
+    def _run(self):
+        next_replay = 0.0   # First pass replays what the last run spooled
+        while True:
+            if time.monotonic() >= next_replay:
+                self._replay()
+                next_replay = time.monotonic() + self.replay_interval
+            batch = self._drain()
+            if batch:
+                self._write(batch)
+            if self._stop.is_set() and self._queue.empty():
+                break
+
+    def _drain(self) -> list:
+        """Waits up to flush_interval for the first row, then takes what's queued (up to a batch)."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _group(rows: list) -> dict:
+        """PostgREST multi-row inserts need one table and one column set per request."""
+        groups = {}
+        for table, row in rows:
+            groups.setdefault((table, tuple(sorted(row))), []).append(row)
+        return groups
+
+    def _write(self, rows: list):
+        for (table, _), group in self._group(rows).items():
+            if self._insert_with_retry(table, group):
+                if not self._healthy:
+                    self._healthy = True
+                    self._replay()
+            else:
+                self._healthy = False
+                self._spool([(table, row) for row in group])
+
+    def _insert_with_retry(self, table: str, rows: list) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.insert_rows(table, rows)
+                self.stats["batches"] += 1
+                self.stats["written"] += len(rows)
+                return True
+            except Exception as e:
+                logger.warning("Supabase write failed (%s, %d rows, attempt %d): %s", table, len(rows), attempt + 1, e)
+                # Shutting down or already known to be down: go straight to the spool
+                if attempt == self.max_retries or self._stop.is_set() or not self._healthy:
+                    break
+                self.stats["retries"] += 1
+                time.sleep(self.retry_base * (2 ** attempt) * (1 + random.random() * 0.25))
+        self.stats["failed_batches"] += 1
+        return False
+
+    # --- SQLite spool ---
+
+    def _spool_db(self) -> sqlite3.Connection:
+        if self._spool_conn is None:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.spool_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL, "
+                "claimed_by TEXT, claimed_at REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(spool)")}
+            for column, kind in (("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+                if column not in columns:   # Spool written before replay leases existed
+                    conn.execute(f"ALTER TABLE spool ADD COLUMN {column} {kind}")
+            self._spool_conn = conn
+        return self._spool_conn
+
+    def _spool(self, rows: list):
+        now = time.time()
+        with self._spool_lock:
+            db = self._spool_db()
+            db.executemany(
+                "INSERT INTO spool (tbl, payload, created_at) VALUES (?, ?, ?)",
+                [(table, json.dumps(row, default=str), now) for table, row in rows],
+            )
+            db.commit()
+        self.stats["spooled"] += len(rows)
+
+    def spool_depth(self) -> int:
+        if self._spool_conn is None and not os.path.exists(self.spool_path):
+            return 0
+        with self._spool_lock:
+            return self._spool_db().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def _claim_spooled(self) -> list:
+        """
+        Leases the oldest unclaimed batch to this queue in one write
+        transaction, so processes sharing the spool file (API and job
+        workers) never replay the same rows. Rows stay on disk until their
+        insert succeeds; a lease older than claim_timeout (its process died
+        mid-replay) is up for grabs again.
+        """
+        now = time.time()
+        with self._spool_lock:
+            db = self._spool_db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                records = db.execute(
+                    "UPDATE spool SET claimed_by = ?, claimed_at = ? WHERE id IN ("
+                    "SELECT id FROM spool WHERE claimed_by IS NULL OR claimed_at < ? ORDER BY id LIMIT ?) "
+                    "RETURNING id, tbl, payload",
+                    (self._owner, now, now - self.claim_timeout, self.batch_size),
+                ).fetchall()
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        return sorted(records)
+
+    def _settle(self, records: list, sent: bool):
+        """Deletes rows that reached the database, or releases the lease on rows that didn't."""
+        sql = ("DELETE FROM spool WHERE id = ? AND claimed_by = ?" if sent else
+               "UPDATE spool SET claimed_by = NULL, claimed_at = NULL WHERE id = ? AND claimed_by = ?")
+        with self._spool_lock:
+            db = self._spool_db()
+            db.executemany(sql, [(rec_id, self._owner) for rec_id, _, _ in records])
+            db.commit()
+
+    def _replay(self):
+        """Re-sends spooled rows oldest first; stops at the first failure."""
+        while True:
+            records = self._claim_spooled()
+            if not records:
+                break
+            groups = {}
+            for record in records:
+                _, table, payload = record
+                groups.setdefault((table, tuple(sorted(json.loads(payload)))), []).append(record)
+            unsent = list(records)
+            for (table, _), items in groups.items():
+                try:
+                    self.insert_rows(table, [json.loads(payload) for _, _, payload in items])
+                except Exception as e:
+                    logger.warning("Spool replay paused (%s): %s", table, e)
+                    self._healthy = False
+                    self._settle(unsent, sent=False)
+                    return
+                self._settle(items, sent=True)
+                unsent = [r for r in unsent if r not in items]
+                self.stats["batches"] += 1
+                self.stats["replayed"] += len(items)
+            self._healthy = True
+
+    # --- Lifecycle / metrics ---
+
+    def flush(self, timeout: float = 5.0):
+        """Stops the writer after draining; whatever can't be written in time is spooled."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            self._spool(leftovers)
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "queue_depth": self._queue.qsize(),
+            "spool_depth": self.spool_depth(),
+            "healthy": self._healthy,
+            "running": bool(self._thread and self._thread.is_alive()),
+        }
@@ -0,0 +1,67 @@
+"""
+Day planner benchmark (no keys, no network).
+
+Times plan_days on synthetic pools (4 stops per day around a hotel) and
+compares how compact the days are against slicing the single logistics
+route into consecutive chunks of 4, which is what the format prompt used
+to be left to do.
+
+    cd Backend && python -m benchmarks.bench_day_planner --days 30 --pois 200
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+
+from app.core.day_planner import plan_days, day_spread_km
+from app.core.route_solver import travel_time_matrix, solve_route
+
+
+def synthetic_pool(count: int) -> list:
+    pool = [{"title": "Hotel", "type": "Stay", "lat": 41.39, "lon": 2.17}]
+    for i in range(count - 1):
+        pool.append({"title": f"Place {i}", "type": random.choice(["Indoor", "Outdoor"]),
+                     "lat": 41.39 + random.gauss(0, 0.03), "lon": 2.17 + random.gauss(0, 0.04)})
+    return pool
+
+
+def chunked(route_pool: list, days: int) -> list:
+    """Baseline: the solved single route cut into equal consecutive days."""
+    per_day = math.ceil((len(route_pool) - 1) / days)
+    return [route_pool[0]] + [{**p, "day": i // per_day + 1} for i, p in enumerate(route_pool[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--pois", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=20.0, help="per-day sequencing budget, whole trip")
+    args = parser.parse_args()
+
+    random.seed(3)
+    timings, ours, baseline = [], [], []
+    for _ in range(args.runs):
+        pool = synthetic_pool(args.pois)
+        durations = travel_time_matrix(pool)
+        wet = [random.random() < 0.3 for _ in range(args.days)]
+        t0 = time.perf_counter()
+        planned = plan_days(pool, args.days, durations, wet, time_budget=args.budget_ms / 1000)
+        timings.append((time.perf_counter() - t0) * 1000)
+        ours.append(day_spread_km(planned))
+        route = solve_route(durations, 0.05)
+        baseline.append(day_spread_km(chunked([pool[i] for i in route], args.days)))
+
+        sizes = [sum(p["day"] == d for p in planned[1:]) for d in range(1, args.days + 1)]
+        assert len(planned) == len(pool) and max(sizes) - min(sizes) <= 1, sizes
+
+    timings.sort()
+    print(f"{args.days} days, {args.pois} POIs, {args.runs} runs")
+    print(f"plan_days: p50 {timings[len(timings) // 2]:6.1f} ms  max {timings[-1]:6.1f} ms")
+    print(f"mean day spread: clustered {statistics.mean(ours):.2f} km  "
+          f"route chunks {statistics.mean(baseline):.2f} km")
+
+
+if __name__ == "__main__":
+    main()
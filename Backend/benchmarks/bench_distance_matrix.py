@@ -0,0 +1,65 @@
+"""
+Distance-matrix fetcher check against a local fake Distance Matrix server.
+
+Verifies that N x N requests are split into tiles within Google's limits,
+that a second call is served from the pair cache, and that adding POIs
+only requests the missing pairs.
+
+    cd Backend && python -m benchmarks.bench_distance_matrix --pois 20
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.fake_upstreams import FakeServer, DistanceMatrixHandler
+from app.core import matrix_service
+from app.core.config import settings
+from app.core.services import services
+
+
+def random_pois(n, seed):
+    rng = random.Random(seed)
+    return [{"lat": 41.38 + rng.gauss(0, 0.02), "lon": 2.17 + rng.gauss(0, 0.02)} for _ in range(n)]
+
+
+async def run(pois: int):
+    server = FakeServer(DistanceMatrixHandler).start()
+    settings.DISTANCE_MATRIX_URL = f"{server.url}/maps/api/distancematrix/json"
+    try:
+        pool = random_pois(pois, seed=1)
+
+        t0 = time.perf_counter()
+        cold = await matrix_service.fetch_duration_matrix(pool)
+        t_cold = time.perf_counter() - t0
+        cold_requests = list(server.requests)
+
+        t0 = time.perf_counter()
+        warm = await matrix_service.fetch_duration_matrix(pool)
+        t_warm = time.perf_counter() - t0
+        warm_requests = len(server.requests) - len(cold_requests)
+
+        grown = pool + random_pois(3, seed=2)
+        before = len(server.requests)
+        await matrix_service.fetch_duration_matrix(grown)
+        grown_elements = sum(o * d for o, d in server.requests[before:])
+
+        assert cold.shape == (pois, pois) and (warm == cold).all()
+        assert all(o * d <= 100 for o, d in cold_requests), "tile exceeded element limit"
+        assert warm_requests == 0, "warm call should not hit the network"
+
+        print(f"cold : {t_cold * 1000:7.1f} ms  {len(cold_requests)} tiles "
+              f"{[o * d for o, d in cold_requests]} elements")
+        print(f"warm : {t_warm * 1000:7.1f} ms  {warm_requests} requests")
+        print(f"+3   : {grown_elements} elements requested "
+              f"(full refetch would be {len(grown) ** 2})")
+        print(f"stats: {matrix_service.stats}")
+    finally:
+        await services.aclose()
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pois", type=int, default=20)
+    asyncio.run(run(parser.parse_args().pois))
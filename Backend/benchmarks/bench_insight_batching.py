@@ -0,0 +1,119 @@
+"""
+LLM calls per chat session: per-message extraction vs the batched,
+debounced InsightBatcher.
+
+Replays a seeded chat trace (sessions of bursty messages: questions,
+small talk and repeated preferences) against a stub extractor model that
+counts calls. Time is scaled down: the flush interval becomes --flush-ms
+and the gaps between bursts are longer than it, the gaps inside a burst
+shorter. Both modes store into fresh indexes so dedupe is measured too.
+
+    cd Backend && python -m benchmarks.bench_insight_batching --sessions 50
+"""
+import argparse
+import asyncio
+import random
+import re
+import types
+
+from app.agents import extractor
+from app.core.config import settings
+from app.core.vector_index import VectorIndex
+
+LIKES = ["street food", "quiet cafes", "rooftop bars", "art museums", "hiking trails", "jazz clubs",
+         "vegan restaurants", "flea markets", "sunset viewpoints", "local bakeries"]
+PREFERENCES = ["I love {x}", "we prefer {x}", "my partner and I enjoy {x}", "I'd like more {x}"]
+OTHER = ["what time does the museum open?", "how far is the next stop?", "thanks!", "is it going to rain?",
+         "where is the hotel?", "ok sounds good", "can you tell me about the cathedral?", "how much is the metro?"]
+
+
+def build_trace(sessions: int, seed: int = 7) -> list:
+    """[(session_id, [(gap_kind, message), ...])] with 'burst' or 'idle' gaps before each message."""
+    rng = random.Random(seed)
+    trace = []
+    for s in range(sessions):
+        favourites = rng.sample(LIKES, 3)
+        messages = []
+        for i in range(rng.randint(8, 16)):
+            if rng.random() < 0.35:
+                text = rng.choice(PREFERENCES).format(x=rng.choice(favourites))
+            else:
+                text = rng.choice(OTHER)
+            messages.append(("idle" if i and rng.random() < 0.25 else "burst", text))
+        trace.append((f"session-{s}", messages))
+    return trace
+
+
+class StubExtractor:
+    """Pretends to be Claude: one 'User prefers X' line per preference it can see."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, agent, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        prompt = kwargs["messages"][0]["content"]
+        found = re.findall(r"(?:love|prefer|enjoy|like more)\s+([a-z ]+)", prompt)
+        text = "\n".join(f"User prefers {x.strip()}" for x in found) or "NONE"
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=text)])
+
+
+def fresh_stores():
+    extractor.user_insight_index = VectorIndex(dim=settings.MEMORY_VECTOR_DIM)
+    extractor.user_insight_index.loaded = True   # Nothing to bootstrap from Supabase
+    extractor.write_queue = types.SimpleNamespace(enqueue=lambda table, row: None)
+    for key in extractor.insight_stats:
+        extractor.insight_stats[key] = 0
+
+
+async def replay(trace, mode: str, burst_gap: float, idle_gap: float):
+    stub = StubExtractor()
+    extractor.ask_claude = stub
+    fresh_stores()
+    batcher = extractor.InsightBatcher()
+
+    async def session(session_id, messages):
+        for gap, text in messages:
+            await asyncio.sleep(idle_gap if gap == "idle" else burst_gap)
+            if mode == "per-message":
+                await extractor.extract_and_save_insight(text)
+            else:
+                batcher.submit(session_id, text)
+
+    await asyncio.gather(*(session(sid, msgs) for sid, msgs in trace))
+    await batcher.flush_all()
+    return stub.calls, extractor.user_insight_index.size, dict(extractor.insight_stats)
+
+
+async def main_async(args):
+    settings.INSIGHT_WINDOW_SIZE = args.window
+    settings.INSIGHT_FLUSH_SECONDS = args.flush_ms / 1000.0
+    trace = build_trace(args.sessions)
+    n_messages = sum(len(m) for _, m in trace)
+    burst_gap, idle_gap = settings.INSIGHT_FLUSH_SECONDS / 10, settings.INSIGHT_FLUSH_SECONDS * 2
+
+    # Baseline is the original behaviour: one Claude call for every message
+    base_calls = n_messages
+    _, base_stored, _ = await replay(trace, "per-message", burst_gap, idle_gap)
+    calls, stored, stats = await replay(trace, "batched", burst_gap, idle_gap)
+
+    print(f"trace   : {args.sessions} sessions, {n_messages} messages "
+          f"(window {args.window}, flush {args.flush_ms:.0f} ms scaled)")
+    print(f"original: {base_calls} LLM calls ({base_calls / args.sessions:.1f} per session)")
+    print(f"batched : {calls} LLM calls ({calls / args.sessions:.1f} per session), "
+          f"{stats['skipped_windows']} windows skipped locally, {stats['duplicates']} duplicates dropped")
+    print(f"stored  : {stored} preferences batched vs {base_stored} per-message (same dedupe)")
+    print(f"saving  : {1 - calls / base_calls:.0%} fewer extraction calls")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--window", type=int, default=8)
+    parser.add_argument("--flush-ms", type=float, default=50.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Local intent router evaluation on benchmarks/data/intent_eval.jsonl.
+
+Reports accuracy against the labels, how many messages would still be
+escalated to Claude, and local p50/p99 latency. With --with-llm (needs a
+real ANTHROPIC_API_KEY) it also runs the Claude router on every message
+and reports agreement plus the router latency the local path saves.
+
+    cd Backend && python -m benchmarks.bench_intent_router [--with-llm]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from app.core import intent_router
+from app.core.config import settings
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_eval.jsonl")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def llm_labels(rows):
+    labels, latencies = [], []
+    for row in rows:
+        t0 = time.perf_counter()
+        labels.append(await intent_router.llm_route(row["text"]))
+        latencies.append(time.perf_counter() - t0)
+    return labels, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--with-llm", action="store_true")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(EVAL_PATH, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    decisions, latencies = [], []
+    for row in rows:
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            decision = intent_router.classify_intent(row["text"])
+            samples.append(time.perf_counter() - t0)
+        decisions.append(decision)
+        latencies.append(statistics.median(samples))
+
+    threshold = settings.INTENT_CONFIDENCE_THRESHOLD
+    local = [d for d in decisions if d["confidence"] >= threshold]
+    correct = sum(d["intent"] == r["label"] for d, r in zip(decisions, rows))
+    local_correct = sum(d["intent"] == r["label"] for d, r in zip(decisions, rows) if d["confidence"] >= threshold)
+    by_source = {s: sum(d["source"] == s for d in local) for s in ("rules", "model")}
+
+    print(f"eval messages      : {len(rows)}")
+    print(f"label accuracy     : {correct / len(rows):.1%} (all), "
+          f"{local_correct / max(len(local), 1):.1%} (answered locally)")
+    print(f"answered locally   : {len(local)}/{len(rows)}  {by_source}  threshold={threshold}")
+    print(f"local latency      : p50 {percentile(latencies, 50) * 1e6:.0f}us  "
+          f"p99 {percentile(latencies, 99) * 1e6:.0f}us")
+
+    if args.with_llm:
+        labels, llm_lat = asyncio.run(llm_labels(rows))
+        agree = sum(d["intent"] == lbl for d, lbl in zip(decisions, labels))
+        saved = [lat for d, lat in zip(decisions, llm_lat) if d["confidence"] >= threshold]
+        print(f"LLM agreement      : {agree / len(rows):.1%}")
+        print(f"LLM router latency : p50 {percentile(llm_lat, 50) * 1000:.0f}ms  "
+              f"p99 {percentile(llm_lat, 99) * 1000:.0f}ms")
+        print(f"latency saved      : {sum(saved):.1f}s over {len(saved)} locally-routed messages")
+
+
+if __name__ == "__main__":
+    main()
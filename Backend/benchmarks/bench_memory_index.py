@@ -0,0 +1,109 @@
+"""
+Vector memory index at scale: top-k latency and recall over 1M insights.
+
+Insights are generated from templates ("User prefers <adj> <noun> in <area>
+<when>"). The hashed embedder is linear in the words of a text, so rows
+are composed from per-word vectors instead of embedding 1M strings one by
+one; a sample is checked against embed() to prove they are identical.
+Reports flat (exact) search, IVF search with recall@k against flat, and
+the incremental insert cost. --mmap backs the matrix with a temp file.
+
+    cd Backend && python -m benchmarks.bench_memory_index --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from app.core.vector_index import VectorIndex, embed, embed_raw, normalize_rows
+
+ADJ = ["quiet", "lively", "hidden", "local", "cheap", "luxury", "vintage", "modern", "rustic", "romantic",
+       "family", "vegan", "spicy", "artsy", "historic", "seaside", "rooftop", "underground", "organic", "late",
+       "slow", "sunny", "shaded", "authentic", "boutique"]
+NOUN = ["cafes", "bars", "markets", "museums", "galleries", "parks", "beaches", "bakeries", "bookshops", "temples",
+        "trails", "viewpoints", "gardens", "tapas", "ramen", "pubs", "clubs", "theatres", "cinemas", "spas",
+        "hostels", "hotels", "boats", "bikes", "tours", "workshops", "vineyards", "castles", "palaces", "harbours",
+        "plazas", "churches", "concerts", "festivals", "street food", "brunch", "jazz", "flea markets", "zoos", "aquariums"]
+AREA = [f"district{i}" for i in range(40)]
+WHEN = [f"slot{i}" for i in range(25)]
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+
+def build(rows: int, dim: int):
+    parts = [ADJ, NOUN, AREA, WHEN]
+    word_vecs = [np.stack([embed_raw(w, dim) for w in words]) for words in parts]
+    sizes = [len(p) for p in parts]
+    idx = np.arange(rows)
+    digits = []
+    for size in reversed(sizes):
+        digits.append(idx % size)
+        idx = idx // size
+    digits = digits[::-1]
+    matrix = sum(vecs[d] for vecs, d in zip(word_vecs, digits))
+    texts = [f"User prefers {ADJ[a]} {NOUN[n]} in {AREA[r]} {WHEN[w]}"
+             for a, n, r, w in zip(*(d.tolist() for d in digits))]
+    return normalize_rows(matrix.astype(np.float32)), texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--mmap", action="store_true")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    vectors, texts = build(args.rows, args.dim)
+    sample = np.random.default_rng(1).choice(args.rows, 20, replace=False)
+    assert all(np.allclose(vectors[i], embed(texts[i], args.dim), atol=1e-5) for i in sample)
+    print(f"built {args.rows:,} x {args.dim} float32 ({vectors.nbytes / 2**20:.0f} MiB) "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    mmap_path = os.path.join(tempfile.mkdtemp(), "insights.f32") if args.mmap else None
+    index = VectorIndex(dim=args.dim, capacity=args.rows + 4096, mmap_path=mmap_path,
+                        ivf_min_items=args.rows + 1, nprobe=args.nprobe)
+    index.add_vectors(vectors, texts)
+    del vectors
+
+    rng = np.random.default_rng(2)
+    queries = [embed(f"{rng.choice(ADJ)} {rng.choice(NOUN)} {rng.choice(AREA)}", args.dim)
+               for _ in range(args.queries)]
+
+    flat_times, exact = [], []
+    for q in queries[:20]:
+        t0 = time.perf_counter()
+        exact.append(index.search_vector(q, args.k)[-1][0])   # k-th best score
+        flat_times.append(time.perf_counter() - t0)
+    print(f"flat : p50 {percentile(flat_times, 50):7.2f} ms  p99 {percentile(flat_times, 99):7.2f} ms")
+
+    t0 = time.perf_counter()
+    index.train_ivf()
+    print(f"ivf  : trained {len(index._centroids)} lists in {time.perf_counter() - t0:.1f}s")
+
+    ivf_times, recalls = [], []
+    for i, q in enumerate(queries):
+        t0 = time.perf_counter()
+        hits = index.search_vector(q, args.k)
+        ivf_times.append(time.perf_counter() - t0)
+        if i < len(exact):
+            # Score-based: templated rows tie a lot, so any row as good as the exact k-th counts
+            recalls.append(sum(score >= exact[i] - 1e-5 for score, _ in hits) / args.k)
+    print(f"ivf  : p50 {percentile(ivf_times, 50):7.2f} ms  p99 {percentile(ivf_times, 99):7.2f} ms  "
+          f"recall@{args.k} {np.mean(recalls):.2f} (nprobe {args.nprobe})")
+
+    t0 = time.perf_counter()
+    for i in range(1000):
+        index.add(f"User prefers fresh idea number {i}")
+    print(f"add  : {(time.perf_counter() - t0) * 1000:.1f} us per incremental insert")
+    print(f"recall check: {index.search('fresh idea number 7', 1)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+POI catalog benchmark (no keys, no network).
+
+Fills a throwaway catalog with synthetic cities, then times the lookup the
+researcher makes per plan: a stay plus 14 places near it, filtered by
+interests, religion and a minimum Indoor share.
+
+    cd Backend && python -m benchmarks.bench_poi_catalog --cities 50 --pois 200
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from app.core.poi_catalog import POICatalog
+
+NAMES = ["Museum of Art", "City Park", "Tapas Bar", "Old Castle", "Jazz Club", "Cathedral",
+         "Flea Market", "Botanical Garden", "Opera House", "Food Hall", "Rooftop Bar", "Old Quarter"]
+INTERESTS = [["art", "food"], ["history"], ["nature", "shopping"], ["nightlife", "food"], []]
+
+
+def synthetic_city(lat: float, lon: float, count: int) -> list:
+    pois = [{"title": f"Hotel {i}", "type": "Stay", "lat": lat + random.uniform(-.03, .03),
+             "lon": lon + random.uniform(-.03, .03), "price_level": random.randint(1, 4)} for i in range(8)]
+    pois += [{"title": f"{random.choice(NAMES)} {i}", "type": random.choice(["Indoor", "Outdoor"]),
+              "description": "", "lat": lat + random.uniform(-.1, .1), "lon": lon + random.uniform(-.1, .1),
+              "loc": f"Street {i}", "price_level": random.randint(0, 4)} for i in range(count)]
+    return pois
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--pois", type=int, default=200, help="places per city")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    catalog = POICatalog(f"{tempfile.mkdtemp(prefix='bench_catalog_')}/catalog.sqlite3",
+                         radius_km=5.0, cached_cities=args.cities)
+    centers = {f"City {i}": (random.uniform(-50, 60), random.uniform(-120, 140)) for i in range(args.cities)}
+    t0 = time.perf_counter()
+    for city, (lat, lon) in centers.items():
+        catalog.ingest(city, synthetic_city(lat, lon, args.pois))
+    t_build = time.perf_counter() - t0
+
+    cold, warm, short = [], [], 0
+    for _ in range(args.lookups):
+        city = random.choice(list(centers))
+        lat, lon = centers[city]
+        loads = catalog.stats["loads"]
+        t0 = time.perf_counter()
+        pool = catalog.assemble(city, random.choice(INTERESTS), random.choice([200, 1500, 5000]),
+                                near={"lat": lat, "lon": lon}, is_religious=random.random() < 0.5,
+                                min_indoor=random.choice([0, 4, 10]))
+        elapsed = (time.perf_counter() - t0) * 1000
+        if catalog.stats["loads"] > loads:
+            cold.append(elapsed)
+        else:
+            warm.append(elapsed)
+        short += len(pool) < 15 or pool[0]["type"] != "Stay"
+
+    warm.sort()
+    print(f"catalog: {args.cities} cities x {args.pois} POIs, built in {t_build * 1000:.0f} ms")
+    print(f"first lookup per city (SQLite load + index): mean {statistics.mean(cold):6.2f} ms")
+    print(f"warm lookups: p50 {warm[len(warm) // 2]:6.2f} ms  p99 {warm[int(len(warm) * .99)]:6.2f} ms")
+    print(f"short pools: {short}/{args.lookups}  {catalog.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
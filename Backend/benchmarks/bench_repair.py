@@ -0,0 +1,67 @@
+"""
+Local repair engine latency for the common /chat disruptions.
+
+Builds a multi-day itinerary plus a candidate pool, then times each
+disruption through repair_itinerary at every reached index and reports
+p50/p99 and how many messages still needed the LLM heal prompt.
+
+    cd Backend && python -m benchmarks.bench_repair --days 5 --per-day 5
+"""
+import argparse
+import statistics
+import time
+
+from app.core.repair_engine import repair_itinerary
+
+MESSAGES = [
+    "running 30 minutes late",
+    "we're about an hour behind schedule",
+    "it's pouring rain",
+    "skip the next stop",
+    "the Garden 3 is closed today",
+    "can you reorder the rest for less walking",
+    "running late and it's raining",
+    "add a flamenco show tonight",          # Needs the LLM
+]
+
+
+def build_trip(days: int, per_day: int):
+    itinerary = []
+    for d in range(days):
+        for a in range(per_day):
+            n = d * per_day + a
+            title = "Lunch" if a == 2 else (f"Garden {n}" if n % 2 else f"Gallery {n}")
+            itinerary.append({
+                "id": n, "title": title, "time": f"{9 + a * 3:02d}:00",
+                "type": "Outdoor" if n % 2 else "Indoor",
+                "lat": f"{41.38 + (n % 7) * 0.004:.4f}", "lon": f"{2.15 + (n % 5) * 0.006:.4f}",
+                "price": f"${(n * 7) % 40}", "reached": False,
+            })
+    pool = [{"title": f"Museum {i}", "type": "Indoor", "lat": 41.37 + i * 0.003, "lon": 2.14 + i * 0.004,
+             "loc": f"Street {i}", "description": "Indoor pick", "price_level": i % 4} for i in range(20)]
+    return itinerary, pool
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--per-day", type=int, default=5)
+    args = parser.parse_args()
+
+    itinerary, pool = build_trip(args.days, args.per_day)
+    timings, fallbacks = [], 0
+    for message in MESSAGES:
+        for reached in range(-1, len(itinerary) - 1):
+            t0 = time.perf_counter()
+            result = repair_itinerary(message, itinerary, reached, pool=pool)
+            timings.append((time.perf_counter() - t0) * 1000)
+            fallbacks += result is None
+
+    timings.sort()
+    print(f"itinerary: {len(itinerary)} nodes, {len(MESSAGES)} messages, {len(timings)} repairs")
+    print(f"local p50: {statistics.median(timings):.3f} ms   p99: {timings[int(len(timings) * 0.99) - 1]:.3f} ms")
+    print(f"LLM fallbacks: {fallbacks}/{len(timings)}")
+
+
+if __name__ == "__main__":
+    main()
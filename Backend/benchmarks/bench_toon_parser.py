@@ -0,0 +1,85 @@
+"""
+TOON parser micro-benchmark: regex parse_with_insights vs TOONStreamParser.
+
+Builds a large multi-day TOON response (markdown fences included, as the
+model sometimes sends them), checks both parsers agree for several chunk
+sizes, and times them.
+
+    cd Backend && python -m benchmarks.bench_toon_parser --days 30 --per-day 6
+"""
+import argparse
+import time
+
+from app.core.toon_engine import TOONEngine, TOONStreamParser
+
+
+def build_output(days: int, per_day: int) -> str:
+    blocks = ["```toon"]
+    for d in range(days):
+        for a in range(per_day):
+            n = d * per_day + a
+            blocks.append(
+                f"Activity(Place_{n}_Day_{d + 1}) {{\n"
+                f"  Time: {9 + a * 2:02d}:00;\n"
+                f"  Loc: Carrer de Example {n}, 08013 Barcelona;\n"
+                f"  Lat: {41.38 + n * 1e-4:.6f};\n"
+                f"  Lon: {2.17 + n * 1e-4:.6f};\n"
+                f"  Type: {'Indoor' if n % 3 else 'Outdoor'};\n"
+                f"  Logic: 'Fits the slow-travel vibe on day {d + 1}';\n"
+                f"  Description: 'A quiet corner with local character';\n"
+                f"  Price: ${10 + n % 40};\n"
+                f"}}"
+            )
+        blocks.append(
+            f"TripInsight(Day_{d + 1}_Note) {{\n"
+            f"  Content: 'Day {d + 1} keeps walking under 3km';\n  Value: '{d}km';\n}}"
+        )
+    blocks.append("```")
+    return "\n".join(blocks)
+
+
+def stream_parse(text: str, chunk: int):
+    parser = TOONStreamParser()
+    first_at = None
+    for i in range(0, len(text), chunk):
+        if parser.feed(text[i:i + chunk]) and first_at is None:
+            first_at = i + chunk
+    parser.close()
+    return parser.result(), first_at
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = build_output(args.days, args.per_day)
+    expected = TOONEngine.parse_with_insights(text)
+    print(f"input: {len(text) / 1024:.1f} KiB, {len(expected['itinerary'])} activities, "
+          f"{len(expected['insights'])} insights")
+
+    t_regex = best_of(lambda: TOONEngine.parse_with_insights(text), args.repeat)
+    print(f"regex (whole response)   : {t_regex * 1000:7.2f} ms")
+
+    for chunk in (16, 64, 512, len(text)):
+        result, first_at = stream_parse(text, chunk)
+        assert result == expected, f"stream parser diverged at chunk={chunk}"
+        t_stream = best_of(lambda: stream_parse(text, chunk), args.repeat)
+        label = "whole" if chunk == len(text) else f"{chunk}-char chunks"
+        print(f"stream ({label:>15}): {t_stream * 1000:7.2f} ms  "
+              f"first block after {first_at / len(text):.1%} of input")
+
+
+if __name__ == "__main__":
+    main()
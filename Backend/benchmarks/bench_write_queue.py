@@ -0,0 +1,97 @@
+"""
+Write-behind Supabase queue against a local fake PostgREST server.
+
+1. inline : one blocking insert per row (the old request-path behaviour)
+2. queued : enqueue cost seen by the handler, then rows per insert request
+3. outage : the fake answers 503, rows land in the SQLite spool, and are
+            replayed once it recovers
+4. flush  : shutdown drains the queue before the process exits
+
+    cd Backend && python -m benchmarks.bench_write_queue --rows 200 --latency-ms 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from supabase import create_client
+from benchmarks.fake_upstreams import FAKE_SUPABASE_KEY, FakeServer, SupabaseRestHandler
+from app.db.write_queue import WriteBehindQueue
+
+
+def journey(i: int) -> dict:
+    return {"destination": f"City {i % 7}", "json_data": [{"title": f"Stop {i}"}],
+            "insights": [], "center_lat": 41.38, "center_lon": 2.17}
+
+
+def wait_for(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def rows_received(server) -> int:
+    return sum(n for _, n in server.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = FakeServer(SupabaseRestHandler).start()
+    server.latency = args.latency_ms / 1000.0
+    client = create_client(server.url, FAKE_SUPABASE_KEY)
+
+    def insert_rows(table, rows):
+        client.table(table).insert(rows).execute()
+
+    spool = os.path.join(tempfile.mkdtemp(), "spool.sqlite3")
+    wq = WriteBehindQueue(insert_rows, spool_path=spool, batch_size=50, flush_interval=0.05,
+                          max_retries=2, retry_base=0.05, replay_interval=0.2)
+    try:
+        # 1. Inline
+        n_inline = min(args.rows, 50)
+        t0 = time.perf_counter()
+        for i in range(n_inline):
+            insert_rows("itineraries", journey(i))
+        inline_ms = (time.perf_counter() - t0) * 1000 / n_inline
+        print(f"inline : {inline_ms:7.2f} ms per save on the request path")
+        server.requests.clear()
+
+        # 2. Queued
+        t0 = time.perf_counter()
+        for i in range(args.rows):
+            wq.enqueue("itineraries", journey(i))
+        enqueue_us = (time.perf_counter() - t0) * 1e6 / args.rows
+        assert wait_for(lambda: rows_received(server) == args.rows)
+        print(f"queued : {enqueue_us:7.2f} us per save, {args.rows} rows in "
+              f"{len(server.requests)} insert requests")
+
+        # 3. Outage -> spool -> replay
+        server.requests.clear()
+        server.down = True
+        for i in range(args.rows):
+            wq.enqueue("user_insights", {"insight_text": f"User prefers quiet spot {i}"})
+        assert wait_for(lambda: wq.spool_depth() == args.rows)
+        print(f"outage : {wq.spool_depth()} rows spooled, {wq.stats['retries']} retries")
+        server.down = False
+        assert wait_for(lambda: wq.spool_depth() == 0)
+        print(f"replay : {rows_received(server)} rows re-sent in {len(server.requests)} requests")
+
+        # 4. Shutdown flush
+        server.requests.clear()
+        for i in range(25):
+            wq.enqueue("itineraries", journey(i))
+        wq.flush(timeout=5.0)
+        print(f"flush  : {rows_received(server)}/25 rows written before exit, "
+              f"spool {wq.spool_depth()}")
+        print(f"stats  : {wq.snapshot()}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
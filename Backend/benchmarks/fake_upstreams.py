@@ -0,0 +1,430 @@
+"""
+Local stand-ins for the third-party APIs ITERA calls, so the engine can be
+exercised without real keys. Each fake is a stdlib HTTP server running on
+a background thread; point the matching *_URL setting at `server.url`
+(or use start_all() + settings_env() for the whole set).
+
+Every fake sleeps `server.latency` per request: seconds, or a Latency
+distribution. The Anthropic fake additionally spends `server.token_seconds`
+per output token, streamed or not, and answers each agent's prompt with a
+canned reply in the shape that agent parses (POI lines, JSON, TOON, ...).
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# supabase-py only accepts JWT-shaped keys; googlemaps only keys starting with "AIza"
+FAKE_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench"
+FAKE_GOOGLE_KEY = "AIzaFakeKeyForLocalBenchmarks"
+
+
+class Latency:
+    """
+    Per-request delay, parsed from a spec in milliseconds:
+    'fixed:50', 'uniform:20:80' or 'lognormal:300:0.5' (median, sigma).
+    """
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0, seed: int = None):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {kind}")
+        self.kind, self.a, self.b = kind, a, b
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = None) -> "Latency":
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params] + [0.0, 0.0]
+        return cls(kind, values[0], values[1], seed)
+
+    def sample(self) -> float:
+        """Seconds."""
+        if self.kind == "uniform":
+            ms = self.rng.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            ms = self.a * math.exp(self.rng.gauss(0.0, self.b))
+        else:
+            ms = self.a
+        return max(ms, 0.0) / 1000.0
+
+    def __str__(self):
+        return ":".join([self.kind, f"{self.a:g}"] + ([f"{self.b:g}"] if self.kind != "fixed" else []))
+
+
+class FakeServer:
+    """Runs a handler class on 127.0.0.1:<random port> until stop()."""
+
+    def __init__(self, handler_cls):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.fake = self
+        self.requests = []
+        self.lock = threading.Lock()
+        self.latency = 0.0        # Seconds, or a Latency
+        self.down = False         # True: every request fails (503)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def record(self, item):
+        with self.lock:
+            self.requests.append(item)
+
+    def delay(self):
+        latency = self.latency
+        time.sleep(latency.sample() if isinstance(latency, Latency) else latency)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        return json.loads(body or b"null")
+
+
+def _haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(h))
+
+
+class DistanceMatrixHandler(JSONHandler):
+    """
+    Mimics /maps/api/distancematrix/json, including Google's limits
+    (25 origins, 25 destinations, 100 elements per request).
+    Durations are haversine distance at 30 km/h.
+    """
+
+    def do_GET(self):
+        self.server.fake.delay()
+        query = parse_qs(urlparse(self.path).query)
+        origins = [tuple(map(float, o.split(","))) for o in query["origins"][0].split("|")]
+        destinations = [tuple(map(float, d.split(","))) for d in query["destinations"][0].split("|")]
+        self.server.fake.record((len(origins), len(destinations)))
+
+        if len(origins) > 25 or len(destinations) > 25 or len(origins) * len(destinations) > 100:
+            return self.send_json({"status": "MAX_ELEMENTS_EXCEEDED", "rows": []})
+
+        rows = []
+        for o in origins:
+            elements = []
+            for d in destinations:
+                km = _haversine_km(o, d)
+                elements.append({
+                    "status": "OK",
+                    "distance": {"value": int(km * 1000)},
+                    "duration": {"value": int(km / 30.0 * 3600)},
+                })
+            rows.append({"elements": elements})
+        self.send_json({"status": "OK", "rows": rows})
+
+
+class SupabaseRestHandler(JSONHandler):
+    """
+    Mimics PostgREST inserts (POST /rest/v1/<table>) and selects (GET) as
+    supabase-py sends them. Selects return `server.rows[table]` (empty by
+    default). Set `server.down = True` to answer 503.
+    """
+
+    def do_POST(self):
+        fake = self.server.fake
+        fake.delay()
+        rows = self.read_json() or []
+        rows = rows if isinstance(rows, list) else [rows]
+        if fake.down:
+            return self.send_json({"message": "service unavailable"}, status=503)
+        table = urlparse(self.path).path.rsplit("/", 1)[-1]
+        fake.record((table, len(rows)))
+        self.send_json(rows, status=201)
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake.delay()
+        if fake.down:
+            return self.send_json({"message": "service unavailable"}, status=503)
+        url = urlparse(self.path)
+        table = url.path.rsplit("/", 1)[-1]
+        limit = int(parse_qs(url.query).get("limit", ["1000"])[0])
+        fake.record((table, 0))
+        self.send_json(getattr(fake, "rows", {}).get(table, [])[:limit])
+
+
+def _stable_offset(text: str, spread_km: float):
+    """Deterministic (dlat, dlon) in degrees for a name, within +-spread_km."""
+    digest = hashlib.blake2b(text.lower().encode(), digest_size=4).digest()
+    return ((digest[0] * 256 + digest[1]) / 65535 - 0.5) * 2 * spread_km / 111.0, \
+           ((digest[2] * 256 + digest[3]) / 65535 - 0.5) * 2 * spread_km / 111.0
+
+
+class GoogleMapsHandler(DistanceMatrixHandler):
+    """
+    Geocoding, Places text search and the Distance Matrix on one server
+    (googlemaps' base_url). Places land within 4 km of their city, which
+    sits at a stable pseudo-random point; `server.miss_rate` of geocodes
+    answer ZERO_RESULTS so the Places fallback is exercised too.
+    """
+
+    def _place(self, query: str):
+        name, _, city = query.rpartition(",")
+        city = (city or name).strip()
+        clat, clon = _stable_offset(city, 5000.0)
+        dlat, dlon = _stable_offset(name, 4.0) if name else (0.0, 0.0)
+        return {
+            "geometry": {"location": {"lat": round(clat + dlat, 6), "lng": round(clon + dlon, 6)}},
+            "formatted_address": f"{name.strip() or city}, {city}",
+            "price_level": len(query) % 4 + 1,
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/distancematrix/json"):
+            return super().do_GET()
+        fake = self.server.fake
+        fake.delay()
+        query = parse_qs(url.query)
+        if url.path.endswith("/geocode/json"):
+            address = query["address"][0]
+            fake.record(("geocode", address))
+            if random.random() < getattr(fake, "miss_rate", 0.0):
+                return self.send_json({"status": "ZERO_RESULTS", "results": []})
+            return self.send_json({"status": "OK", "results": [self._place(address)]})
+        if url.path.endswith("/place/textsearch/json"):
+            fake.record(("places", query["query"][0]))
+            return self.send_json({"status": "OK", "results": [self._place(query["query"][0])]})
+        self.send_json({"status": "INVALID_REQUEST", "results": []}, status=404)
+
+
+class WeatherHandler(JSONHandler):
+    """
+    OpenWeather /data/2.5/weather and the 5-day/3-hour /data/2.5/forecast,
+    with stable conditions and temperatures per city.
+    """
+
+    CONDITIONS = ["Clear", "Clouds", "Rain", "Drizzle", "Mist"]
+
+    def _slot(self, city: str, i: int, dt: int) -> dict:
+        digest = hashlib.blake2b(f"{city.lower()}|{i // 8}".encode(), digest_size=2).digest()
+        condition = self.CONDITIONS[digest[0] % len(self.CONDITIONS)]
+        return {"dt": dt, "weather": [{"main": condition}],
+                "main": {"temp": round(5 + digest[1] / 255 * 25 + (i % 8 - 4) * 0.5, 1)},
+                "pop": 0.8 if condition in ("Rain", "Drizzle") else 0.1}
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake.delay()
+        url = urlparse(self.path)
+        city = parse_qs(url.query).get("q", [""])[0]
+        fake.record(city)
+        now = int(time.time()) // 10800 * 10800
+        if url.path.endswith("/forecast"):
+            slots = [self._slot(city, i, now + i * 10800) for i in range(40)]
+            return self.send_json({"list": slots, "city": {"name": city, "timezone": 0}})
+        slot = self._slot(city, 0, now)
+        self.send_json({"weather": slot["weather"], "main": slot["main"]})
+
+
+# --- Anthropic Messages API ---
+
+_POOL_ROW = re.compile(r"^\s*P\d+\|([^|\n]+)\|([^|\n]*)\|([^|\n]*)\|([^|\n]*)", re.MULTILINE)
+_SCHEDULE_ROW = re.compile(r"^\s*(N\d+)\|", re.MULTILINE)
+_ITINERARY_ROW = re.compile(r"^\s*N\d+\|([^|\n]+)\|([^|\n]*)\|([^|\n]*)\|([^|\n]*)\|([^|\n]*)", re.MULTILINE)
+POI_NAMES = ["Old Town Market", "City Museum", "Riverside Park", "Modern Art Gallery", "Central Food Hall",
+             "Botanical Garden", "Harbour Promenade", "History Museum", "Rooftop Viewpoint", "Street Art Lane",
+             "Artisan Quarter", "Castle Hill", "Science Centre", "Night Market", "Lakeside Trail",
+             "Vintage Bookshop", "Jazz Cellar", "Spice Bazaar", "Sunset Pier", "Tea House"]
+
+
+def classify_prompt(system: str, prompt: str) -> str:
+    """Which agent sent this request (the fake only sees the prompt)."""
+    if "Lead Researcher" in prompt:
+        return "research"
+    if "POOL:" in prompt and "PERSONA:" in prompt:
+        return "vibe"
+    if "-day itinerary in TOON" in prompt:
+        return "format"
+    if "Re-optimize the remaining items" in prompt:
+        return "replan"
+    if "Analyze user message" in prompt:
+        return "router"
+    if "Messages from one traveller" in prompt:
+        return "extractor"
+    if "User Question:" in prompt:
+        return "concierge"
+    return "monitor" if "TOON" in system else "other"
+
+
+_INSIGHTS = [
+    f"TripInsight({name}) {{\n  Content: 'Canned insight.';\n  Value: '{value}';\n}}"
+    for name, value in (("Transit_Cost", "$640"), ("Stay_Optimization", "1.2km"),
+                        ("Booking_Insight", "6h Window"), ("Schedule_Adjustment", "Weather Heal"))
+]
+
+
+def _activity(title: str, time_: str, lat, lon, type_: str, price: int) -> str:
+    return (f"Activity({title.replace(' ', '_')}) {{\n  Time: {time_};\n  Loc: {title};\n  Lat: {lat};\n"
+            f"  Lon: {lon};\n  Type: {type_ or 'Outdoor'};\n  Logic: 'Close to the previous stop';\n"
+            f"  Description: 'A local favourite.';\n  Price: ${price};\n}}")
+
+
+def _toon_days(rows: list, days: int, per_day: int = 4) -> str:
+    blocks = []
+    for i, (title, type_, lat, lon) in enumerate(rows[:days * per_day]):
+        blocks.append(_activity(title, f"{9 + (i % per_day) * 2:02d}:00", lat, lon, type_, 10 + i * 5))
+    return "\n".join(blocks + _INSIGHTS)
+
+
+def _prose(row_ids: list) -> str:
+    blocks = [f"Activity({row_id}) {{\n  Logic: 'Close to the previous stop';\n"
+              f"  Description: 'A local favourite.';\n  Price: ${10 + i * 5};\n}}" for i, row_id in enumerate(row_ids)]
+    return "\n".join(blocks + _INSIGHTS)
+
+
+def canned_reply(agent: str, prompt: str) -> str:
+    """A reply each agent can parse, derived from what its prompt contains."""
+    if agent == "research":
+        city = (re.search(r"DESTINATION:\s*(.+)", prompt) or [None, "City"])[1].strip()
+        lines = [f"{city} Grand Hotel | Stay | Central and well reviewed"]
+        lines += [f"{i}. **{city} {name}** | {'Indoor' if i % 2 else 'Outdoor'} | Worth a visit"
+                  for i, name in enumerate(POI_NAMES[:14], start=1)]
+        return "\n".join(lines)
+    if agent == "vibe":
+        short = re.search(r"We are (\d+) POIs short", prompt)
+        if short:
+            city = (re.search(r"places in (.+?) that", prompt) or [None, "City"])[1]
+            picks = [f"{city} {name}|{'Indoor' if i % 2 else 'Outdoor'}"
+                     for i, name in enumerate(POI_NAMES[14:14 + int(short[1])])]
+            return json.dumps({"replace": picks})
+        return json.dumps({"keep": [f"P{i}" for i in range(len(_POOL_ROW.findall(prompt)))]})
+    if agent == "format":
+        # Scheduled rows only need prose, keyed by row ID
+        return _prose(_SCHEDULE_ROW.findall(prompt))
+    if agent == "replan" or agent == "monitor":
+        rows = [(t, ty, la, lo) for t, _, ty, la, lo in _ITINERARY_ROW.findall(prompt)]
+        return _toon_days(rows, days=1, per_day=max(len(rows), 1))
+    if agent == "router":
+        return "REPLAN" if re.search(r"late|skip|rain|change|add|instead", prompt, re.I) else "CHAT"
+    if agent == "extractor":
+        found = re.findall(r"(?:love|prefer|enjoy|like)\s+([a-z ]+)", prompt, re.I)
+        return "\n".join(f"User prefers {x.strip()}" for x in found) or "NONE"
+    return "Happy to help: the next stop is a short walk away and opens at 09:00."
+
+
+class AnthropicHandler(JSONHandler):
+    """
+    POST /v1/messages, plain or streamed (SSE). Sleeps `latency` before the
+    first token, then `token_seconds` per output token (~4 chars).
+    """
+    protocol_version = "HTTP/1.1"   # Keep-alive, like the real API
+
+    def do_POST(self):
+        fake = self.server.fake
+        request = self.read_json()
+        system = request.get("system") or ""
+        system = system if isinstance(system, str) else " ".join(b.get("text", "") for b in system)
+        content = request["messages"][0]["content"]
+        prompt = content if isinstance(content, str) else " ".join(b.get("text", "") for b in content)
+        agent = classify_prompt(system, prompt)
+        text = canned_reply(agent, prompt)
+        usage = {"input_tokens": (len(system) + len(prompt)) // 4, "output_tokens": max(len(text) // 4, 1)}
+        fake.record((agent, usage["input_tokens"], usage["output_tokens"]))
+        fake.delay()
+        if fake.down:
+            return self.send_json({"type": "error", "error": {"type": "overloaded_error",
+                                                              "message": "Overloaded"}}, status=529)
+        if request.get("stream"):
+            return self._stream(request, text, usage)
+        time.sleep(getattr(fake, "token_seconds", 0.0) * usage["output_tokens"])
+        self.send_json({
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": request.get("model"),
+            "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+            "stop_sequence": None, "usage": usage,
+        })
+
+    def _stream(self, request: dict, text: str, usage: dict, chunk_chars: int = 40):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(kind: str, data: dict):
+            payload = f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        event("message_start", {"message": {
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": request.get("model"),
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 1},
+        }})
+        event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        per_chunk = getattr(self.server.fake, "token_seconds", 0.0) * chunk_chars / 4
+        for i in range(0, len(text), chunk_chars):
+            time.sleep(per_chunk)
+            event("content_block_delta", {"index": 0, "delta": {"type": "text_delta",
+                                                                 "text": text[i:i + chunk_chars]}})
+        event("content_block_stop", {"index": 0})
+        event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": usage["output_tokens"]}})
+        event("message_stop", {})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+# --- Whole set ---
+
+UPSTREAM_HANDLERS = {
+    "anthropic": AnthropicHandler,
+    "maps": GoogleMapsHandler,
+    "weather": WeatherHandler,
+    "supabase": SupabaseRestHandler,
+}
+
+
+def start_all(latency: dict = None, token_seconds: float = 0.0) -> dict:
+    """Starts one fake per upstream; `latency` maps names to seconds or Latency objects."""
+    servers = {}
+    for name, handler in UPSTREAM_HANDLERS.items():
+        server = FakeServer(handler)
+        server.latency = (latency or {}).get(name, 0.0)
+        servers[name] = server.start()
+    servers["anthropic"].token_seconds = token_seconds
+    return servers
+
+
+def settings_env(servers: dict) -> dict:
+    """Environment that points every ITERA setting at the fakes (set before importing app)."""
+    return {
+        "ANTHROPIC_API_KEY": "fake",
+        "ANTHROPIC_BASE_URL": servers["anthropic"].url,
+        "GOOGLE_MAPS_KEY": FAKE_GOOGLE_KEY,
+        "GOOGLE_MAPS_BASE_URL": servers["maps"].url,
+        "DISTANCE_MATRIX_URL": servers["maps"].url + "/maps/api/distancematrix/json",
+        "OPENWEATHER_KEY": "fake",
+        "OPENWEATHER_FORECAST_URL": servers["weather"].url + "/data/2.5/forecast",
+        "SUPABASE_URL": servers["supabase"].url,
+        "SUPABASE_SERVICE_ROLE_KEY": FAKE_SUPABASE_KEY,
+    }
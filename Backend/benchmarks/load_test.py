@@ -0,0 +1,352 @@
+"""
+Offline load test: the real app (uvicorn, shared clients, caches, write
+queue) against local fakes for Anthropic, Google Maps, OpenWeather and
+Supabase, so no keys or network are needed.
+
+A warm-up /plan per destination supplies itineraries for /chat; the
+measured phase then runs a shuffled mix of /plan (JSON or SSE) and /chat
+requests (local repairs, LLM replans, questions, preferences) through
+--concurrency workers. Reported per endpoint: throughput and p50/p95/p99;
+per stage: LangGraph node and upstream call latency, taken from the
+difference between two /metrics scrapes. Results are written as JSON;
+--baseline compares against an earlier file and exits 1 on a regression.
+
+    cd Backend && python -m benchmarks.load_test --plans 40 --chats 120 --concurrency 16
+    cd Backend && python -m benchmarks.load_test --baseline benchmarks/results/v1.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+from benchmarks.fake_upstreams import Latency, settings_env, start_all
+
+DESTINATIONS = ["Barcelona", "Lisbon", "Kyoto", "Marrakesh", "Mexico City", "Istanbul", "Hanoi", "Cape Town",
+                "Buenos Aires", "Reykjavik", "Prague", "Seoul"]
+PERSONAS = ["Foodie", "Explorer", "Culture Buff", "Relaxer"]
+INTERESTS = ["food", "art", "history", "nature", "nightlife", "shopping"]
+CHAT_MESSAGES = {
+    "repair": ["running 30 minutes late", "it's raining, anything indoors?", "skip the next stop",
+               "we're about an hour behind schedule"],
+    "replan": ["please add a flamenco show tonight", "replace the museum with something outdoors"],
+    "question": ["where is the next stop?", "how long is the walk to lunch?", "is the market open on sundays?"],
+    "preference": ["I love street food", "we prefer quiet cafes", "I enjoy rooftop bars"],
+}
+QUANTILES = (50, 95, 99)
+
+
+def plan_body(destination: str, rng: random.Random) -> dict:
+    days = rng.choice([2, 3])
+    return {
+        "destination": destination, "startDate": "2026-05-01", "endDate": f"2026-05-0{days}",
+        "startTime": "09:00", "endTime": "21:00", "timePeriod": "Spring", "budgetMax": rng.choice([1500, 2500, 4000]),
+        "persona": rng.choice(PERSONAS), "isReligious": False, "accommodation": "Boutique Hotel",
+        "interests": rng.sample(INTERESTS, 2), "duration": days,
+    }
+
+
+# --- Server under test ---
+
+class AppServer:
+    """Runs main.app under uvicorn on a background thread (its own event loop)."""
+
+    def __init__(self, app):
+        import uvicorn
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning",
+                                                    lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 15.0) -> str:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("app server failed to start")
+            time.sleep(0.02)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self, timeout: float = 30.0):
+        # Graceful: runs the shutdown hook (insight flush, write-queue drain)
+        self.server.should_exit = True
+        self.thread.join(timeout)
+
+
+# --- Metrics ---
+
+async def scrape(client: httpx.AsyncClient) -> dict:
+    """{(name, labels): {count, sum, buckets}} for the histogram series the breakdown needs."""
+    samples = {}
+    for family in text_string_to_metric_families((await client.get("/metrics")).text):
+        if family.name not in ("itera_node_seconds", "itera_upstream_seconds"):
+            continue
+        for s in family.samples:
+            labels = dict(s.labels)
+            le = labels.pop("le", None)
+            if family.name == "itera_node_seconds":
+                labels.pop("outcome", None)   # Node errors are rare; one series per node
+            key = (family.name, tuple(sorted(labels.items())))
+            series = samples.setdefault(key, {"count": 0.0, "sum": 0.0, "buckets": {}})
+            if s.name.endswith("_count"):
+                series["count"] += s.value
+            elif s.name.endswith("_sum"):
+                series["sum"] += s.value
+            elif s.name.endswith("_bucket"):
+                series["buckets"][float(le)] = series["buckets"].get(float(le), 0.0) + s.value
+    return samples
+
+
+def bucket_quantile(buckets: dict, count: float, q: float) -> float:
+    """Upper bound of the bucket holding the q-th quantile (what Prometheus would interpolate towards)."""
+    target = count * q
+    for bound in sorted(buckets):
+        if buckets[bound] >= target:
+            return bound
+    return float("inf")
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    stages = {"nodes": {}, "upstreams": {}}
+    for key, series in after.items():
+        name, labels = key
+        base = before.get(key, {"count": 0.0, "sum": 0.0, "buckets": {}})
+        count = series["count"] - base["count"]
+        if count <= 0:
+            continue
+        buckets = {b: v - base["buckets"].get(b, 0.0) for b, v in series["buckets"].items()}
+        labels = dict(labels)
+        if name == "itera_node_seconds":
+            label = labels["node"]
+            group = "nodes"
+        else:
+            label = f"{labels['upstream']}/{labels['operation']}"
+            group = "upstreams"
+            if labels.get("outcome", "ok") != "ok":
+                label += f" ({labels['outcome']})"
+        p95 = bucket_quantile(buckets, count, 0.95)
+        stages[group][label] = {
+            "count": int(count),
+            "mean_ms": round((series["sum"] - base["sum"]) / count * 1000, 2),
+            "p95_le_ms": None if p95 == float("inf") else round(p95 * 1000, 1),
+        }
+    return stages
+
+
+# --- Load ---
+
+def summarize(samples: list, elapsed: float) -> dict:
+    ok = [s["seconds"] for s in samples if s["ok"]]
+    out = {"requests": len(samples), "errors": sum(not s["ok"] for s in samples),
+           "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0}
+    if ok:
+        values = np.percentile(np.asarray(ok) * 1000, QUANTILES)
+        out.update({f"p{q}_ms": round(float(v), 1) for q, v in zip(QUANTILES, values)})
+        out["mean_ms"] = round(float(np.mean(ok)) * 1000, 1)
+    first = [s["first_event"] for s in samples if s.get("first_event") is not None]
+    if first:
+        out["sse_first_event_p50_ms"] = round(float(np.percentile(first, 50)) * 1000, 1)
+    return out
+
+
+async def send_plan(client: httpx.AsyncClient, body: dict, stream: bool, bypass: bool) -> dict:
+    headers = {"X-Plan-Cache": "bypass"} if bypass else {}
+    started = time.perf_counter()
+    if not stream:
+        res = await client.post("/plan", json=body, headers=headers)
+        ok = res.status_code == 200 and bool(res.json().get("itinerary"))
+        return {"ok": ok, "seconds": time.perf_counter() - started, "body": res.json() if ok else None}
+    first_event, done = None, False
+    async with client.stream("POST", "/plan", json=body,
+                             headers={**headers, "Accept": "text/event-stream"}) as res:
+        async for line in res.aiter_lines():
+            if line.startswith("event:"):
+                first_event = first_event or time.perf_counter() - started
+                done = done or line == "event: done"
+                if line == "event: error":
+                    break
+    return {"ok": done, "seconds": time.perf_counter() - started, "first_event": first_event}
+
+
+async def send_chat(client: httpx.AsyncClient, plan: dict, message: str, session: str) -> dict:
+    body = {"message": message, "current_itinerary": plan["itinerary"], "last_reached_index": 0,
+            "plan_id": plan.get("plan_id"), "session_id": session}
+    started = time.perf_counter()
+    res = await client.post("/chat", json=body)
+    return {"ok": res.status_code == 200, "seconds": time.perf_counter() - started}
+
+
+async def run_load(base_url: str, args) -> dict:
+    rng = random.Random(args.seed)
+    destinations = DESTINATIONS[:args.destinations]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        # Warm-up: one plan per destination gives /chat real itineraries and plan IDs
+        warm = await asyncio.gather(*(send_plan(client, plan_body(d, rng), False, True) for d in destinations))
+        plans = [w["body"] for w in warm if w["ok"]]
+        if not plans:
+            raise RuntimeError("warm-up /plan failed; is the app reaching the fakes?")
+
+        before = await scrape(client)   # Stages cover the measured phase only
+
+        jobs = [("plan", None) for _ in range(args.plans)]
+        kinds = list(CHAT_MESSAGES)
+        jobs += [("chat", rng.choice(kinds)) for _ in range(args.chats)]
+        rng.shuffle(jobs)
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        results = {"plan": [], "chat": []}
+
+        async def worker():
+            while not queue.empty():
+                endpoint, kind = queue.get_nowait()
+                try:
+                    if endpoint == "plan":
+                        sample = await send_plan(client, plan_body(rng.choice(destinations), rng),
+                                                 stream=rng.random() < args.sse_share,
+                                                 bypass=rng.random() >= args.cache_share)
+                        sample.pop("body", None)
+                    else:
+                        sample = await send_chat(client, rng.choice(plans), rng.choice(CHAT_MESSAGES[kind]),
+                                                 session=f"session-{rng.randrange(args.concurrency * 2)}")
+                        sample["kind"] = kind
+                except httpx.HTTPError as e:
+                    sample = {"ok": False, "seconds": args.timeout, "error": type(e).__name__}
+                results[endpoint].append(sample)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stages = stage_breakdown(before, await scrape(client))
+
+    report = {"elapsed_s": round(elapsed, 2),
+              "endpoints": {"/plan": summarize(results["plan"], elapsed),
+                            "/chat": summarize(results["chat"], elapsed),
+                            "all": summarize(results["plan"] + results["chat"], elapsed)}}
+    report["chat_kinds"] = {kind: summarize([s for s in results["chat"] if s["kind"] == kind], elapsed)
+                            for kind in kinds}
+    report["stages"] = stages
+    return report
+
+
+# --- Regression check ---
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Endpoints whose p95 grew or throughput fell by more than `tolerance`."""
+    regressions = []
+    for endpoint, now in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before or not now.get("requests"):
+            continue
+        if before.get("p95_ms") and now.get("p95_ms", 0) > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint} p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before.get("throughput_rps") and now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint} throughput {before['throughput_rps']} -> {now['throughput_rps']} rps")
+        if now["errors"] > before.get("errors", 0):
+            regressions.append(f"{endpoint} errors {before.get('errors', 0)} -> {now['errors']}")
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<10}{'reqs':>6}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for endpoint, s in {**report["endpoints"], **{f"  {k}": v for k, v in report["chat_kinds"].items()}}.items():
+        print(f"{endpoint:<10}{s['requests']:>6}{s['errors']:>5}{s['throughput_rps']:>8}"
+              f"{s.get('p50_ms', '-'):>9}{s.get('p95_ms', '-'):>9}{s.get('p99_ms', '-'):>9}")
+    for group, stages in report["stages"].items():
+        print(f"\n{group:<32}{'count':>7}{'mean':>10}{'p95<=':>9}  (ms)")
+        for label, s in sorted(stages.items(), key=lambda kv: -kv[1]["mean_ms"] * kv[1]["count"]):
+            print(f"{label:<32}{s['count']:>7}{s['mean_ms']:>10}{str(s['p95_le_ms']):>9}")
+    print(f"\nupstream requests: {report['upstream_requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plans", type=int, default=40)
+    parser.add_argument("--chats", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--destinations", type=int, default=8, help="distinct cities (<= %d)" % len(DESTINATIONS))
+    parser.add_argument("--cache-share", type=float, default=0.0,
+                        help="fraction of /plan allowed to use the plan cache (rest bypass it)")
+    parser.add_argument("--sse-share", type=float, default=0.25, help="fraction of /plan sent as SSE")
+    parser.add_argument("--llm-latency", default="lognormal:400:0.4", help="time to first token (ms spec)")
+    parser.add_argument("--llm-token-ms", type=float, default=0.5, help="per output token")
+    parser.add_argument("--maps-latency", default="lognormal:60:0.3")
+    parser.add_argument("--weather-latency", default="lognormal:80:0.3")
+    parser.add_argument("--supabase-latency", default="lognormal:30:0.3")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None, help="JSON report path (default benchmarks/results/load-<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    latency = {"anthropic": args.llm_latency, "maps": args.maps_latency,
+               "weather": args.weather_latency, "supabase": args.supabase_latency}
+    servers = start_all({name: Latency.parse(spec, seed=args.seed) for name, spec in latency.items()},
+                        token_seconds=args.llm_token_ms / 1000.0)
+
+    # Fresh caches and spool per run, so results don't depend on the last one
+    cache_dir = tempfile.mkdtemp(prefix="itera-load-")
+    os.environ.update(settings_env(servers))
+    os.environ.update({"GEOCODE_CACHE_PATH": os.path.join(cache_dir, "geocode.sqlite3"),
+                       "WRITE_SPOOL_PATH": os.path.join(cache_dir, "write_spool.sqlite3"),
+                       "JOB_DB_PATH": os.path.join(cache_dir, "jobs.sqlite3"),
+                       "POI_CATALOG_PATH": os.path.join(cache_dir, "poi_catalog.sqlite3"),   # Cold: never the real one
+                       "JOB_WORKERS": "0",   # Only the synchronous endpoints are driven; idle workers would just compete for CPU
+                       "LOG_LEVEL": "WARNING"})
+    import main as itera   # Settings are read at import, after the environment points at the fakes
+
+    app_server = AppServer(itera.app)
+    base_url = app_server.start()
+    try:
+        report = asyncio.run(run_load(base_url, args))
+    finally:
+        app_server.stop()
+        for server in servers.values():
+            server.stop()
+
+    report["upstream_requests"] = {name: len(server.requests) for name, server in servers.items()}
+    report["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(), "python": platform.python_version(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+    }
+    print_report(report)
+
+    out = args.out or os.path.join("benchmarks", "results",
+                                   f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report: {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
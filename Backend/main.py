@@ -1,161 +1,494 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 from typing import List, Optional
 from fastapi import BackgroundTasks # Add this import
-from app.agents.extractor import extract_and_save_insight
+from app.agents.extractor import extract_and_save_insight, insight_batcher
 
 from app.core.config import settings
 from app.core.toon_engine import TOONEngine
 
 # Import and initialize Supabase client
-from app.db.supabase_client import supabase                # Fixes "supabase not defined"
+from app.db.supabase_client import write_queue
+
+from app.core.services import services   # Clients + compiled graph, built once (warmed at startup)
+from app.core.llm_client import ask_claude, usage_snapshot
+from app.core.prompt_codec import encode_itinerary, ITINERARY_FIELDS
+from app.core.plan_cache import plan_cache, trip_contexts, canonical_plan_key, PlanEventLog
+from app.core.intent_router import route_message
+from app.core.repair_engine import repair_itinerary, retime_replan, DEFAULT_DAY_END, DEFAULT_DAY_START
+from app.core.weather_service import weather_service, replan_outlook
+from app.core.poi_catalog import poi_catalog
+from app.core.geo_cache import geocode_cache
+from app.agents.planner import PlanRequest, build_initial_state, finish_plan, run_plan_graph
+from app.core import admission
+from app.db.job_store import CANCELLED, DONE, FAILED, FINISHED
+from app.core.telemetry import (
+    HTTP_INFLIGHT, HTTP_SECONDS, configure_logging, new_trace_id, register_gauge, trace_id_var,
+)
+from worker import start_workers, stop_workers
+
+configure_logging(settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await services.warm_up()   # SDK imports, client pools and graph compile happen here, not per request
+    write_queue.start()        # Replays a spool left by the last run now, not on the first write
+    purged = await asyncio.to_thread(geocode_cache.purge_expired)
+    logger.info("Geocode cache: %d expired entries purged", purged)
+    workers, stop_event = start_workers(settings.JOB_WORKERS)
+    yield
+    await asyncio.to_thread(stop_workers, workers, stop_event,
+                            settings.JOB_SHUTDOWN_SECONDS + settings.WRITE_SHUTDOWN_TIMEOUT_SECONDS + 5)
+    await insight_batcher.flush_all()   # Buffered chat windows still get their extraction
+    await services.aclose()
+    # Drain pending Supabase writes; whatever can't make it is spooled for next start
+    await asyncio.to_thread(write_queue.flush, settings.WRITE_SHUTDOWN_TIMEOUT_SECONDS)
+
+
+app = FastAPI(title="ITERA Engine", lifespan=lifespan)
 
-from app.agents.squad import itera_brain # Will be defined in next batch
-from anthropic import Anthropic
 
-app = FastAPI(title="ITERA Engine")
+@app.middleware("http")
+async def admit_requests(request: Request, call_next):
+    """
+    /chat and /plan wait for an endpoint slot (chats first); a full queue or a
+    wait past the deadline is answered at once with 429/503 and Retry-After.
+    The request's priority then orders its upstream calls too.
+    """
+    priority = admission.route_priority(request.method, request.url.path)
+    if priority is None:
+        return await call_next(request)
+    try:
+        granted_at = await admission.endpoint_gate.acquire(priority)
+    except admission.Rejected as e:
+        logger.warning("Admission rejected %s %s: %s", request.method, request.url.path, e.reason)
+        return JSONResponse({"detail": "Server busy, retry later"}, status_code=e.status_code,
+                            headers={"Retry-After": str(e.retry_after)})
+
+    def release():
+        admission.endpoint_gate.release(priority, granted_at)
+
+    token = admission.priority_var.set(priority)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        release()
+        raise
+    finally:
+        admission.priority_var.reset(token)
+    if not response.headers.get("content-type", "").startswith("text/event-stream"):
+        release()
+        return response
+
+    # SSE plans keep their slot until the stream ends
+    async def body(chunks):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            release()
+    response.body_iterator = body(response.body_iterator)
+    return response
+
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"], # Vite's default port
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "X-Plan-Cache", "Retry-After", "Location"],
 )
 
-client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-class PlanRequest(BaseModel):
-    destination: str
-    startDate: str
-    endDate: str
-    startTime: str
-    endTime: str
-    timePeriod: str
-    budgetMax: int # Changed to int
-    persona: str
-    isReligious: bool
-    accommodation: str
-    interests: List[str]
-    duration: int
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace ID per request (caller's X-Trace-Id or a new one) and request latency by route."""
+    trace_id = request.headers.get("X-Trace-Id") or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    HTTP_INFLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        HTTP_INFLIGHT.dec()
+        # Route template, not the raw path, so IDs in URLs don't explode the label set
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
+        trace_id_var.reset(token)
+
+
+# Read at scrape time
+register_gauge("itera_write_queue_depth", "Supabase rows waiting in memory", lambda: write_queue.snapshot()["queue_depth"])
+register_gauge("itera_write_spool_depth", "Supabase rows spooled to disk", write_queue.spool_depth)
+register_gauge("itera_insight_buffered_messages", "Chat messages awaiting extraction",
+               lambda: insight_batcher.snapshot()["buffered_messages"])
+register_gauge("itera_plan_cache_size", "Cached /plan responses", lambda: plan_cache.snapshot()["size"])
+register_gauge("itera_geocode_cache_hit_rate", "Share of geocode lookups answered from cache", geocode_cache.hit_rate)
+register_gauge("itera_plan_inflight", "/plan pipelines running", lambda: plan_cache.snapshot()["inflight"])
+register_gauge("itera_plan_jobs_queued", "Plan jobs waiting for a worker", lambda: services.jobs.counts().get("queued", 0))
+register_gauge("itera_plan_jobs_running", "Plan jobs running on workers", lambda: services.jobs.counts().get("running", 0))
+
+
+# The concierge answers "where is..." questions, so it also gets addresses
+CONCIERGE_FIELDS = ITINERARY_FIELDS + ("loc",)
 
 class ChatRequest(BaseModel):
     message: str
     current_itinerary: List[dict]
     last_reached_index: int
+    plan_id: Optional[str] = None   # From /plan; unlocks indoor swaps from the trip's candidate pool
+    session_id: Optional[str] = None  # Groups messages for batched preference extraction; without it each is extracted alone
 
-@app.post("/plan")
-async def plan_trip(req: PlanRequest):
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# key -> events of the plan currently in flight for it (alongside plan_cache.inflight)
+plan_streams = {}
+
+
+def compute_plan(req: PlanRequest, key: str):
+    """
+    One plan run, for plan_cache to track as the key's in-flight task. Its
+    events go to plan_streams[key], registered here (before the task
+    starts) so any request that coalesces onto it can stream them.
+    """
+    log = PlanEventLog()
+    plan_streams[key] = log
+
+    async def run():
+        try:
+            result = build_initial_state(req)
+            async for event, data in run_plan_graph(result):
+                log.publish((event, data))
+            return finish_plan(req, result)
+        finally:
+            log.close()
+            if plan_streams.get(key) is log:
+                del plan_streams[key]
+
+    return run()
+
+
+async def stream_plan(req: PlanRequest, key: str, bypass: bool):
+    """
+    SSE mode for /plan: one `progress` event per finished graph node, an
+    `activity`/`insight` event per TOON block as the format node streams it,
+    then `done` with the same body the JSON mode returns.
+    A cached plan skips straight to `done`. Otherwise the request follows the
+    key's in-flight run (starting it on a miss), so identical JSON and SSE
+    requests share one pipeline.
+    """
     try:
+        if bypass:
+            plan_cache.stats["bypassed"] += 1
+            task = plan_cache.track(key, compute_plan(req, key))
+        else:
+            cached = plan_cache.peek(key)
+            if cached is not None:
+                plan_cache.stats["hits"] += 1
+                yield sse("progress", {"stage": "cache", "source": "hit"})
+                yield sse("done", cached)
+                return
+            task = plan_cache.inflight(key)
+            if task is not None:
+                plan_cache.stats["coalesced"] += 1
+                yield sse("progress", {"stage": "cache", "source": "coalesced"})
+            else:
+                plan_cache.stats["misses"] += 1
+                task = plan_cache.track(key, compute_plan(req, key))
 
-        # Inside plan_trip function
-        # 1. Geocode the destination first
-        from app.agents.researcher import get_destination_coords
-        dest_center = get_destination_coords(req.destination)
- 
-        
-        # Now req.endTime will not throw an AttributeError
-        initial_state = {
-            "target": req.destination,
-            "persona": req.persona,
-            "days": int(req.duration),
-            "budgetMax": req.budgetMax,  # Ensure this matches OnboardingModal
-            "is_religious": req.isReligious,
-            "accommodation": req.accommodation or "Boutique Hotel",
-            "interests": req.interests or [],
-            "startTime": req.startTime or "09:00",
-            "endTime": req.endTime or "21:00",
-            "poi_pool": [],
-            "final_json": [],
-            "insights": [],
-            "efficiency": "35%",
-            "weather": "Sunny", # Added for safety
-            "hotel_name": ""
-        }
-        # Invoke the Agentic Squad
-        result = await itera_brain.ainvoke(initial_state)
-        
-        # Backend/main.py -> inside plan_trip
+        log = plan_streams.get(key)
+        if log is not None:
+            async for event, data in log.follow():
+                yield sse(event, data)
+        # Shielded: a client going away doesn't cancel the run others share
+        body = await asyncio.shield(task)
+        yield sse("done", body)
+    except Exception as e:
+        logger.exception("SSE plan failed")
+        yield sse("error", {"detail": str(e)})
 
-        # ... (after result = await itera_brain.ainvoke)
-        
-        # PERSIST TO SUPABASE
-        from app.db.supabase_client import save_full_journey
-        save_full_journey(
-            req.destination, 
-            result['final_json'], 
-            result['insights'], 
-            dest_center
+
+@app.post("/plan")
+async def plan_trip(req: PlanRequest, request: Request, response: Response):
+    # Identical requests share one cached / in-flight plan unless the client
+    # asks for a fresh one with `X-Plan-Cache: bypass`.
+    key = canonical_plan_key(req.model_dump())
+    bypass = request.headers.get("x-plan-cache", "").lower() == "bypass"
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_plan(req, key, bypass),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
 
-        return {
-            "status": "success",
-            "itinerary": result['final_json'],
-            "insights": result['insights'],
-            "center": dest_center,
-            "efficiency_metric": result['efficiency']
-        }
+    try:
+        # Invoke the Agentic Squad (destination geocode runs inside its sensing stage)
+        body, source = await plan_cache.get_or_compute(key, lambda: compute_plan(req, key), bypass=bypass)
+        response.headers["X-Plan-Cache"] = source
+        return body
     except Exception as e:
-        import traceback
-        traceback.print_exc() 
+        logger.exception("Plan failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Plan jobs: the same pipeline, queued for worker processes (worker.py) ---
+
+def job_view(job: dict) -> dict:
+    """Status payload for a job (the plan itself comes from /result)."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],        # Last graph node the worker finished
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+def adopt_result(job: dict) -> dict:
+    """
+    A done job's /plan body. The worker built it in another process, so its
+    replan context and cache entry are copied in here for /chat and /plan.
+    """
+    body, context = job["result"]["body"], job["result"].get("context")
+    if context is not None and trip_contexts.peek(body["plan_id"]) is None:
+        trip_contexts.put(body["plan_id"], context)
+    if plan_cache.peek(job["key"]) is None:
+        plan_cache.put(job["key"], body)
+    return body
+
+
+async def load_job(job_id: str) -> dict:
+    job = await asyncio.to_thread(services.jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.post("/plan/jobs", status_code=202)
+async def submit_plan_job(req: PlanRequest, request: Request, response: Response):
+    """
+    Queues a plan and returns its job right away. Identical plans share one
+    job while it is queued or running, or done within the plan cache TTL,
+    unless `X-Plan-Cache: bypass`; a cached plan comes back already done.
+    """
+    key = canonical_plan_key(req.model_dump())
+    bypass = request.headers.get("x-plan-cache", "").lower() == "bypass"
+    cached = None if bypass else plan_cache.peek(key)
+    job, created = await asyncio.to_thread(
+        services.jobs.submit, key, req.model_dump(),
+        0.0 if bypass else settings.PLAN_CACHE_TTL_SECONDS,
+        {"body": cached, "context": None} if cached is not None else None,
+    )
+    response.headers["Location"] = f"/plan/jobs/{job['id']}"
+    return {**job_view(job), "deduplicated": not created}
+
+
+@app.get("/plan/jobs/stats")
+async def plan_job_stats():
+    """Jobs by status in the shared store."""
+    return {"backend": settings.JOB_BACKEND, "jobs": await asyncio.to_thread(services.jobs.counts)}
+
+
+@app.get("/plan/jobs/{job_id}")
+async def plan_job_status(job_id: str):
+    return job_view(await load_job(job_id))
+
+
+@app.get("/plan/jobs/{job_id}/result")
+async def plan_job_result(job_id: str):
+    """The /plan body once the job is done; 202 with its status (and Retry-After) until then."""
+    job = await load_job(job_id)
+    if job["status"] == DONE:
+        return adopt_result(job)
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] == CANCELLED:
+        raise HTTPException(status_code=409, detail="Job was cancelled")
+    return JSONResponse(job_view(job), status_code=202, headers={"Retry-After": "1"})
+
+
+@app.post("/plan/jobs/{job_id}/cancel")
+async def cancel_plan_job(job_id: str):
+    """Queued jobs are cancelled at once; running ones stop at their worker's next heartbeat."""
+    job = await asyncio.to_thread(services.jobs.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job_view(job)
+
+
+async def stream_job(job_id: str):
+    """Every event the job has published so far, then new ones as they land, then `done` or `error`."""
+    seq = 0
+    while True:
+        job = await asyncio.to_thread(services.jobs.get, job_id)
+        # Read after the status, so a finished job's events are all in this batch
+        for seq, event, data in await asyncio.to_thread(services.jobs.events, job_id, seq):
+            yield sse(event, data)
+        if job is None or job["status"] in FINISHED:
+            break
+        await asyncio.sleep(settings.JOB_POLL_SECONDS)
+    if job is not None and job["status"] == DONE:
+        yield sse("done", adopt_result(job))
+    else:
+        yield sse("error", {"detail": (job["error"] or job["status"]) if job else "Unknown job"})
+
+
+@app.get("/plan/jobs/{job_id}/events")
+async def plan_job_events(job_id: str):
+    """SSE view of a job: the same progress/activity/insight/done events as streaming /plan."""
+    await load_job(job_id)
+    return StreamingResponse(
+        stream_job(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape: request, node and upstream latency histograms plus queue gauges."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/plan/cache/stats")
+async def plan_cache_stats():
+    return plan_cache.snapshot()
+
+
+@app.get("/db/queue/stats")
+async def db_queue_stats():
+    """Write-behind queue depth, spool depth and write/retry counters."""
+    return write_queue.snapshot()
+
+
+@app.get("/insights/stats")
+async def insight_stats():
+    """Messages buffered, extraction windows, LLM calls made and preferences stored/deduped."""
+    return insight_batcher.snapshot()
+
+
+@app.get("/services/stats")
+async def services_stats():
+    """Which shared clients are built and what each cost to build."""
+    return services.snapshot()
+
+
+@app.get("/weather/stats")
+async def weather_stats():
+    """Forecast fetches, cache hits and lookups coalesced onto an in-flight fetch."""
+    return weather_service.snapshot()
+
+
+@app.get("/geocode/stats")
+async def geocode_stats():
+    """Geocode cache hits by tier (memory / SQLite / negative), misses and hit rate."""
+    return geocode_cache.snapshot()
+
+
+@app.get("/catalog/stats")
+async def catalog_stats():
+    """Catalogued cities/POIs and how often research was answered without Claude."""
+    return await asyncio.to_thread(poi_catalog.snapshot)
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Endpoint and per-upstream slots: active, waiting by priority, rejections."""
+    return admission.snapshot()
+
+
+@app.get("/llm/usage")
+async def llm_usage():
+    """Per-agent call counts, input/output tokens and latency since startup."""
+    return usage_snapshot()
+
+
 @app.post("/chat")
 async def handle_chat(req: ChatRequest):
     """
     The Self-Healing Gateway. 
     Routes between informational chat and logistical re-planning.
     """
-    # 1. Routing Intelligence
-    router_prompt = f"""
-    Analyze user message: "{req.message}"
-    If they want to change plans, skip an activity, or report a delay: Reply 'REPLAN'.
-    If they are asking a general question: Reply 'CHAT'.
-    Reply ONLY with the word.
-    """
-    
-    route_res = client.messages.create(
-        model=settings.CLAUDE_MODEL,
-        max_tokens=10,
-        messages=[{"role": "user", "content": router_prompt}]
-    )
-    
-    decision = route_res.content[0].text.strip()
+    # 0. Preference learning: buffered per session, extracted in batched windows
+    insight_batcher.submit(req.session_id, req.message)
+
+    # 1. Routing Intelligence (local classifier, Claude only when unsure)
+    decision = (await route_message(req.message))["intent"]
 
     if "REPLAN" in decision:
         # SELF-HEALING LOGIC:
-        # Keep nodes up to last_reached_index. Re-generate the rest.
+        # Delays, weather, skips and re-ordering are repaired locally;
+        # anything else keeps nodes up to last_reached_index and re-generates the rest.
+        context = (trip_contexts.peek(req.plan_id) if req.plan_id else None) or {}
+        repaired = repair_itinerary(
+            req.message,
+            req.current_itinerary,
+            req.last_reached_index,
+            pool=context.get("candidate_pool"),
+            day_end=context.get("endTime") or DEFAULT_DAY_END,
+        )
+        if repaired is not None:
+            return {"type": "replan", "new_itinerary": repaired["itinerary"],
+                    "repair": "local", "applied": repaired["applied"]}
+
         completed = req.current_itinerary[:req.last_reached_index + 1]
         to_reschedule = req.current_itinerary[req.last_reached_index + 1:]
+        # From memory only: a replan never waits on OpenWeather
+        forecast = weather_service.cached_forecast(context["destination"]) if context.get("destination") else None
+        outlook = replan_outlook(forecast, context.get("startDate"), context.get("days") or 5)
         
         heal_prompt = f"""
         User Message: {req.message}
+        Forecast: {outlook or "Unavailable"}
         Current Index: {req.last_reached_index}
-        Remaining Items: {to_reschedule}
+        Remaining Items:
+        {encode_itinerary(to_reschedule)}
         TASK: Re-optimize the remaining items based on the user message. 
         Return ONLY TOON format.
         """
         
-        res = client.messages.create(
-            model=settings.CLAUDE_MODEL,
+        res = await ask_claude(
+            "replan",
             max_tokens=1000,
             system=TOONEngine.get_system_prompt(),
             messages=[{"role": "user", "content": heal_prompt}]
         )
         
-        new_nodes = TOONEngine.parse(res.content[0].text)
-        return {"type": "replan", "new_itinerary": completed + new_nodes}
+        # The model picks the places; times come from the local scheduler
+        new_nodes = retime_replan(completed, TOONEngine.parse(res.content[0].text),
+                                  context.get("startTime") or DEFAULT_DAY_START)
+        return {"type": "replan", "new_itinerary": completed + new_nodes, "repair": "llm"}
     
 
     else:
         # IMPROVED CONCIERGE PROMPT
-        chat_res = client.messages.create(
-            model=settings.CLAUDE_MODEL,
+        chat_res = await ask_claude(
+            "concierge",
             max_tokens=500,
             system="You are ITERA, a travel agent. Use the provided itinerary context to answer.",
             messages=[{
                 "role": "user", 
-                "content": f"Current Itinerary: {req.current_itinerary}\n\nUser Question: {req.message}"
+                "content": f"Current Itinerary:\n{encode_itinerary(req.current_itinerary, CONCIERGE_FIELDS)}\n\nUser Question: {req.message}"
             }]
         )
         return {"type": "answer", "answer": chat_res.content[0].text}
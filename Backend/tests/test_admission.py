@@ -0,0 +1,132 @@
+# Backend/tests/test_admission.py
+import asyncio
+import pytest
+from app.core import admission
+from app.core.admission import CHAT, PLAN, BACKGROUND, PriorityGate, Rejected
+from app.core.config import settings
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def scenario():
+        gate = PriorityGate("test", limit=1)
+        order = []
+        held = await gate.acquire(BACKGROUND)
+
+        async def waiter(name, priority):
+            granted = await gate.acquire(priority)
+            order.append(name)
+            gate.release(priority, granted)
+
+        tasks = []
+        for name, priority in [("bg", BACKGROUND), ("plan-1", PLAN), ("chat", CHAT), ("plan-2", PLAN)]:
+            tasks.append(asyncio.create_task(waiter(name, priority)))
+            await asyncio.sleep(0)   # Queue them in this arrival order
+        gate.release(BACKGROUND, held)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario()) == ["chat", "plan-1", "plan-2", "bg"]
+
+
+def test_class_limit_leaves_headroom_for_other_priorities():
+    async def scenario():
+        gate = PriorityGate("test", limit=2, class_limits={PLAN: 1})
+        await gate.acquire(PLAN)
+        plan = asyncio.create_task(gate.acquire(PLAN))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(gate.acquire(CHAT), timeout=1)   # Not stuck behind the queued plan
+        snapshot = gate.snapshot()
+        plan.cancel()
+        return snapshot
+
+    snapshot = run(scenario())
+    assert snapshot["active"] == 2
+    assert snapshot["waiting"] == {"plan": 1}
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        gate = PriorityGate("test", limit=1, max_queue=1)
+        await gate.acquire(PLAN)
+        queued = asyncio.create_task(gate.acquire(PLAN))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire(PLAN)
+        queued.cancel()
+        return gate, rejected.value
+
+    gate, rejected = run(scenario())
+    assert rejected.reason == "queue_full"
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert gate.stats["queue_full"] == 1
+
+
+def test_queue_bound_is_per_priority():
+    async def scenario():
+        gate = PriorityGate("test", limit=1, max_queue=1)
+        await gate.acquire(PLAN)
+        plan = asyncio.create_task(gate.acquire(PLAN))
+        chat = asyncio.create_task(gate.acquire(CHAT))   # Its own queue has room
+        await asyncio.sleep(0)
+        queued = gate.snapshot()["waiting"]
+        plan.cancel()
+        chat.cancel()
+        return queued
+
+    assert run(scenario()) == {"chat": 1, "plan": 1}
+
+
+def test_wait_past_deadline_is_rejected_with_503_and_frees_its_place():
+    async def scenario():
+        gate = PriorityGate("test", limit=1, max_wait=0.05)
+        held = await gate.acquire(PLAN)
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire(PLAN)
+        gate.release(PLAN, held)
+        return gate, rejected.value
+
+    gate, rejected = run(scenario())
+    assert rejected.reason == "timeout"
+    assert rejected.status_code == 503
+    snapshot = gate.snapshot()
+    assert snapshot["waiting"] == {}
+    assert snapshot["active"] == 0
+    assert snapshot["timeout"] == 1
+
+
+def test_blocking_hold_times_out_too():
+    gate = PriorityGate("test", limit=1, max_wait=0.05)
+    with gate.hold(CHAT):
+        with pytest.raises(Rejected) as rejected:
+            gate.acquire_sync(CHAT)
+    assert rejected.value.reason == "timeout"
+    assert gate.snapshot()["active"] == 0
+
+
+def test_api_keeps_its_share_and_workers_split_the_rest(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_WORKERS", 2)
+    monkeypatch.setattr(settings, "UPSTREAM_BUDGET_WORKERS", 0)
+    monkeypatch.setattr(settings, "UPSTREAM_API_SHARE", 0.5)
+    assert admission.budget_share() == 0.5
+    assert admission.budget_share(worker=True) == 0.25
+
+    try:
+        admission.size_budgets(worker=True)
+        worker_maps = admission.budgets["maps"].limit
+        admission.size_budgets()
+        api_maps = admission.budgets["maps"].limit
+    finally:
+        admission.size_budgets()
+    assert api_maps + 2 * worker_maps <= settings.MAPS_MAX_CONCURRENCY
+    assert admission.budgets["maps"].bucket.rate == settings.MAPS_RATE_PER_SECOND * 0.5
+
+
+def test_api_without_workers_gets_the_whole_budget(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_WORKERS", 0)
+    monkeypatch.setattr(settings, "UPSTREAM_BUDGET_WORKERS", 0)
+    assert admission.budget_share() == 1.0
@@ -0,0 +1,23 @@
+# Backend/tests/test_geo_cache.py
+import time
+from app.core.geo_cache import CACHE_MISS, GeocodeCache
+
+
+def test_purge_drops_only_expired_rows(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "geo.sqlite3"), ttl=3600, negative_ttl=0.01, max_items=10)
+    cache.set("Sagrada Familia", "Barcelona", {"lat": 41.4, "lon": 2.17})
+    cache.set("Nowhere", "Barcelona", None)   # Negative entry, expires almost at once
+    time.sleep(0.05)
+    assert cache.purge_expired() == 1
+    assert GeocodeCache(cache.path, 3600, 60, 10).get("Sagrada Familia", "Barcelona") is not CACHE_MISS
+
+
+def test_snapshot_reports_hit_rate(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "geo.sqlite3"), ttl=3600, negative_ttl=60, max_items=10)
+    cache.get("Park Guell", "Barcelona")
+    cache.set("Park Guell", "Barcelona", {"lat": 41.41, "lon": 2.15})
+    cache.get("Park Guell", "Barcelona")
+    snapshot = cache.snapshot()
+    assert snapshot["misses"] == 1
+    assert snapshot["memory_hits"] == 1
+    assert snapshot["hit_rate"] == 0.5
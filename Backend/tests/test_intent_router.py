@@ -0,0 +1,23 @@
+# Backend/tests/test_intent_router.py
+import threading
+from app.core import intent_router
+
+
+def test_model_trains_once_on_first_use(monkeypatch):
+    calls = []
+    real_train = intent_router.train_model
+
+    def train_model(examples, **kwargs):
+        calls.append(len(examples))
+        return real_train(examples, **kwargs)
+
+    monkeypatch.setattr(intent_router, "_model", None)
+    monkeypatch.setattr(intent_router, "train_model", train_model)
+    threads = [threading.Thread(target=intent_router.model) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert intent_router.classify_intent("maybe later we could see the park")["source"] == "model"
+    assert len(calls) == 1
@@ -0,0 +1,110 @@
+# Backend/tests/test_job_store.py
+import threading
+import time
+import pytest
+from app.db.job_store import (
+    CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobBackend, MemoryJobBackend, SQLiteJobBackend,
+)
+
+LEASE = 30.0
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def open_store(request, tmp_path):
+    """Factory for handles on one store: separate connections for SQLite, the same instance for memory."""
+    if request.param == "sqlite":
+        path = str(tmp_path / "jobs.sqlite3")
+        return lambda: SQLiteJobBackend(path)
+    store = MemoryJobBackend()
+    return lambda: store
+
+
+def test_backend_contract_is_abstract():
+    with pytest.raises(TypeError):
+        JobBackend()
+
+
+def test_each_job_is_claimed_by_exactly_one_worker(open_store):
+    store = open_store()
+    submitted = {store.submit(f"key-{i}", {"i": i})[0]["id"] for i in range(30)}
+    claimed, lock = [], threading.Lock()
+
+    def work(worker):
+        handle = open_store()
+        while (job := handle.claim(worker, LEASE, 2)) is not None:
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=work, args=(f"w{n}",)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == sorted(submitted)
+    assert store.counts() == {RUNNING: 30}
+
+
+def test_claims_oldest_first(open_store):
+    store = open_store()
+    first, _ = store.submit("a", {})
+    store.submit("b", {})
+    assert store.claim("w1", LEASE, 2)["id"] == first["id"]
+
+
+def test_expired_lease_is_requeued_then_failed_after_max_attempts(open_store):
+    store = open_store()
+    job, _ = store.submit("key", {})
+    assert store.claim("w1", LEASE, 2)["attempts"] == 1
+    time.sleep(0.05)
+
+    retried = store.claim("w2", 0.01, 2)   # w1 stopped heartbeating: w2 takes the job over
+    assert retried["id"] == job["id"]
+    assert retried["worker"] == "w2"
+    assert retried["attempts"] == 2
+    assert store.heartbeat(job["id"], "w1") is True   # w1 has lost it
+    store.finish(job["id"], "w1", DONE, {"body": {}})
+    assert store.get(job["id"])["status"] == RUNNING
+
+    time.sleep(0.05)
+    assert store.claim("w3", 0.01, 2) is None
+    lost = store.get(job["id"])
+    assert lost["status"] == FAILED
+    assert lost["error"] == "worker lost"
+
+
+def test_cancel_queued_job_is_immediate(open_store):
+    store = open_store()
+    job, _ = store.submit("key", {})
+    assert store.cancel(job["id"])["status"] == CANCELLED
+    assert store.claim("w1", LEASE, 2) is None
+
+
+def test_cancel_running_job_is_flagged_for_its_worker(open_store):
+    store = open_store()
+    job, _ = store.submit("key", {})
+    store.claim("w1", LEASE, 2)
+    assert store.heartbeat(job["id"], "w1") is False
+
+    assert store.cancel(job["id"])["status"] == RUNNING
+    assert store.heartbeat(job["id"], "w1") is True
+    store.finish(job["id"], "w1", CANCELLED)
+    assert store.get(job["id"])["status"] == CANCELLED
+
+
+def test_release_puts_job_back_without_using_an_attempt(open_store):
+    store = open_store()
+    job, _ = store.submit("key", {})
+    store.claim("w1", LEASE, 2)
+    store.release(job["id"], "w1")
+    released = store.get(job["id"])
+    assert released["status"] == QUEUED
+    assert released["attempts"] == 0
+
+
+def test_submit_dedupes_active_jobs_by_key(open_store):
+    store = open_store()
+    job, created = store.submit("key", {}, dedupe_window=60)
+    again, created_again = store.submit("key", {}, dedupe_window=60)
+    assert created and not created_again
+    assert again["id"] == job["id"]
@@ -0,0 +1,93 @@
+# Backend/tests/test_matrix_service.py
+import asyncio
+from collections import OrderedDict
+import numpy as np
+import pytest
+from app.core import matrix_service
+from app.core.services import services
+
+
+class StubMatrixClient:
+    """Answers Distance Matrix GETs locally; records (origins, destinations) per request."""
+
+    def __init__(self):
+        self.requests = []
+
+    @staticmethod
+    def seconds(a: str, b: str) -> float:
+        (lat_a, lon_a), (lat_b, lon_b) = (map(float, p.split(",")) for p in (a, b))
+        return round(abs(lat_a - lat_b) * 1e5 + abs(lon_a - lon_b) * 1e5)
+
+    async def get(self, url, params=None, timeout=None):
+        origins, destinations = params["origins"].split("|"), params["destinations"].split("|")
+        self.requests.append((len(origins), len(destinations)))
+        rows = [{"elements": [{"status": "OK", "duration": {"value": self.seconds(o, d)}} for d in destinations]}
+                for o in origins]
+        return StubResponse({"status": "OK", "rows": rows})
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def client(monkeypatch):
+    stub = StubMatrixClient()
+    monkeypatch.setitem(services._instances, "http", stub)
+    monkeypatch.setattr(matrix_service, "_pair_cache", OrderedDict())
+    monkeypatch.setattr(matrix_service, "stats", dict.fromkeys(matrix_service.stats, 0))
+    return stub
+
+
+def pois(n: int, offset: int = 0) -> list:
+    return [{"lat": 41.38 + (offset + i) * 1e-3, "lon": 2.17} for i in range(n)]
+
+
+def fetch(locations: list) -> np.ndarray:
+    return asyncio.run(matrix_service.fetch_duration_matrix(locations))
+
+
+def test_large_matrix_is_split_into_compliant_tiles(client):
+    matrix = fetch(pois(23))
+    assert matrix.shape == (23, 23)
+    assert not np.isnan(matrix).any()
+    assert len(client.requests) == 9   # ceil(23 / 10) ** 2 tiles of at most 10 x 10
+    assert all(o <= 25 and d <= 25 and o * d <= 100 for o, d in client.requests)
+    assert matrix[0, 5] == pytest.approx(500)
+    assert matrix[5, 0] == pytest.approx(500)
+
+
+def test_warm_tiles_are_served_from_the_pair_cache(client):
+    cold = fetch(pois(12))
+    sent = len(client.requests)
+    warm = fetch(pois(12))
+    assert len(client.requests) == sent
+    assert (warm == cold).all()
+    assert matrix_service.stats["pairs_cached"] == 12 * 11
+    assert not np.isnan(matrix_service.cached_duration_matrix(pois(12))).any()
+
+
+def test_added_pois_only_request_the_missing_pairs(client):
+    fetch(pois(20))
+    before = len(client.requests)
+    grown = fetch(pois(20) + pois(2, offset=20))
+    elements = sum(o * d for o, d in client.requests[before:])
+    assert elements == 4 * (10 * 2) + 2 * 2   # New rows/columns against each block, plus the new-to-new pairs
+    assert matrix_service.stats["pairs_fetched"] == 22 * 21
+    assert grown[21, 0] == pytest.approx(2100)
+
+
+def test_failed_tiles_fall_back_to_haversine(client, monkeypatch):
+    async def down(url, params=None, timeout=None):
+        raise RuntimeError("maps unavailable")
+
+    monkeypatch.setattr(client, "get", down)
+    matrix = fetch(pois(3))
+    assert not np.isnan(matrix).any()
+    assert matrix[0, 1] > 0
+    assert matrix_service.stats["failed_tiles"] == 1
+    assert len(matrix_service._pair_cache) == 0
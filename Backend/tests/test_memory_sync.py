@@ -0,0 +1,65 @@
+# Backend/tests/test_memory_sync.py
+import asyncio
+import pytest
+from app.core.config import settings
+from app.core.vector_index import VectorIndex
+from app.db import supabase_client
+
+
+class FakeTable:
+    """user_insights rows as (text, created_at); records the `since` of each read."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.reads = []
+        self.down = False
+
+    def fetch(self, table, column, limit, order_by=None, since=None):
+        self.reads.append(since)
+        if self.down:
+            raise RuntimeError("supabase unavailable")
+        rows = [r for r in self.rows if since is None or r[1] > since]
+        return sorted(rows, key=lambda r: r[1], reverse=True)[:limit]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    fake = FakeTable([("User prefers quiet cafes", "2026-10-01T10:00:00")])
+    monkeypatch.setattr(supabase_client, "fetch_insight_rows", fake.fetch)
+    return fake
+
+
+def load(index):
+    asyncio.run(supabase_client.ensure_index_loaded(index, "user_insights", "insight_text", order_by="created_at"))
+
+
+def test_rows_stored_elsewhere_reach_a_loaded_index(table, monkeypatch):
+    index = VectorIndex(dim=64)
+    load(index)
+    assert index.size == 1
+
+    table.rows.append(("User prefers night markets", "2026-10-02T09:00:00"))   # Stored by another process
+    load(index)
+    assert index.size == 1   # Within MEMORY_RESYNC_SECONDS: no read
+
+    monkeypatch.setattr(settings, "MEMORY_RESYNC_SECONDS", 0.0)
+    load(index)
+    assert index.contains("User prefers night markets")
+    assert table.reads == [None, "2026-10-01T10:00:00"]
+    assert index.high_water == "2026-10-02T09:00:00"
+
+
+def test_failed_resync_keeps_the_loaded_index(table, monkeypatch):
+    index = VectorIndex(dim=64)
+    load(index)
+    monkeypatch.setattr(settings, "MEMORY_RESYNC_SECONDS", 0.0)
+    table.down = True
+    load(index)
+    assert index.loaded
+    assert index.size == 1
+
+
+def test_failed_bootstrap_raises(table):
+    table.down = True
+    with pytest.raises(RuntimeError):
+        load(VectorIndex(dim=64))
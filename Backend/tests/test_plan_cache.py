@@ -0,0 +1,25 @@
+# Backend/tests/test_plan_cache.py
+from app.core.plan_cache import canonical_plan_key
+
+REQUEST = {
+    "destination": "Barcelona", "startDate": "2026-11-02", "endDate": "2026-11-04",
+    "startTime": "09:00", "endTime": "21:00", "timePeriod": "AM", "budgetMax": 2000,
+    "persona": "Explorer", "isReligious": True, "accommodation": "Hotel",
+    "interests": ["food", "art"], "duration": 3,
+}
+
+
+def key(**changes) -> str:
+    return canonical_plan_key({**REQUEST, **changes})
+
+
+def test_equivalent_requests_share_a_key():
+    assert key() == key(destination="  barcelona ", interests=["art", "Food", "art"], budgetMax=2040)
+
+
+def test_am_pm_toggle_changes_the_key():
+    assert key(timePeriod="AM") != key(timePeriod="PM")
+
+
+def test_start_date_changes_the_key():
+    assert key(startDate="2026-11-02") != key(startDate="2026-11-09")
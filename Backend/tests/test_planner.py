@@ -0,0 +1,23 @@
+# Backend/tests/test_planner.py
+import pytest
+from app.agents.planner import PlanRequest, day_start
+
+
+def request(start_time: str, period: str) -> PlanRequest:
+    return PlanRequest(
+        destination="Barcelona", startDate="2026-11-02", endDate="2026-11-04", startTime=start_time,
+        endTime="21:00", timePeriod=period, budgetMax=2000, persona="Explorer", isReligious=True,
+        accommodation="Hotel", interests=[], duration=3,
+    )
+
+
+@pytest.mark.parametrize("start_time, period, expected", [
+    ("09:00", "AM", "09:00 AM"),
+    ("02:00", "PM", "02:00 PM"),
+    ("12:30", "AM", "12:30"),    # The toggle's AM default would make this 00:30
+    ("12:30", "PM", "12:30"),
+    ("14:00", "AM", "14:00"),    # Already 24-hour
+    ("09:00", "", "09:00"),
+])
+def test_day_start_reads_the_am_pm_toggle(start_time, period, expected):
+    assert day_start(request(start_time, period)) == expected
@@ -0,0 +1,83 @@
+# Backend/tests/test_scheduler.py
+from app.core.scheduler import day_window, schedule_day, schedule_plan, parse_time
+
+HERE = {"lat": 41.38, "lon": 2.17}
+
+
+def stop(title: str, kind: str = "Indoor", **extra) -> dict:
+    return {"title": title, "type": kind, **HERE, **extra}
+
+
+def times(timed: list) -> list:
+    return [(n["title"], n["time"]) for n in timed]
+
+
+def test_day_fits_at_full_dwell():
+    timed, left_out = schedule_day([stop("A"), stop("B")], parse_time("09:00"), parse_time("21:00"), origin=HERE)
+    assert times(timed) == [("A", "09:00"), ("B", "10:30")]
+    assert left_out == []
+
+
+def test_short_day_shrinks_dwell_before_dropping():
+    nodes = [stop(t) for t in "ABCD"]   # 4 x 90 min indoor stops
+    timed, left_out = schedule_day(nodes, parse_time("09:00"), parse_time("12:00"), origin=HERE)
+    assert times(timed) == [("A", "09:00"), ("B", "09:45"), ("C", "10:30"), ("D", "11:15")]
+    assert left_out == []
+
+
+def test_window_drops_last_movable_stops():
+    nodes = [stop(t) for t in "ABCD"]
+    timed, left_out = schedule_day(nodes, parse_time("09:00"), parse_time("11:00"), origin=HERE)
+    assert [n["title"] for n in timed] == ["A", "B"]
+    assert [n["title"] for n in left_out] == ["C", "D"]
+
+
+def test_pinned_stops_are_never_dropped():
+    nodes = [stop("A"), stop("B"), stop("Pinned")]
+    pins = [None, None, parse_time("10:00")]
+    timed, left_out = schedule_day(nodes, parse_time("09:00"), parse_time("09:30"), origin=HERE, pins=pins)
+    assert [n["title"] for n in timed] == ["Pinned"]
+    assert [n["title"] for n in left_out] == ["A", "B"]
+
+
+def day_two_pool(*stops) -> list:
+    return [stop("Hotel", "Stay")] + [{**s, "day": 2} for s in stops]
+
+
+def day_two(plan: dict) -> list:
+    return [n for n in plan["itinerary"] if n["day"] == 2]
+
+
+def test_heritage_stop_opens_day_two():
+    pool = day_two_pool(stop("Beach walk", "Outdoor"), stop("Gothic Quarter Cathedral", "Outdoor"))
+    first = day_two(schedule_plan(pool, 2))[0]
+    assert first["title"] == "Gothic Quarter Cathedral"
+    assert first["time"] == "09:00"
+    assert "Heritage" in first["logic"]
+
+
+def test_day_two_without_heritage_stop_is_not_pinned():
+    pool = day_two_pool(stop("Beach walk", "Outdoor"), stop("Park", "Outdoor"))
+    itinerary = day_two(schedule_plan(pool, 2, day_start="10:00"))
+    assert itinerary[0]["title"] == "Beach walk"
+    assert itinerary[0]["time"] == "10:00"
+    assert not any("Heritage" in n.get("logic", "") for n in itinerary)
+
+
+def test_window_ending_before_its_start_uses_the_default_end():
+    assert day_window("10:00", "08:00") == (parse_time("10:00"), parse_time("21:00"))
+
+
+def test_start_past_the_default_end_falls_back_to_the_default_window():
+    assert day_window("09:00 PM", "21:00") == (parse_time("09:00"), parse_time("21:00"))
+    pool = [stop("Hotel", "Stay")] + [{**stop(t), "day": 1} for t in "AB"]
+    plan = schedule_plan(pool, 1, day_start="09:00 PM", day_end="21:00")
+    assert [n["title"] for n in plan["itinerary"]] == ["Check-in Hotel", "A", "B"]
+    assert plan["unscheduled"] == []
+
+
+def test_catalog_build_skips_scheduler_generated_nodes():
+    from app.core.poi_catalog import _from_itinerary
+    pool = [stop("Hotel", "Stay"), {**stop("A"), "day": 1}, {**stop("Park", "Outdoor"), "day": 2}]
+    pois = _from_itinerary(schedule_plan(pool, 2)["itinerary"])
+    assert [(p["title"], p["type"]) for p in pois] == [("Hotel", "Stay"), ("A", "Indoor"), ("Park", "Outdoor")]
@@ -0,0 +1,39 @@
+# Backend/tests/test_vibe.py
+import asyncio
+import types
+import pytest
+from app.agents import vibe
+
+POOL = [{"title": "Hotel Arts", "type": "Stay"}, {"title": "Park Guell", "type": "Outdoor"}]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    prompts = []
+
+    async def ask_claude(agent, **kwargs):
+        prompts.append(kwargs["messages"][0]["content"])
+        reply = '{"replace": ["Sagrada Familia Basilica|Indoor", "El Born Market|Indoor"]}'
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=reply)])
+
+    async def resolve_places_batch(places, city, limit):
+        return [{**p, "lat": 41.4, "lon": 2.17} for p in places][:limit]
+
+    monkeypatch.setattr(vibe, "ask_claude", ask_claude)
+    monkeypatch.setattr(vibe, "resolve_places_batch", resolve_places_batch)
+    return prompts
+
+
+def validate(is_religious: bool) -> list:
+    pool = asyncio.run(vibe.run_vibe_validator(POOL, "Explorer", 1, is_religious, city="Barcelona"))
+    return [p["title"] for p in pool]
+
+
+def test_religious_replacements_allowed_when_the_user_allows_them(model):
+    assert validate(True) == ["Hotel Arts", "Park Guell", "Sagrada Familia Basilica", "El Born Market"]
+    assert "religious" not in model[0]
+
+
+def test_religious_replacements_dropped_when_the_user_opts_out(model):
+    assert validate(False) == ["Hotel Arts", "Park Guell", "El Born Market"]
+    assert "No churches" in model[0]
@@ -0,0 +1,73 @@
+# Backend/tests/test_write_queue.py
+import threading
+import time
+from app.db.write_queue import WriteBehindQueue
+
+ROWS = [("user_insights", {"insight_text": f"User prefers spot {i}"}) for i in range(40)]
+
+
+def spooled(path: str, insert_rows=None, claim_timeout: float = 120.0) -> WriteBehindQueue:
+    return WriteBehindQueue(insert_rows or (lambda table, rows: None), spool_path=path, batch_size=5,
+                            claim_timeout=claim_timeout)
+
+
+def test_processes_sharing_a_spool_replay_each_row_once(tmp_path):
+    path = str(tmp_path / "spool.sqlite3")
+    spooled(path)._spool(ROWS)
+    sent, lock = [], threading.Lock()
+
+    def insert_rows(table, rows):
+        with lock:
+            sent.extend(row["insight_text"] for row in rows)
+
+    queues = [spooled(path, insert_rows) for _ in range(4)]
+    threads = [threading.Thread(target=wq._replay) for wq in queues]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(sent) == sorted(row["insight_text"] for _, row in ROWS)
+    assert queues[0].spool_depth() == 0
+
+
+def test_failed_replay_puts_rows_back_in_order(tmp_path):
+    path = str(tmp_path / "spool.sqlite3")
+    spooled(path)._spool(ROWS)
+
+    def down(table, rows):
+        raise RuntimeError("service unavailable")
+
+    failing = spooled(path, down)
+    failing._replay()
+    assert failing.spool_depth() == len(ROWS)
+    assert not failing._healthy
+
+    sent = []
+    spooled(path, lambda table, rows: sent.extend(rows))._replay()
+    assert sent == [row for _, row in ROWS]
+
+
+def test_rows_claimed_by_a_crashed_process_are_replayed_after_the_lease(tmp_path):
+    path = str(tmp_path / "spool.sqlite3")
+    spooled(path)._spool(ROWS)
+
+    def crash(table, rows):
+        raise SystemExit("killed mid-replay")   # Not an Exception: nothing gets settled
+
+    crashed = spooled(path, crash)
+    try:
+        crashed._replay()
+    except SystemExit:
+        pass
+    assert crashed.spool_depth() == len(ROWS)   # Nothing lost
+
+    sent = []
+    spooled(path, lambda table, rows: sent.extend(rows))._replay()
+    assert sent == [row for _, row in ROWS[5:]]   # The leased batch waits out its lease
+
+    time.sleep(0.05)
+    late = []
+    spooled(path, lambda table, rows: late.extend(rows), claim_timeout=0.01)._replay()
+    assert late == [row for _, row in ROWS[:5]]
+    assert crashed.spool_depth() == 0
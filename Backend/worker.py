@@ -0,0 +1,184 @@
+# Backend/worker.py
+"""
+Plan job worker.
+
+Claims queued /plan jobs from the job store (app/db/job_store.py), runs
+the agent graph for each on its own event loop, publishes every progress,
+activity and insight event for subscribers, and stores the result. A
+heartbeat keeps each running job's lease alive and picks up cancellations.
+
+The API starts JOB_WORKERS of these when it boots. With the SQLite job
+store, more can run beside it to add capacity:
+
+    cd Backend && python worker.py --concurrency 4
+
+The API keeps UPSTREAM_API_SHARE of each upstream budget and the workers
+split the rest; with extra workers, set UPSTREAM_BUDGET_WORKERS to the
+total worker count everywhere so the shares still add up to the provider
+limits.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from app.agents.planner import PlanRequest, build_initial_state, finish_plan, plan_context, run_plan_graph
+from app.core import admission
+from app.core.config import settings
+from app.core.services import services
+from app.core.telemetry import trace_id_var
+from app.db.job_store import CANCELLED, DONE, FAILED, broker_address, connect_broker
+from app.db.supabase_client import write_queue
+
+logger = logging.getLogger("itera.worker")
+
+PURGE_INTERVAL_SECONDS = 600
+
+
+class Worker:
+
+    def __init__(self, worker_id: str, concurrency: int):
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.running = {}        # job_id -> task
+        self.cancelled = set()   # Cancelled by a client (vs. interrupted by shutdown)
+
+    async def run_job(self, job: dict) -> dict:
+        req = PlanRequest(**job["request"])
+        state = build_initial_state(req)
+        async for event, data in run_plan_graph(state):
+            await asyncio.to_thread(services.jobs.add_events, job["id"], [(event, data)])
+        body = finish_plan(req, state)
+        return {"body": body, "context": plan_context(req, state)}
+
+    async def execute(self, job: dict):
+        trace_id_var.set(job["id"][:16])
+        admission.priority_var.set(admission.PLAN)
+        started = time.perf_counter()
+        try:
+            result = await self.run_job(job)
+        except asyncio.CancelledError:
+            if job["id"] in self.cancelled:
+                await asyncio.to_thread(services.jobs.finish, job["id"], self.worker_id, CANCELLED)
+                logger.info("Job %s cancelled", job["id"])
+            else:
+                await asyncio.to_thread(services.jobs.release, job["id"], self.worker_id)
+                logger.info("Job %s back in the queue (worker stopping)", job["id"])
+            return
+        except Exception as e:
+            logger.exception("Job %s failed", job["id"])
+            await asyncio.to_thread(services.jobs.finish, job["id"], self.worker_id, FAILED, None, str(e))
+            return
+        await asyncio.to_thread(services.jobs.finish, job["id"], self.worker_id, DONE, result)
+        logger.info("Job %s done in %.2fs", job["id"], time.perf_counter() - started)
+
+    def _start(self, job: dict):
+        task = asyncio.create_task(self.execute(job))
+        self.running[job["id"]] = task
+
+        def _done(_):
+            self.running.pop(job["id"], None)
+            self.cancelled.discard(job["id"])
+
+        task.add_done_callback(_done)
+
+    async def heartbeat(self):
+        for job_id, task in list(self.running.items()):
+            stop = await asyncio.to_thread(services.jobs.heartbeat, job_id, self.worker_id)
+            if stop and not task.done():
+                self.cancelled.add(job_id)
+                task.cancel()
+
+    async def serve(self, should_stop):
+        """Claims and runs jobs until should_stop(); running jobs then get JOB_SHUTDOWN_SECONDS to finish."""
+        await services.warm_up()
+        logger.info("Worker %s ready (%d concurrent plans, %s job store)",
+                    self.worker_id, self.concurrency, settings.JOB_BACKEND)
+        last_beat = last_purge = 0.0
+        while not should_stop():
+            now = time.monotonic()
+            if now - last_beat >= settings.JOB_HEARTBEAT_SECONDS:
+                await self.heartbeat()
+                last_beat = now
+            if now - last_purge >= PURGE_INTERVAL_SECONDS:
+                await asyncio.to_thread(services.jobs.purge, time.time() - settings.JOB_RESULT_TTL_SECONDS)
+                last_purge = now
+            if len(self.running) < self.concurrency:
+                job = await asyncio.to_thread(services.jobs.claim, self.worker_id,
+                                              settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS)
+                if job is not None:
+                    self._start(job)
+                    continue
+            await asyncio.sleep(settings.JOB_POLL_SECONDS)
+
+        if self.running:
+            logger.info("Worker %s stopping, %d jobs running", self.worker_id, len(self.running))
+            await asyncio.wait(list(self.running.values()), timeout=settings.JOB_SHUTDOWN_SECONDS)
+            for task in list(self.running.values()):
+                task.cancel()
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+
+async def _run(worker_id: str, concurrency: int, should_stop):
+    admission.size_budgets(worker=True)
+    try:
+        await Worker(worker_id, concurrency).serve(should_stop)
+    finally:
+        await services.aclose()
+        # Journeys saved by finished jobs still reach Supabase (or the spool)
+        await asyncio.to_thread(write_queue.flush, settings.WRITE_SHUTDOWN_TIMEOUT_SECONDS)
+
+
+def run_process(worker_id: str, broker, stop_event):
+    """Entry point of a worker process started by the API; stops when the API sets stop_event."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl-C reaches the whole group; the API coordinates shutdown
+    if broker is not None:
+        services.override("jobs", connect_broker(*broker))
+    asyncio.run(_run(worker_id, settings.JOB_WORKER_CONCURRENCY, stop_event.is_set))
+
+
+def start_workers(count: int) -> tuple:
+    """Starts `count` worker processes; returns (processes, stop_event) for stop_workers()."""
+    ctx = multiprocessing.get_context("spawn")   # Fresh interpreters: no event loop or client pools inherited
+    stop_event = ctx.Event()
+    processes = []
+    for i in range(count):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{i}"
+        process = ctx.Process(target=run_process, args=(worker_id, broker_address(), stop_event),
+                              name=f"itera-worker-{i}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes, stop_event
+
+
+def stop_workers(processes: list, stop_event, timeout: float):
+    """Blocking: asks the workers to stop, waits, then terminates stragglers."""
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning("Worker %s didn't stop in time, terminating", process.name)
+            process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run /plan jobs from the shared job store.")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--id", default=f"{socket.gethostname()}:{os.getpid()}")
+    args = parser.parse_args()
+    if settings.JOB_BACKEND != "sqlite":
+        parser.error("standalone workers need JOB_BACKEND=sqlite; memory-store workers are started by the API")
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    asyncio.run(_run(args.id, args.concurrency, stop.is_set))
+
+
+if __name__ == "__main__":
+    main()
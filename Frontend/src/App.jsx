@@ -27,6 +27,8 @@ export default function App() {
   const [profile, setProfile] = useState(null);
   const [lastReachedIndex, setLastReachedIndex] = useState(-1);
   const [efficiency, setEfficiency] = useState("35%");
+  const [planId, setPlanId] = useState(null); // Lets /chat repair locally from the trip's POI pool
+  const [sessionId] = useState(() => crypto.randomUUID()); // Groups this tab's chat messages for preference extraction
 
   // --- ACTION: GENERATE PLAN (POST /plan) ---
   const handleOnboarding = async (formData) => {
@@ -41,6 +43,7 @@ export default function App() {
         setItinerary(res.data.itinerary || []);
         setInsights(res.data.insights || []);
         setDestCenter(res.data.center);
+        setPlanId(res.data.plan_id || null);
         setEfficiency(res.data.efficiency_metric || "38%");
         setView('dashboard');
       }
@@ -60,7 +63,9 @@ export default function App() {
       const res = await axios.post('http://localhost:8000/chat', {
         message,
         current_itinerary: itinerary,
-        last_reached_index: lastReachedIndex
+        last_reached_index: lastReachedIndex,
+        plan_id: planId,
+        session_id: sessionId
       });
 
       if (res.data.type === 'replan') {
@@ -93,6 +98,7 @@ export default function App() {
     setDestCenter(null);
     setProfile(null);
     setLastReachedIndex(-1);
+    setPlanId(null);
     setIsConciergeOpen(false);
     setView('onboarding');
   };
@@ -101,6 +107,7 @@ export default function App() {
   const handleSelectHistory = (pastJourney) => {
     setItinerary(pastJourney.json_data || []);
     setInsights(pastJourney.insights || []);
+    setPlanId(null);
     if (pastJourney.center_lat && pastJourney.center_lon) {
       setDestCenter({ lat: pastJourney.center_lat, lon: pastJourney.center_lon });
     }